@@ -0,0 +1,310 @@
+from bs4 import BeautifulSoup
+from dataclasses import asdict, is_dataclass
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scraping"))
+
+from cache_store import SqliteCacheStore, url_class
+from parsing import (
+  extract_decklist, extract_pairings, extract_standings, extract_tournament_list_page, is_bracket_pairing,
+  parse_decklist_html, parse_pairings_html, parse_standings_html, parse_tournament_list_html
+)
+from card_parser import get_evolves_from_search_url, parse_card_html, parse_card_info, parse_evolves_from_search
+import requests
+
+# Benchmark of the limitlesstcg extractors on a corpus of saved html pages
+#
+#   python benchmarks/bench_extractors.py run --fixtures benchmarks/fixtures
+#   python benchmarks/bench_extractors.py record --fixtures benchmarks/fixtures --pages cache/pages.sqlite3
+#
+# benchmarks/fixtures holds a small corpus: a listing page, a small and a large
+# swiss tournament, a tournament with a top cut bracket, and Pokémon and Trainer
+# card pages with their evolves from search pages. Its golden files are the
+# outputs of the historical extractors, that parsed the whole page with
+# html.parser: run checks that both the full tree and the targeted extractors
+# still give them, measures pages/sec and peak memory, and exits with 1 on a mismatch.
+# record copies a new corpus from the html cache and downloads card pages, its
+# golden files are written by the full tree extractors.
+
+def full_soup(html: str) -> BeautifulSoup:
+  return BeautifulSoup(html, "html.parser")
+
+# Historical synchronous card scraping, the full tree parse of the card page
+# then one request for its evolves from search page, kept as the baseline of
+# parse_card_html and to download the card fixtures
+def scrape_card_info(url: str, session) -> dict | None:
+  try:
+    response = session.get(url, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, "html.parser")
+    card_info = parse_card_info(url, soup)
+    if card_info["type_carte"] == "Pokémon":
+      card_info["evolves_from"] = get_all_evolves_from_urls(soup, session)
+    return card_info
+  except Exception as e:
+    print(f"scraping card {url} failed: {e}")
+    return None
+
+def get_all_evolves_from_urls(soup: BeautifulSoup, session) -> list:
+  search_url = get_evolves_from_search_url(soup)
+  if not search_url:
+    return []
+  try:
+    response = session.get(search_url, timeout=10)
+    response.raise_for_status()
+    return parse_evolves_from_search(response.content)
+  except Exception as e:
+    print(f"scraping evolves from search {search_url} failed: {e}")
+    return []
+
+# Pages served to scrape_card_info instead of the network
+class FixtureSession:
+  def __init__(self, pages: dict):
+    self.pages = pages
+
+  def get(self, url: str, timeout: float = None):
+    response = requests.Response()
+    response.url = url
+    if url in self.pages:
+      response.status_code = 200
+      response._content = self.pages[url].encode("utf-8")
+    else:
+      response.status_code = 404
+      response._content = b""
+    return response
+
+# Targeted card parsing, as scrap2cards.py does it: the card text block, then
+# the evolves from search page read from the fixtures
+def parse_card_page(page: dict, card_pages: dict) -> dict:
+  card_info, search_url = parse_card_html(page["url"], page["html"])
+  if search_url is not None:
+    card_info["evolves_from"] = parse_evolves_from_search(card_pages[search_url]) if search_url in card_pages else []
+  return card_info
+
+# Extractors of each kind of fixture, the first one is the historical full tree
+# parse that writes the golden files, every one of them must give their outputs
+def make_extractors(card_pages: dict) -> dict:
+  pairings = {
+    "extract_pairings": lambda page: extract_pairings(full_soup(page["html"])),
+    "parse_pairings_html": lambda page: parse_pairings_html(page["html"])
+  }
+  return {
+    "listing": {
+      "extract_tournament_list_page": lambda page: extract_tournament_list_page(full_soup(page["html"])),
+      "parse_tournament_list_html": lambda page: parse_tournament_list_html(page["html"])
+    },
+    "standings": {
+      "extract_standings": lambda page: extract_standings(full_soup(page["html"])),
+      "parse_standings_html": lambda page: parse_standings_html(page["html"])
+    },
+    "table_pairings": pairings,
+    "bracket_pairings": pairings,
+    "decklist": {
+      "extract_decklist": lambda page: extract_decklist(full_soup(page["html"])),
+      "parse_decklist_html": lambda page: parse_decklist_html(page["html"])
+    },
+    "card": {
+      "scrape_card_info": lambda page: scrape_card_info(page["url"], FixtureSession(card_pages)),
+      "parse_card_html": lambda page: parse_card_page(page, card_pages)
+    }
+  }
+
+def to_json(value):
+  if is_dataclass(value):
+    return asdict(value)
+  if isinstance(value, list):
+    return [to_json(item) for item in value]
+  return value
+
+def card_pages_of(fixtures: list) -> dict:
+  return {page["url"]: page["html"] for page in fixtures if page["kind"] in ("card", "card_search")}
+
+def fixture_name(kind: str, url: str) -> str:
+  return kind + "_" + "".join(x if x.isalnum() else "_" for x in url.split("://")[-1]).strip("_")
+
+def load_fixtures(fixtures_dir: str) -> list:
+  manifest_path = os.path.join(fixtures_dir, "manifest.json")
+  if not os.path.exists(manifest_path):
+    raise SystemExit(f"{manifest_path} does not exist, record the fixtures first with: python benchmarks/bench_extractors.py record --fixtures {fixtures_dir}")
+  with open(manifest_path, "r", encoding="utf-8") as f:
+    manifest = json.load(f)
+  for page in manifest:
+    with open(os.path.join(fixtures_dir, page["file"]), "r", encoding="utf-8") as f:
+      page["html"] = f.read()
+  return manifest
+
+def write_fixture(fixtures_dir: str, manifest: list, kind: str, url: str, html: str):
+  name = fixture_name(kind, url)
+  directory = os.path.join(fixtures_dir, kind)
+  if not os.path.exists(directory):
+    os.makedirs(directory)
+  with open(os.path.join(directory, f"{name}.html"), "w", encoding="utf-8") as f:
+    f.write(html)
+  manifest.append({"name": name, "kind": kind, "url": url, "file": f"{kind}/{name}.html"})
+
+# Pick the tournaments of the corpus among the ones in the html cache
+def record_tournaments(fixtures_dir: str, manifest: list, pages_path: str, nb_decklists: int):
+  pages = SqliteCacheStore(pages_path)
+  urls = [url for (url,) in pages.db.execute("SELECT url FROM pages")]
+
+  listing_urls = sorted(url for url in urls if url_class(url) == "listing")
+  if listing_urls:
+    write_fixture(fixtures_dir, manifest, "listing", listing_urls[0], pages.get(listing_urls[0]).html)
+
+  tournaments = {}
+  for url in urls:
+    if url_class(url) == "standings":
+      tournament_id = url.split("/")[2]
+      standings = parse_standings_html(pages.get(url).html)
+      pairings_urls = [u for u in urls if url_class(u) == "pairings" and u.split("/")[2] == tournament_id]
+      decklist_urls = [u for u in urls if url_class(u) == "decklist" and u.split("/")[2] == tournament_id]
+      if len(pairings_urls) > 0 and len(standings) > 0:
+        tournaments[tournament_id] = (url, len(standings), pairings_urls, decklist_urls)
+
+  def is_bracket(tournament_id: str) -> bool:
+    return any(is_bracket_pairing(full_soup(pages.get(u).html)) for u in tournaments[tournament_id][2])
+
+  by_size = sorted(tournaments, key=lambda tournament_id: tournaments[tournament_id][1])
+  swiss = [tournament_id for tournament_id in by_size if not is_bracket(tournament_id)]
+  brackets = [tournament_id for tournament_id in by_size if is_bracket(tournament_id)]
+  chosen = {swiss[0], swiss[-1], brackets[-1]} if swiss and brackets else set(by_size[:1] + by_size[-1:])
+
+  for tournament_id in sorted(chosen):
+    standings_url, nb_players, pairings_urls, decklist_urls = tournaments[tournament_id]
+    print(f"recording tournament {tournament_id} ({nb_players} players, {len(pairings_urls)} pairings pages)")
+    write_fixture(fixtures_dir, manifest, "standings", standings_url, pages.get(standings_url).html)
+    for url in pairings_urls:
+      html = pages.get(url).html
+      write_fixture(fixtures_dir, manifest, "bracket_pairings" if is_bracket_pairing(full_soup(html)) else "table_pairings", url, html)
+    for url in decklist_urls[:nb_decklists]:
+      write_fixture(fixtures_dir, manifest, "decklist", url, pages.get(url).html)
+
+  pages.close()
+
+# Download card pages, and the evolves from search pages they link to
+def record_cards(fixtures_dir: str, manifest: list, card_urls: list):
+  recorded = {}
+
+  class RecordingSession(requests.Session):
+    def get(self, url, **kwargs):
+      response = super().get(url, **kwargs)
+      if response.status_code == 200:
+        recorded[url] = response.text
+      return response
+
+  session = RecordingSession()
+  for url in card_urls:
+    print(f"recording card {url}")
+    scrape_card_info(url, session)
+    time.sleep(1)
+
+  for url, html in recorded.items():
+    write_fixture(fixtures_dir, manifest, "card" if url in card_urls else "card_search", url, html)
+
+# A few Pokémon and Trainer cards played in the tournaments of data/output
+def pick_card_urls(output_dir: str, nb_cards: int) -> list:
+  from output_writer import iter_tournaments
+
+  cards = {"Pok": [], "Tra": []}
+  for tournament in iter_tournaments(output_dir):
+    for player in tournament["players"]:
+      for card in player["decklist"]:
+        urls = cards.get(card["type"][:3])
+        if urls is not None and card["url"] not in urls and len(urls) < nb_cards:
+          urls.append(card["url"])
+    if all(len(urls) >= nb_cards for urls in cards.values()):
+      break
+  return cards["Pok"] + cards["Tra"]
+
+def write_golden(fixtures_dir: str, fixtures: list, extractors: dict):
+  golden_dir = os.path.join(fixtures_dir, "golden")
+  if not os.path.exists(golden_dir):
+    os.makedirs(golden_dir)
+  for page in fixtures:
+    if page["kind"] in extractors:
+      reference = next(iter(extractors[page["kind"]].values()))
+      with open(os.path.join(golden_dir, f"{page['name']}.json"), "w", encoding="utf-8") as f:
+        json.dump(to_json(reference(page)), f, indent=2, ensure_ascii=False)
+
+def run(fixtures_dir: str, min_time: float) -> bool:
+  golden_dir = os.path.join(fixtures_dir, "golden")
+  fixtures = load_fixtures(fixtures_dir)
+  extractors = make_extractors(card_pages_of(fixtures))
+
+  golden = {}
+  for page in fixtures:
+    if page["kind"] in extractors:
+      with open(os.path.join(golden_dir, f"{page['name']}.json"), "r", encoding="utf-8") as f:
+        golden[page["name"]] = json.load(f)
+
+  all_ok = True
+  print(f"{'kind':<18}{'extractor':<32}{'pages':>6}{'pages/s':>10}{'peak KiB':>10}  golden")
+  for kind, kind_extractors in extractors.items():
+    pages = [page for page in fixtures if page["kind"] == kind]
+    if len(pages) == 0:
+      continue
+
+    for name, extract in kind_extractors.items():
+      # Correctness and peak memory on a single pass
+      mismatches = 0
+      tracemalloc.start()
+      for page in pages:
+        if to_json(extract(page)) != golden[page["name"]]:
+          mismatches += 1
+          print(f"  {name} differs from golden output on {page['url']}")
+      _, peak = tracemalloc.get_traced_memory()
+      tracemalloc.stop()
+
+      # Throughput over passes until min_time is reached
+      nb_pages = 0
+      started_at = time.perf_counter()
+      while time.perf_counter() - started_at < min_time:
+        for page in pages:
+          extract(page)
+        nb_pages += len(pages)
+      pages_per_second = nb_pages / (time.perf_counter() - started_at)
+
+      all_ok = all_ok and mismatches == 0
+      print(f"{kind:<18}{name:<32}{len(pages):>6}{pages_per_second:>10.1f}{peak / 1024:>10.0f}  {'ok' if mismatches == 0 else f'{mismatches} mismatches'}")
+
+  return all_ok
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the limitlesstcg extractors on recorded pages")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+  fixtures_parser = argparse.ArgumentParser(add_help=False)
+  fixtures_parser.add_argument("--fixtures", required=True, help="directory of the recorded pages, their manifest.json and golden outputs")
+
+  record_parser = subparsers.add_parser("record", parents=[fixtures_parser], help="record the fixtures and their golden outputs")
+  record_parser.add_argument("--pages", default="cache/pages.sqlite3", help="sqlite html cache filled by scrap1.py")
+  record_parser.add_argument("--decklists", type=int, default=20, help="decklist pages recorded per tournament")
+  record_parser.add_argument("--output-dir", default="data/output", help="tournaments where card urls are picked")
+  record_parser.add_argument("--cards", type=int, default=3, help="Pokémon and Trainer cards to record")
+  record_parser.add_argument("--card-url", action="append", default=[], help="card page to record instead of picking them")
+
+  run_parser = subparsers.add_parser("run", parents=[fixtures_parser], help="benchmark the extractors on the recorded fixtures")
+  run_parser.add_argument("--min-time", type=float, default=1.0, help="seconds spent on each extractor")
+  run_parser.add_argument("--update-golden", action="store_true", help="accept the current outputs of the full tree extractors as golden")
+
+  args = parser.parse_args()
+
+  if args.command == "record":
+    manifest = []
+    record_tournaments(args.fixtures, manifest, args.pages, args.decklists)
+    record_cards(args.fixtures, manifest, args.card_url or pick_card_urls(args.output_dir, args.cards))
+    os.makedirs(args.fixtures, exist_ok=True)
+    with open(os.path.join(args.fixtures, "manifest.json"), "w", encoding="utf-8") as f:
+      json.dump(manifest, f, indent=2)
+    fixtures = load_fixtures(args.fixtures)
+    write_golden(args.fixtures, fixtures, make_extractors(card_pages_of(fixtures)))
+    print(f"{len(manifest)} pages recorded in {args.fixtures}")
+  else:
+    if args.update_golden:
+      fixtures = load_fixtures(args.fixtures)
+      write_golden(args.fixtures, fixtures, make_extractors(card_pages_of(fixtures)))
+    sys.exit(0 if run(args.fixtures, args.min_time) else 1)
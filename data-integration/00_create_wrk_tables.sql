@@ -1,36 +1,164 @@
 -- Table de mapping pour l'anonymisation des joueurs
-DROP TABLE IF EXISTS public.wrk_player_mapping;
-CREATE TABLE public.wrk_player_mapping (
+-- Elle est gardée d'un lancement à l'autre : un joueur garde toujours son ID anonyme
+CREATE TABLE IF NOT EXISTS public.wrk_player_mapping (
   original_player_id varchar PRIMARY KEY,
   anonymous_player_id varchar NOT NULL
 );
 
+-- Numéros des IDs anonymes
+CREATE SEQUENCE IF NOT EXISTS public.wrk_player_mapping_seq;
+
+-- Mappings créés avant la séquence : elle reprend après le plus grand numéro attribué
+SELECT setval('public.wrk_player_mapping_seq', max_id)
+FROM (
+  SELECT COALESCE(MAX(CAST(SUBSTRING(anonymous_player_id FROM 8) AS INTEGER)), 0) AS max_id
+  FROM public.wrk_player_mapping
+  WHERE anonymous_player_id LIKE 'PLAYER_%'
+) AS mapping
+WHERE max_id > (SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM public.wrk_player_mapping_seq);
+
+-- Ordre de sortie des extensions, la plus récente a le plus grand season_order
+-- Une nouvelle extension s'ajoute ici, sans changer le code du chargement
+CREATE TABLE IF NOT EXISTS public.wrk_seasons (
+  season varchar PRIMARY KEY,
+  season_order int NOT NULL UNIQUE
+);
+
+INSERT INTO public.wrk_seasons (season, season_order) VALUES
+  ('P-A', 1),
+  ('A1', 2),
+  ('A1a', 3),
+  ('A2', 4),
+  ('A2a', 5),
+  ('A2b', 6),
+  ('A3', 7),
+  ('A3a', 8)
+ON CONFLICT (season) DO UPDATE SET season_order = EXCLUDED.season_order;
+
+-- Tables créées avant le chargement incrémental, sans clé primaire : elles
+-- sont mises de côté, leurs lignes sont recopiées dans les tables avec clés
+-- plus bas (data/output ne garde que le dernier crawl, l'historique n'est
+-- que dans ces tables). wrk_decklists est reprise avec son partitionnement
+DO $$
+DECLARE
+    legacy_table text;
+BEGIN
+    FOR legacy_table IN
+        SELECT c.relname
+        FROM pg_class AS c
+        JOIN pg_namespace AS n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname IN ('wrk_tournaments', 'wrk_infocards', 'wrk_matches')
+          AND c.relkind = 'r'
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = c.oid AND contype = 'p')
+    LOOP
+        EXECUTE format('ALTER TABLE public.%I RENAME TO %I', legacy_table, legacy_table || '_legacy');
+    END LOOP;
+END $$;
+
+-- Fichiers déjà chargés (le watermark du chargement incrémental) : un fichier
+-- n'est relu que si sa taille ou sa date de modification a changé, un shard
+-- .ndjson complété est relu à partir de loaded_offset si la partie déjà lue
+-- a toujours la même empreinte (loaded_identity), sinon en entier
+CREATE TABLE IF NOT EXISTS public.wrk_loaded_files (
+  source varchar NOT NULL,
+  file_name varchar NOT NULL,
+  file_size bigint NOT NULL,
+  file_mtime double precision NOT NULL,
+  loaded_offset bigint NOT NULL,
+  loaded_identity varchar NULL,
+  loaded_at timestamp NOT NULL DEFAULT now(),
+  PRIMARY KEY (source, file_name)
+);
+
+-- Fichiers chargés avant l'empreinte : sans elle, un shard est relu en entier
+ALTER TABLE public.wrk_loaded_files ADD COLUMN IF NOT EXISTS loaded_identity varchar NULL;
+
 -- public.tournaments definition
-DROP TABLE IF EXISTS public.wrk_tournaments;
-CREATE TABLE public.wrk_tournaments (
-  tournament_id varchar NULL,
+CREATE TABLE IF NOT EXISTS public.wrk_tournaments (
+  tournament_id varchar PRIMARY KEY,
   tournament_name varchar NULL,
   tournament_date timestamp NULL,
   tournament_organizer varchar NULL,
   tournament_format varchar NULL,
-  tournament_nb_players int NULL
+  tournament_nb_players int NULL,
+  latest_season varchar NULL
 );
 
-DROP TABLE IF EXISTS public.wrk_decklists;
-CREATE TABLE public.wrk_decklists (
-  tournament_id varchar NULL,
-  player_id varchar NULL,
+-- wrk_decklists est partitionnée par saison : une analyse limitée à une
+-- saison ne lit que sa partition. La saison vient de l'URL de la carte, elle
+-- fait partie de la clé comme l'exige le partitionnement sans la changer.
+-- Une wrk_decklists non partitionnée, d'un chargement précédent, est mise de
+-- côté puis recopiée dans les partitions plus bas
+DO $$
+DECLARE
+    constraint_name text;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class AS c
+        JOIN pg_namespace AS n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = 'wrk_decklists' AND c.relkind = 'r'
+    ) THEN
+        ALTER TABLE public.wrk_decklists RENAME TO wrk_decklists_unpartitioned;
+        -- Son index de clé primaire garde son nom, qui revient à la nouvelle table
+        FOR constraint_name IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = 'public.wrk_decklists_unpartitioned'::regclass AND contype = 'p'
+        LOOP
+            EXECUTE format('ALTER TABLE public.wrk_decklists_unpartitioned DROP CONSTRAINT %I', constraint_name);
+        END LOOP;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS public.wrk_decklists (
+  tournament_id varchar NOT NULL,
+  player_id varchar NOT NULL,
   card_type varchar NULL,
   card_name varchar NULL,
-  card_url varchar NULL,
-  card_saison varchar NULL,
+  card_url varchar NOT NULL,
+  card_saison varchar NOT NULL,
   card_booster varchar NULL,
-  card_count int NULL
-);
+  card_count int NULL,
+  PRIMARY KEY (tournament_id, player_id, card_url, card_saison)
+) PARTITION BY LIST (card_saison);
+
+-- Cartes d'une saison absente de wrk_seasons
+CREATE TABLE IF NOT EXISTS public.wrk_decklists_default PARTITION OF public.wrk_decklists DEFAULT;
 
-DROP TABLE IF EXISTS public.wrk_infocards;
-CREATE TABLE public.wrk_infocards (
-  url varchar NULL,
+-- Une partition par saison de wrk_seasons. Les lignes d'une saison ajoutée
+-- depuis le dernier chargement quittent la partition par défaut, qui ne peut
+-- pas garder des lignes d'une autre partition
+DO $$
+DECLARE
+    season_name text;
+    partition_name text;
+BEGIN
+    FOR season_name IN SELECT season FROM public.wrk_seasons ORDER BY season_order LOOP
+        partition_name := 'wrk_decklists_' || lower(regexp_replace(season_name, '[^A-Za-z0-9]+', '_', 'g'));
+        IF to_regclass(format('public.%I', partition_name)) IS NULL THEN
+            EXECUTE format('CREATE TABLE public.%I (LIKE public.wrk_decklists INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format('INSERT INTO public.%I SELECT * FROM public.wrk_decklists_default WHERE card_saison = %L', partition_name, season_name);
+            EXECUTE format('DELETE FROM public.wrk_decklists_default WHERE card_saison = %L', season_name);
+            EXECUTE format('ALTER TABLE public.wrk_decklists ATTACH PARTITION public.%I FOR VALUES IN (%L)', partition_name, season_name);
+        END IF;
+    END LOOP;
+END $$;
+
+-- Migration : les lignes de l'ancienne table rejoignent leurs partitions
+DO $$
+BEGIN
+    IF to_regclass('public.wrk_decklists_unpartitioned') IS NOT NULL THEN
+        INSERT INTO public.wrk_decklists (tournament_id, player_id, card_type, card_name, card_url, card_saison, card_booster, card_count)
+        SELECT tournament_id, player_id, card_type, card_name, card_url, COALESCE(card_saison, ''), card_booster, card_count
+        FROM public.wrk_decklists_unpartitioned
+        WHERE tournament_id IS NOT NULL AND player_id IS NOT NULL AND card_url IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        DROP TABLE public.wrk_decklists_unpartitioned;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS public.wrk_infocards (
+  url varchar PRIMARY KEY,
   nom varchar NULL,
   type_carte varchar NULL,
   sous_type varchar NULL,
@@ -45,23 +173,78 @@ CREATE TABLE public.wrk_infocards (
   retreat int NULL
 );
 
-DROP TABLE IF EXISTS public.wrk_matches;
-CREATE TABLE public.wrk_matches (
-  tournament_id varchar NULL,
+-- match_number : rang du match dans le tournoi
+CREATE TABLE IF NOT EXISTS public.wrk_matches (
+  tournament_id varchar NOT NULL,
+  match_number int NOT NULL,
   idp1 varchar NULL,
   sc1 varchar NULL,
   idp2 varchar NULL,
   sc2 varchar NULL,
   victory_player varchar NULL,
-  loser_player varchar NULL
+  loser_player varchar NULL,
+  PRIMARY KEY (tournament_id, match_number)
 );
 
+-- Migration : les lignes des anciennes tables sans clé, une par clé. Les
+-- matchs reçoivent leur rang dans le tournoi dans l'ordre où ils ont été
+-- insérés ; latest_season est recalculée par le chargement
+DO $$
+BEGIN
+    IF to_regclass('public.wrk_tournaments_legacy') IS NOT NULL THEN
+        INSERT INTO public.wrk_tournaments (tournament_id, tournament_name, tournament_date, tournament_organizer, tournament_format, tournament_nb_players)
+        SELECT DISTINCT ON (tournament_id) tournament_id, tournament_name, tournament_date, tournament_organizer, tournament_format, tournament_nb_players
+        FROM public.wrk_tournaments_legacy
+        WHERE tournament_id IS NOT NULL
+        ORDER BY tournament_id
+        ON CONFLICT DO NOTHING;
+        DROP TABLE public.wrk_tournaments_legacy;
+    END IF;
+
+    IF to_regclass('public.wrk_infocards_legacy') IS NOT NULL THEN
+        INSERT INTO public.wrk_infocards (url, nom, type_carte, sous_type, hp, evolving_stage, evolves_from,
+            competence_1_nom, competence_1_puissance, competence_2_nom, competence_2_puissance, faiblesse, retreat)
+        SELECT DISTINCT ON (url) url, nom, type_carte, sous_type, hp, evolving_stage, evolves_from,
+            competence_1_nom, competence_1_puissance, competence_2_nom, competence_2_puissance, faiblesse, retreat
+        FROM public.wrk_infocards_legacy
+        WHERE url IS NOT NULL
+        ORDER BY url
+        ON CONFLICT DO NOTHING;
+        DROP TABLE public.wrk_infocards_legacy;
+    END IF;
+
+    IF to_regclass('public.wrk_matches_legacy') IS NOT NULL THEN
+        INSERT INTO public.wrk_matches (tournament_id, match_number, idp1, sc1, idp2, sc2, victory_player, loser_player)
+        SELECT tournament_id, row_number() OVER (PARTITION BY tournament_id ORDER BY ctid), idp1, sc1, idp2, sc2, victory_player, loser_player
+        FROM public.wrk_matches_legacy
+        WHERE tournament_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        DROP TABLE public.wrk_matches_legacy;
+    END IF;
+END $$;
+
+-- Index des colonnes de jointure et de filtre : dwh_cards et les cartes
+-- retirées (card_url), les joueurs des decklists et des matchs, les saisons
+-- des tournois. Les recherches par tournoi passent par les clés primaires,
+-- et celles par saison des cartes par les partitions de wrk_decklists
+CREATE INDEX IF NOT EXISTS wrk_tournaments_latest_season_idx ON public.wrk_tournaments (latest_season);
+CREATE INDEX IF NOT EXISTS wrk_decklists_card_url_idx ON public.wrk_decklists (card_url);
+CREATE INDEX IF NOT EXISTS wrk_decklists_player_id_idx ON public.wrk_decklists (player_id);
+CREATE INDEX IF NOT EXISTS wrk_decklists_card_name_idx ON public.wrk_decklists (card_name);
+CREATE INDEX IF NOT EXISTS wrk_matches_victory_player_idx ON public.wrk_matches (tournament_id, victory_player);
+CREATE INDEX IF NOT EXISTS wrk_matches_loser_player_idx ON public.wrk_matches (tournament_id, loser_player);
+CREATE INDEX IF NOT EXISTS wrk_matches_idp1_idx ON public.wrk_matches (idp1);
+CREATE INDEX IF NOT EXISTS wrk_matches_idp2_idx ON public.wrk_matches (idp2);
+CREATE INDEX IF NOT EXISTS wrk_player_mapping_anonymous_player_id_idx ON public.wrk_player_mapping (anonymous_player_id);
+
 -- Fonction pour obtenir ou créer un ID anonymisé
+-- Le chargement anonymise les joueurs par lots (anonymize_player_ids dans main.py),
+-- la fonction reste pour les requêtes ponctuelles
 CREATE OR REPLACE FUNCTION get_anonymous_player_id(original_id varchar) 
 RETURNS varchar AS $$
 DECLARE
     anonymous_id varchar;
-    next_id integer;
+    next_id bigint;
 BEGIN
     -- Chercher si le joueur existe déjà dans la table de mapping
     SELECT anonymous_player_id INTO anonymous_id 
@@ -70,18 +253,20 @@ BEGIN
     
     -- Si le joueur n'existe pas, on crée un nouvel ID
     IF anonymous_id IS NULL THEN
-        -- Obtenir le prochain numéro séquentiel
-        SELECT COALESCE(MAX(CAST(SUBSTRING(anonymous_player_id FROM 8) AS INTEGER)), 0) + 1 
-        INTO next_id 
-        FROM public.wrk_player_mapping 
-        WHERE anonymous_player_id LIKE 'PLAYER_%';
+        -- Obtenir le prochain numéro de la séquence
+        next_id := nextval('public.wrk_player_mapping_seq');
         
-        -- Créer le nouvel ID anonyme
-        anonymous_id := 'PLAYER_' || LPAD(next_id::text, 6, '0');
+        -- Créer le nouvel ID anonyme (au moins 6 chiffres)
+        anonymous_id := 'PLAYER_' || LPAD(next_id::text, GREATEST(6, length(next_id::text)), '0');
         
-        -- Insérer dans la table de mapping
+        -- Insérer dans la table de mapping, un ID créé entre-temps par un autre chargement l'emporte
         INSERT INTO public.wrk_player_mapping (original_player_id, anonymous_player_id) 
-        VALUES (original_id, anonymous_id);
+        VALUES (original_id, anonymous_id)
+        ON CONFLICT (original_player_id) DO NOTHING;
+        
+        SELECT anonymous_player_id INTO anonymous_id 
+        FROM public.wrk_player_mapping 
+        WHERE original_player_id = original_id;
     END IF;
     
     RETURN anonymous_id;
@@ -1,6 +1,61 @@
-DROP TABLE IF EXISTS public.dwh_cards;
+-- Une ligne par carte jouée, mise à jour à chaque chargement au lieu d'être reconstruite
+-- Table créée avant le chargement incrémental, sans clé primaire : elle est reconstruite
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class AS c
+        JOIN pg_namespace AS n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = 'dwh_cards'
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = c.oid AND contype = 'p')
+    ) THEN
+        DROP TABLE public.dwh_cards;
+    END IF;
+END $$;
 
-CREATE TABLE public.dwh_cards AS
-  SELECT DISTINCT a.card_type, a.card_name, a.card_url, a.card_saison, a.card_booster, b.sous_type, b.hp, b.evolving_stage, b.evolves_from, b.competence_1_nom, b.competence_1_puissance, b.competence_2_nom, b.competence_2_puissance, b.faiblesse, b.retreat
+CREATE TABLE IF NOT EXISTS public.dwh_cards (
+  card_type varchar NULL,
+  card_name varchar NULL,
+  card_url varchar PRIMARY KEY,
+  card_saison varchar NULL,
+  card_booster varchar NULL,
+  sous_type varchar NULL,
+  hp int NULL,
+  evolving_stage varchar NULL,
+  evolves_from varchar NULL,
+  competence_1_nom varchar NULL,
+  competence_1_puissance varchar NULL,
+  competence_2_nom varchar NULL,
+  competence_2_puissance varchar NULL,
+  faiblesse varchar NULL,
+  retreat int NULL
+);
+
+CREATE INDEX IF NOT EXISTS dwh_cards_card_name_idx ON public.dwh_cards (card_name);
+CREATE INDEX IF NOT EXISTS dwh_cards_card_saison_idx ON public.dwh_cards (card_saison);
+
+INSERT INTO public.dwh_cards AS c
+  SELECT DISTINCT ON (a.card_url) a.card_type, a.card_name, a.card_url, a.card_saison, a.card_booster, b.sous_type, b.hp, b.evolving_stage, b.evolves_from, b.competence_1_nom, b.competence_1_puissance, b.competence_2_nom, b.competence_2_puissance, b.faiblesse, b.retreat
   FROM public.wrk_decklists as a
   LEFT JOIN wrk_infocards as b ON a.card_url = b.url
+  ORDER BY a.card_url
+ON CONFLICT (card_url) DO UPDATE SET
+  card_type = EXCLUDED.card_type,
+  card_name = EXCLUDED.card_name,
+  card_saison = EXCLUDED.card_saison,
+  card_booster = EXCLUDED.card_booster,
+  sous_type = EXCLUDED.sous_type,
+  hp = EXCLUDED.hp,
+  evolving_stage = EXCLUDED.evolving_stage,
+  evolves_from = EXCLUDED.evolves_from,
+  competence_1_nom = EXCLUDED.competence_1_nom,
+  competence_1_puissance = EXCLUDED.competence_1_puissance,
+  competence_2_nom = EXCLUDED.competence_2_nom,
+  competence_2_puissance = EXCLUDED.competence_2_puissance,
+  faiblesse = EXCLUDED.faiblesse,
+  retreat = EXCLUDED.retreat
+WHERE (c.card_type, c.card_name, c.card_saison, c.card_booster, c.sous_type, c.hp, c.evolving_stage, c.evolves_from, c.competence_1_nom, c.competence_1_puissance, c.competence_2_nom, c.competence_2_puissance, c.faiblesse, c.retreat)
+  IS DISTINCT FROM (EXCLUDED.card_type, EXCLUDED.card_name, EXCLUDED.card_saison, EXCLUDED.card_booster, EXCLUDED.sous_type, EXCLUDED.hp, EXCLUDED.evolving_stage, EXCLUDED.evolves_from, EXCLUDED.competence_1_nom, EXCLUDED.competence_1_puissance, EXCLUDED.competence_2_nom, EXCLUDED.competence_2_puissance, EXCLUDED.faiblesse, EXCLUDED.retreat);
+
+-- Cartes qui ne sont plus jouées dans aucun tournoi chargé
+DELETE FROM public.dwh_cards AS c
+WHERE NOT EXISTS (SELECT 1 FROM public.wrk_decklists AS a WHERE a.card_url = c.card_url);
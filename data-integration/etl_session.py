@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+class EtlSession:
+    """
+    Connexions partagées par les étapes du chargement
+
+    Par défaut les étapes prennent leurs connexions dans un pool, chacune
+    valide ses propres transactions, et les étapes indépendantes peuvent
+    tourner en parallèle sur des connexions différentes.
+
+    Avec single_transaction, tout le chargement passe par une seule connexion
+    et une seule transaction, validée à la fin de la session ou annulée à la
+    première erreur : un échec en cours de route ne laisse pas l'entrepôt à
+    moitié chargé. Les étapes tournent alors l'une après l'autre.
+    """
+
+    def __init__(self, conninfo: str, single_transaction: bool = False, max_connections: int = 6):
+        self.single_transaction = single_transaction
+        self.pool = ConnectionPool(
+            conninfo,
+            min_size=1,
+            max_size=max_connections,
+            reset=self.reset_connection,
+            open=True,
+            name="etl"
+        )
+        self.transaction_conn: Optional[psycopg.Connection] = None
+        if single_transaction:
+            self.transaction_conn = self.pool.getconn()
+            logger.info("Chargement dans une transaction unique")
+
+    @staticmethod
+    def reset_connection(conn: psycopg.Connection) -> None:
+        """Une connexion rendue au pool repasse en mode transactionnel"""
+        conn.autocommit = False
+
+    @contextmanager
+    def connection(self, autocommit: bool = False) -> Iterator[psycopg.Connection]:
+        """
+        Connexion pour une étape : prise dans le pool et validée à la fin du
+        bloc, ou la connexion de la transaction unique, validée à la fin de
+        la session (autocommit est alors ignoré)
+        """
+        if self.transaction_conn is not None:
+            yield self.transaction_conn
+            return
+
+        with self.pool.connection() as conn:
+            if autocommit:
+                conn.autocommit = True
+            yield conn
+
+    def run_parallel(self, *stages: Callable[[], None]) -> None:
+        """
+        Exécute des étapes indépendantes en même temps, chacune sur ses propres
+        connexions ; l'une après l'autre dans une transaction unique
+        """
+        if self.single_transaction:
+            for stage in stages:
+                stage()
+            return
+
+        with ThreadPoolExecutor(len(stages), thread_name_prefix="etl") as executor:
+            futures = [executor.submit(stage) for stage in stages]
+            # Attendre toutes les étapes avant de remonter la première erreur
+            errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self, success: bool = True) -> None:
+        """Valide ou annule la transaction unique, puis ferme le pool"""
+        try:
+            if self.transaction_conn is not None:
+                if success:
+                    self.transaction_conn.commit()
+                    logger.info("Transaction unique validée")
+                else:
+                    self.transaction_conn.rollback()
+                    logger.warning("Transaction unique annulée, l'entrepôt n'a pas été modifié")
+                self.pool.putconn(self.transaction_conn)
+                self.transaction_conn = None
+        finally:
+            self.pool.close()
+
+    def __enter__(self) -> "EtlSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(success=exc_type is None)
@@ -1,12 +1,16 @@
+import argparse
 import os
 import sys
 import psycopg
-import time
+from psycopg import sql
+from etl_session import EtlSession
 import json
+import hashlib
 import re
 import logging
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 
 # Configuration du logging
 logging.basicConfig(
@@ -35,6 +39,56 @@ output_directory_sample = "data/output"
 #output_directory_sample = r"D:\git_a_supr\SAE_6_01_VCOD_Cochet_Lebreton_Ouattara_Verly_Lagadec\data_collection\sample_output"
 output_directory_scrapped = "data/output_added/json"
 
+# Octets du début et de la fin de la partie chargée d'un shard .ndjson
+# comparés avant de reprendre sa lecture
+identity_head_size = 65536
+identity_tail_size = 4096
+
+# Colonnes des tables de travail et leur type PostgreSQL, dans l'ordre de 00_create_wrk_tables.sql
+wrk_tournaments_columns = [
+    ("tournament_id", "varchar"),
+    ("tournament_name", "varchar"),
+    ("tournament_date", "timestamp"),
+    ("tournament_organizer", "varchar"),
+    ("tournament_format", "varchar"),
+    ("tournament_nb_players", "int4")
+]
+wrk_decklists_columns = [
+    ("tournament_id", "varchar"),
+    ("player_id", "varchar"),
+    ("card_type", "varchar"),
+    ("card_name", "varchar"),
+    ("card_url", "varchar"),
+    ("card_saison", "varchar"),
+    ("card_booster", "varchar"),
+    ("card_count", "int4")
+]
+wrk_infocards_columns = [
+    ("url", "varchar"),
+    ("nom", "varchar"),
+    ("type_carte", "varchar"),
+    ("sous_type", "varchar"),
+    ("hp", "int4"),
+    ("evolving_stage", "varchar"),
+    ("evolves_from", "varchar"),
+    ("competence_1_nom", "varchar"),
+    ("competence_1_puissance", "varchar"),
+    ("competence_2_nom", "varchar"),
+    ("competence_2_puissance", "varchar"),
+    ("faiblesse", "varchar"),
+    ("retreat", "int4")
+]
+wrk_matches_columns = [
+    ("tournament_id", "varchar"),
+    ("match_number", "int4"),
+    ("idp1", "varchar"),
+    ("sc1", "varchar"),
+    ("idp2", "varchar"),
+    ("sc2", "varchar"),
+    ("victory_player", "varchar"),
+    ("loser_player", "varchar")
+]
+
 def get_connection_string() -> str:
     """Génère la chaîne de connexion PostgreSQL"""
     try:
@@ -48,7 +102,7 @@ def get_connection_string() -> str:
         logger.error(f"Erreur lors de la génération de la chaîne de connexion : {e}")
         raise
 
-def execute_sql_script(path: str) -> None:
+def execute_sql_script(path: str, session: EtlSession) -> None:
     """Exécute un script SQL depuis un fichier"""
     try:
         logger.info(f"Début d'exécution du script SQL : {path}")
@@ -56,7 +110,7 @@ def execute_sql_script(path: str) -> None:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Le fichier SQL {path} n'existe pas")
         
-        with psycopg.connect(get_connection_string()) as conn:
+        with session.connection() as conn:
             with conn.cursor() as cur:
                 with open(path, 'r', encoding='utf-8') as f:
                     script_content = f.read()
@@ -92,249 +146,545 @@ def clean_text(text: Optional[str]) -> Optional[str]:
         logger.warning(f"Erreur lors du nettoyage du texte '{text}' : {e}")
         return text
 
-def load_json_files(directory: str) -> List[dict]:
-    """Charge tous les fichiers JSON d'un répertoire"""
-    try:
-        logger.info(f"Chargement des fichiers JSON depuis : {directory}")
-        
-        if not os.path.exists(directory):
-            raise FileNotFoundError(f"Le répertoire {directory} n'existe pas")
-        
-        files = [f for f in os.listdir(directory) if f.endswith('.json')]
-        logger.info(f"Trouvé {len(files)} fichiers JSON dans {directory}")
-        
-        json_data = []
-        for file in files:
-            try:
-                file_path = os.path.join(directory, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Nettoyage des caractères Unicode
-                    content = re.sub(r'\\u00e9', 'e', content)
-                    data = json.loads(content)
-                    json_data.append(data)
-                    logger.debug(f"Fichier {file} chargé avec succès")
-            except json.JSONDecodeError as e:
-                logger.error(f"Erreur JSON dans le fichier {file} : {e}")
-                continue
-            except Exception as e:
-                logger.error(f"Erreur lors du chargement de {file} : {e}")
-                continue
-        
-        logger.info(f"Chargement terminé : {len(json_data)} fichiers traités avec succès")
-        return json_data
-        
-    except Exception as e:
-        logger.error(f"Erreur lors du chargement des fichiers JSON : {e}")
-        raise
+def parse_json_content(content: str):
+    """Décode un document JSON après nettoyage des caractères Unicode"""
+    content = content.replace('\\u00e9', 'e')
+    return json.loads(content)
+
+def iter_json_documents(directory: str, files: Optional[Dict[str, int]] = None, loaded_files: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Parcourt un par un les documents JSON d'un répertoire (.json et lignes des shards .ndjson)
+
+    files limite la lecture à certains fichiers, lus à partir d'un offset
+    (nom -> offset). loaded_files reçoit, pour chaque fichier lu, sa taille,
+    sa date de modification, l'offset où la lecture s'est arrêtée et, pour
+    un shard .ndjson, l'empreinte de la partie lue (loaded_identity).
+    """
+    logger.info(f"Lecture des fichiers JSON depuis : {directory}")
+    
+    if not os.path.exists(directory):
+        raise FileNotFoundError(f"Le répertoire {directory} n'existe pas")
+    
+    names = sorted(f for f in os.listdir(directory) if f.endswith('.json') or f.endswith('.ndjson'))
+    if files is not None:
+        names = [f for f in names if f in files]
+    logger.info(f"Trouvé {len(names)} fichiers JSON dans {directory}")
+    
+    nb_documents = 0
+    for file in names:
+        file_path = os.path.join(directory, file)
+        try:
+            stat = os.stat(file_path)
+            offset = files.get(file, 0) if files is not None else 0
+            
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                # Un seul document par .json, un tournoi par ligne dans les shards .ndjson
+                contents = [f.read()] if file.endswith('.json') else f
+                
+                for line_number, content in enumerate(contents, 1):
+                    # Une dernière ligne sans retour à la ligne est en cours d'écriture,
+                    # elle sera lue au prochain chargement
+                    if file.endswith('.ndjson') and not content.endswith(b'\n'):
+                        break
+                    offset += len(content)
+                    
+                    if not content.strip():
+                        continue
+                    try:
+                        data = parse_json_content(content.decode('utf-8'))
+                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                        logger.error(f"Erreur JSON dans le fichier {file} (document {line_number}) : {e}")
+                        continue
+                    nb_documents += 1
+                    yield data
+            
+            if loaded_files is not None:
+                identity = loaded_identity(file_path, offset) if file.endswith('.ndjson') else None
+                loaded_files[file] = (stat.st_size, stat.st_mtime, offset, identity)
+            logger.debug(f"Fichier {file} chargé avec succès")
+        except (OSError, ValueError) as e:
+            logger.error(f"Erreur lors du chargement de {file} : {e}")
+            continue
+    
+    logger.info(f"Lecture terminée : {nb_documents} documents traités avec succès")
+
+def loaded_identity(file_path: str, offset: int) -> str:
+    """
+    Empreinte des premiers et des derniers octets de la partie d'un fichier
+    lue jusqu'à offset : elle change si le fichier a été recréé sous le même nom
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(min(offset, identity_head_size)))
+        tail_start = max(0, offset - identity_tail_size)
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return f"{offset}:{digest.hexdigest()}"
+
+def get_files_to_load(cursor, source: str, directory: str) -> Dict[str, int]:
+    """
+    Fichiers d'un répertoire nouveaux ou modifiés depuis le dernier chargement,
+    avec l'offset où commencer leur lecture
+
+    Le crawler ne fait qu'ajouter des lignes aux shards .ndjson : un shard qui
+    a grandi est lu après la partie déjà chargée si celle-ci n'a pas changé.
+    Un shard recréé sous le même nom (run.py vide data/output après chaque
+    chargement), comme tout autre fichier modifié, est relu en entier.
+    """
+    if not os.path.exists(directory):
+        raise FileNotFoundError(f"Le répertoire {directory} n'existe pas")
+    
+    cursor.execute(
+        "SELECT file_name, file_size, file_mtime, loaded_offset, loaded_identity FROM public.wrk_loaded_files WHERE source = %s",
+        (source,)
+    )
+    loaded = {name: (size, mtime, offset, identity) for name, size, mtime, offset, identity in cursor.fetchall()}
+    
+    files = {}
+    for file in sorted(os.listdir(directory)):
+        if not (file.endswith('.json') or file.endswith('.ndjson')):
+            continue
+        file_path = os.path.join(directory, file)
+        stat = os.stat(file_path)
+        previous = loaded.get(file)
+        
+        if previous is None:
+            files[file] = 0
+        elif previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+            continue
+        elif (file.endswith('.ndjson') and stat.st_size >= previous[2]
+                and previous[3] == loaded_identity(file_path, previous[2])):
+            files[file] = previous[2]
+        else:
+            files[file] = 0
+    
+    logger.info(f"{len(files)} fichiers nouveaux ou modifiés dans {directory}, {len(loaded)} déjà chargés")
+    return files
+
+def record_loaded_files(cursor, source: str, loaded_files: dict) -> None:
+    """Enregistre les fichiers chargés, le prochain chargement ne relira que ce qui a changé depuis"""
+    cursor.executemany("""
+        INSERT INTO public.wrk_loaded_files (source, file_name, file_size, file_mtime, loaded_offset, loaded_identity, loaded_at)
+        VALUES (%s, %s, %s, %s, %s, %s, now())
+        ON CONFLICT (source, file_name) DO UPDATE SET
+            file_size = EXCLUDED.file_size,
+            file_mtime = EXCLUDED.file_mtime,
+            loaded_offset = EXCLUDED.loaded_offset,
+            loaded_identity = EXCLUDED.loaded_identity,
+            loaded_at = EXCLUDED.loaded_at
+    """, [(source, file, size, mtime, offset, identity) for file, (size, mtime, offset, identity) in loaded_files.items()])
+
+def reset_wrk_tables(session: EtlSession) -> None:
+    """
+    Vide les tables de travail et oublie les fichiers chargés, pour tout
+    recharger ; le mapping des joueurs est gardé
+
+    run.py supprime data/output après chaque chargement et un crawl
+    --incremental n'y écrit que les nouveaux tournois : l'historique n'est
+    alors que dans wrk_tournaments. Le rechargement est refusé si un tournoi
+    déjà chargé manque dans data/output.
+    """
+    output_ids = {document.get('id') for document in iter_json_documents(output_directory_sample)}
+    with session.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT tournament_id FROM public.wrk_tournaments")
+            missing_ids = [tournament_id for (tournament_id,) in cur if tournament_id not in output_ids]
+    if missing_ids:
+        raise RuntimeError(
+            f"Rechargement complet refusé : {len(missing_ids)} tournois chargés manquent dans "
+            f"{output_directory_sample} (par exemple {', '.join(sorted(missing_ids)[:5])}). "
+            "Relancez le crawl sans --incremental pour y réécrire tout l'historique"
+        )
+    
+    logger.info("Rechargement complet : les tables de travail sont vidées")
+    with session.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                TRUNCATE public.wrk_tournaments, public.wrk_decklists, public.wrk_matches,
+                    public.wrk_infocards, public.wrk_loaded_files
+            """)
+
+@contextmanager
+def open_copy(cur, table: str, columns: List[Tuple[str, str]], binary: bool = True) -> Iterator[psycopg.Copy]:
+    """
+    Ouvre un COPY ... FROM STDIN vers une table, les lignes sont envoyées au
+    serveur au fur et à mesure avec write_row. En binaire, chaque valeur doit
+    être du type Python de sa colonne (str pour varchar, int pour int4,
+    datetime pour timestamp).
+    """
+    statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT {})").format(
+        sql.Identifier(*table.split('.')),
+        sql.SQL(', ').join(sql.Identifier(name) for name, _ in columns),
+        sql.SQL('BINARY' if binary else 'TEXT')
+    )
+    
+    with cur.copy(statement) as copy:
+        if binary:
+            copy.set_types([column_type for _, column_type in columns])
+        yield copy
+
+class BufferedCopy:
+    """
+    Remplace un COPY ouvert quand plusieurs tables sont chargées sur la même
+    connexion, qui ne peut avoir qu'un COPY en cours : les lignes sont gardées
+    en mémoire et envoyées par lots de batch_size
+    """
+
+    def __init__(self, cur, table: str, columns: List[Tuple[str, str]], batch_size: int = 50000):
+        self.cur = cur
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write_row(self, row: tuple) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        with open_copy(self.cur, self.table, self.columns) as copy:
+            for row in self.rows:
+                copy.write_row(row)
+        self.rows = []
 
-def insert_wrk_tournaments() -> None:
-    """Insère les données de tournois dans la table wrk_tournaments"""
+@contextmanager
+def open_merge_copy(cur, table: str, columns: List[Tuple[str, str]], key: List[str], scope: Optional[str] = None, buffered: bool = False) -> Iterator[psycopg.Copy]:
+    """
+    COPY vers une table temporaire fusionnée dans la table à la fin du bloc
+
+    Les lignes nouvelles sont insérées et les lignes existantes mises à jour
+    si elles ont changé (INSERT ... ON CONFLICT sur la clé). Avec scope, les
+    lignes de la table dont la valeur de scope a été chargée mais qui ne sont
+    plus dans le chargement sont supprimées : un tournoi rechargé remplace
+    toutes ses lignes. Avec buffered, les lignes sont envoyées par lots
+    (BufferedCopy) et la connexion reste libre entre deux lots.
+    """
+    schema, name = table.split('.')
+    target = sql.Identifier(schema, name)
+    staging = sql.Identifier(f"stg_{name}")
+    column_names = [column for column, _ in columns]
+    column_list = sql.SQL(', ').join(map(sql.Identifier, column_names))
+    key_list = sql.SQL(', ').join(map(sql.Identifier, key))
+    
+    # Sans les contraintes de la table : les lignes sans clé sont écartées à la fusion
+    cur.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(staging, column_list, target))
+    if buffered:
+        copy = BufferedCopy(cur, f"pg_temp.stg_{name}", columns)
+        yield copy
+        copy.flush()
+    else:
+        with open_copy(cur, f"pg_temp.stg_{name}", columns) as copy:
+            yield copy
+    
+    updated_columns = [column for column in column_names if column not in key]
+    if updated_columns:
+        on_conflict = sql.SQL("DO UPDATE SET {assignments} WHERE ({current}) IS DISTINCT FROM ({excluded})").format(
+            assignments=sql.SQL(', ').join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column)) for column in updated_columns),
+            current=sql.SQL(', ').join(sql.SQL("t.{}").format(sql.Identifier(column)) for column in updated_columns),
+            excluded=sql.SQL(', ').join(sql.SQL("EXCLUDED.{}").format(sql.Identifier(column)) for column in updated_columns)
+        )
+    else:
+        on_conflict = sql.SQL("DO NOTHING")
+    
+    # La suppression et la fusion partent ensemble en mode pipeline, sans attendre l'une pour envoyer l'autre
+    delete_cur = cur.connection.cursor()
+    with cur.connection.pipeline():
+        if scope is not None:
+            delete_cur.execute(sql.SQL("""
+                DELETE FROM {target} AS t
+                WHERE t.{scope} IN (SELECT {scope} FROM {staging})
+                  AND NOT EXISTS (SELECT 1 FROM {staging} AS s WHERE {key_match})
+            """).format(
+                target=target,
+                staging=staging,
+                scope=sql.Identifier(scope),
+                key_match=sql.SQL(' AND ').join(sql.SQL("s.{0} = t.{0}").format(sql.Identifier(column)) for column in key)
+            ))
+        
+        # Une clé chargée deux fois ne garde qu'une ligne, ON CONFLICT ne peut pas modifier une ligne deux fois
+        cur.execute(sql.SQL("""
+            INSERT INTO {target} AS t ({columns})
+            SELECT DISTINCT ON ({key}) {columns} FROM {staging}
+            WHERE {key_not_null}
+            ON CONFLICT ({key}) {on_conflict}
+        """).format(
+            target=target,
+            staging=staging,
+            columns=column_list,
+            key=key_list,
+            key_not_null=sql.SQL(' AND ').join(sql.SQL("{} IS NOT NULL").format(sql.Identifier(column)) for column in key),
+            on_conflict=on_conflict
+        ))
+    
+    nb_deleted = delete_cur.rowcount if scope is not None else 0
+    delete_cur.close()
+    logger.info(f"{table} : {cur.rowcount} lignes insérées ou mises à jour, {nb_deleted} supprimées")
+
+def to_text(value) -> Optional[str]:
+    """Convertit une valeur pour une colonne varchar chargée en binaire"""
+    return value if value is None or isinstance(value, str) else str(value)
+
+def load_player_mapping(cursor) -> dict:
+    """Charge en mémoire le mapping des joueurs déjà anonymisés (ID d'origine -> ID anonyme)"""
+    cursor.execute("SELECT original_player_id, anonymous_player_id FROM public.wrk_player_mapping")
+    mapping = dict(cursor.fetchall())
+    logger.info(f"{len(mapping)} joueurs déjà anonymisés")
+    return mapping
+
+def anonymize_player_ids(player_ids: Iterable[str], cursor, mapping: dict) -> dict:
+    """
+    Anonymise en une seule requête les joueurs absents du mapping en mémoire
+
+    Les nouveaux numéros viennent de la séquence wrk_player_mapping_seq ; un
+    joueur déjà dans la table, même ajouté entre-temps par un autre
+    chargement, garde son ID anonyme. Le mapping est complété et renvoyé.
+    """
+    # Triés pour que deux chargements simultanés verrouillent les lignes dans le même ordre
+    new_ids = sorted({player_id for player_id in player_ids if player_id is not None and player_id not in mapping})
+    if not new_ids:
+        return mapping
+    
+    cursor.execute("""
+        INSERT INTO public.wrk_player_mapping (original_player_id, anonymous_player_id)
+        SELECT original_player_id, 'PLAYER_' || LPAD(next_id::text, GREATEST(6, length(next_id::text)), '0')
+        FROM (
+            SELECT original_player_id, nextval('public.wrk_player_mapping_seq') AS next_id
+            FROM unnest(%s::varchar[]) AS new_players(original_player_id)
+        ) AS numbered
+        ON CONFLICT (original_player_id) DO UPDATE SET original_player_id = EXCLUDED.original_player_id
+        RETURNING original_player_id, anonymous_player_id
+    """, (new_ids,))
+    mapping.update(cursor.fetchall())
+    return mapping
+
+def tournament_row(tournament: dict) -> Optional[tuple]:
+    """Ligne de wrk_tournaments d'un tournoi, None si ses données sont invalides"""
     try:
-        logger.info("Début d'insertion des données de tournois")
-        
-        tournaments = load_json_files(output_directory_sample)
-        tournament_data = []
+        return (
+            tournament['id'], 
+            clean_text(tournament['name']), 
+            datetime.strptime(tournament['date'], '%Y-%m-%dT%H:%M:%S.000Z'),
+            clean_text(tournament['organizer']), 
+            clean_text(tournament['format']), 
+            int(tournament['nb_players'])
+        )
+    except KeyError as e:
+        logger.warning(f"Clé manquante dans le tournoi {tournament.get('id', 'unknown')} : {e}")
+    except ValueError as e:
+        logger.warning(f"Erreur de conversion pour le tournoi {tournament.get('id', 'unknown')} : {e}")
+    return None
+
+def decklist_rows(tournament: dict, player_mapping: dict) -> Iterator[tuple]:
+    """Lignes de wrk_decklists d'un tournoi, une par carte de chaque joueur, avec les IDs anonymisés"""
+    tournament_id = tournament.get('id')
+    
+    for player in tournament.get('players', []):
+        original_player_id = player.get('id')
+        anonymous_player_id = player_mapping.get(original_player_id, original_player_id)
         
-        for tournament in tournaments:
+        for card in player.get('decklist', []):
             try:
-                tournament_data.append((
-                    tournament['id'], 
-                    clean_text(tournament['name']), 
-                    datetime.strptime(tournament['date'], '%Y-%m-%dT%H:%M:%S.000Z'),
-                    clean_text(tournament['organizer']), 
-                    clean_text(tournament['format']), 
-                    int(tournament['nb_players'])
-                ))
-            except KeyError as e:
-                logger.warning(f"Clé manquante dans le tournoi {tournament.get('id', 'unknown')} : {e}")
+                card_url = card.get('url', '')
+                url_parts = card_url.split('/cards/')
+                if len(url_parts) > 1:
+                    saison_booster = url_parts[-1].split('/')
+                    saison = saison_booster[0] if len(saison_booster) > 0 else ''
+                    booster = saison_booster[1] if len(saison_booster) > 1 else ''
+                else:
+                    saison = ''
+                    booster = ''
+                
+                yield (
+                    tournament_id,
+                    anonymous_player_id,  # ID anonymisé
+                    clean_text(card.get('type', '')),
+                    clean_text(card.get('name', '')),
+                    card_url,
+                    saison,
+                    booster,
+                    int(card.get('count', 0))
+                )
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Erreur dans les données de carte (tournoi {tournament_id}, joueur {original_player_id}) : {e}")
                 continue
-            except ValueError as e:
-                logger.warning(f"Erreur de conversion pour le tournoi {tournament.get('id', 'unknown')} : {e}")
+
+def match_rows(tournament: dict, player_mapping: dict) -> Iterator[tuple]:
+    """Lignes de wrk_matches d'un tournoi, avec les IDs anonymisés"""
+    tournament_id = tournament.get('id')
+    
+    # Le rang du match dans le tournoi est sa clé avec l'ID du tournoi
+    for match_number, match in enumerate(tournament.get('matches', []), 1):
+        try:
+            # Récupération des résultats du match depuis 'match_results'
+            match_results = match.get('match_results', [])
+            
+            if len(match_results) < 2:
+                logger.warning(f"Match incomplet dans le tournoi {tournament_id}: moins de 2 joueurs")
                 continue
-        
-        logger.info(f"Préparation de {len(tournament_data)} tournois pour insertion")
-        
-        with psycopg.connect(get_connection_string()) as conn:
-            with conn.cursor() as cur:
-                cur.executemany(
-                    "INSERT INTO public.wrk_tournaments VALUES (%s, %s, %s, %s, %s, %s)", 
-                    tournament_data
-                )
-        
-        logger.info(f"Insertion réussie de {len(tournament_data)} tournois")
-        
-    except Exception as e:
-        logger.error(f"Erreur lors de l'insertion des tournois : {e}")
-        raise
+            
+            # Récupération des données des deux joueurs
+            player1 = match_results[0]
+            player2 = match_results[1]
+            
+            # IDs anonymisés des joueurs
+            original_idp1 = player1['player_id']
+            original_idp2 = player2['player_id']
+            
+            idp1 = player_mapping.get(original_idp1, original_idp1)
+            idp2 = player_mapping.get(original_idp2, original_idp2)
+            
+            sc1 = player1['score']
+            sc2 = player2['score']
+            
+            # Détermination du gagnant (avec IDs anonymisés)
+            if sc1 > sc2:
+                victory_player = idp1
+                loser_player = idp2
+            elif sc2 > sc1: 
+                victory_player = idp2    
+                loser_player = idp1     
+            else:
+                victory_player = "No winner"
+                loser_player = "No loser"
+            
+            # Les scores sont des varchar dans wrk_matches
+            yield (
+                tournament_id,
+                match_number,
+                idp1,
+                to_text(sc1),
+                idp2,
+                to_text(sc2),
+                victory_player,
+                loser_player
+            )
+            
+        except (KeyError, IndexError) as e:
+            logger.warning(f"Erreur dans les données de match (tournoi {tournament_id}) : {e}")
+            continue
+        except Exception as e:
+            logger.warning(f"Erreur inattendue dans le match (tournoi {tournament_id}) : {e}")
+            continue
 
-def anonymize_player_id(player_id: str, cursor) -> str:
-    """Anonymise un ID de joueur en utilisant la fonction SQL"""
-    try:
-        cursor.execute("SELECT get_anonymous_player_id(%s)", (player_id,))
-        result = cursor.fetchone()
-        return result[0] if result else player_id
-    except Exception as e:
-        logger.warning(f"Erreur lors de l'anonymisation du joueur {player_id} : {e}")
-        return player_id
+def tournament_player_ids(tournament: dict) -> Iterator[str]:
+    """IDs d'origine des joueurs d'un tournoi, dans les decklists et dans les matchs"""
+    for player in tournament.get('players', []):
+        yield player.get('id')
+    for match in tournament.get('matches', []):
+        for result in match.get('match_results', []):
+            yield result.get('player_id')
 
-def insert_wrk_decklists() -> None:
-    """Insère les données de decklists dans la table wrk_decklists avec anonymisation"""
-    try:
-        logger.info("Début d'insertion des données de decklists avec anonymisation")
-        
-        tournaments = load_json_files(output_directory_sample)
-        decklist_data = []
-        total_cards = 0
-        
-        with psycopg.connect(get_connection_string()) as conn:
-            with conn.cursor() as cur:
-                for tournament in tournaments:
-                    tournament_id = tournament.get('id')
-                    players = tournament.get('players', [])
-                    
-                    for player in players:
-                        original_player_id = player.get('id')
-                        # Anonymisation du player_id
-                        anonymous_player_id = anonymize_player_id(original_player_id, cur)
-                        
-                        decklist = player.get('decklist', [])
-                        total_cards += len(decklist)
-                        
-                        for card in decklist:
-                            try:
-                                card_url = card.get('url', '')
-                                url_parts = card_url.split('/cards/')
-                                if len(url_parts) > 1:
-                                    saison_booster = url_parts[-1].split('/')
-                                    saison = saison_booster[0] if len(saison_booster) > 0 else ''
-                                    booster = saison_booster[1] if len(saison_booster) > 1 else ''
-                                else:
-                                    saison = ''
-                                    booster = ''
-                                
-                                decklist_data.append((
-                                    tournament_id,
-                                    anonymous_player_id,  # ID anonymisé
-                                    clean_text(card.get('type', '')),
-                                    clean_text(card.get('name', '')),
-                                    card_url,
-                                    saison,
-                                    booster,
-                                    int(card.get('count', 0))
-                                ))
-                            except (ValueError, KeyError) as e:
-                                logger.warning(f"Erreur dans les données de carte (tournoi {tournament_id}, joueur {original_player_id}) : {e}")
-                                continue
-                
-                logger.info(f"Traitement de {total_cards} cartes, {len(decklist_data)} valides pour insertion")
-                
-                cur.executemany(
-                    "INSERT INTO public.wrk_decklists VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", 
-                    decklist_data
-                )
-        
-        logger.info(f"Insertion réussie de {len(decklist_data)} entrées de decklist anonymisées")
-        
-    except Exception as e:
-        logger.error(f"Erreur lors de l'insertion des decklists : {e}")
-        raise
+def insert_wrk_tournament_data(session: EtlSession) -> None:
+    """
+    Charge en un seul passage les tournois, les decklists et les matchs dans
+    wrk_tournaments, wrk_decklists et wrk_matches, avec anonymisation
 
-def insert_wrk_matches() -> None:
-    """Insère les données de matchs dans la table wrk_matches avec anonymisation"""
+    Seuls les fichiers nouveaux ou modifiés depuis le dernier chargement sont
+    lus. Chaque tournoi est décodé une seule fois, puis ses lignes sont
+    réparties entre trois COPY ouverts en même temps sur trois connexions et
+    fusionnées dans les tables : la mémoire utilisée reste celle d'un tournoi,
+    et un tournoi rechargé remplace ses lignes. Dans une transaction unique,
+    les trois tables partagent la connexion et leurs lignes sont envoyées par lots.
+    """
     try:
-        logger.info("Début d'insertion des données de matchs avec anonymisation")
+        logger.info("Début d'insertion des tournois, decklists et matchs avec anonymisation")
         
-        tournaments = load_json_files(output_directory_sample)
-        matches_data = []
+        with session.connection() as conn:
+            with conn.cursor() as cur:
+                files = get_files_to_load(cur, 'tournaments', output_directory_sample)
+        if not files:
+            logger.info("Aucun fichier de tournois nouveau ou modifié, rien à charger")
+            return
+        
+        nb_tournaments = 0
+        nb_decklist_rows = 0
+        nb_match_rows = 0
+        total_cards = 0
         total_matches = 0
+        loaded_files = {}
+        buffered = session.single_transaction
         
-        with psycopg.connect(get_connection_string()) as conn:
-            with conn.cursor() as cur:
-                for tournament in tournaments:
-                    tournament_id = tournament.get('id')
-                    matches = tournament.get('matches', [])
-                    total_matches += len(matches)
-                    
-                    for match in matches:
-                        try:
-                            # Récupération des résultats du match depuis 'match_results'
-                            match_results = match.get('match_results', [])
-                            
-                            if len(match_results) < 2:
-                                logger.warning(f"Match incomplet dans le tournoi {tournament_id}: moins de 2 joueurs")
-                                continue
-                            
-                            # Récupération des données des deux joueurs
-                            player1 = match_results[0]
-                            player2 = match_results[1]
-                            
-                            # Anonymisation des IDs des joueurs
-                            original_idp1 = player1['player_id']
-                            original_idp2 = player2['player_id']
-                            
-                            idp1 = anonymize_player_id(original_idp1, cur)
-                            idp2 = anonymize_player_id(original_idp2, cur)
-                            
-                            sc1 = player1['score']
-                            sc2 = player2['score']
-                            
-                            # Détermination du gagnant (avec IDs anonymisés)
-                            if sc1 > sc2:
-                                victory_player = idp1
-                                loser_player = idp2
-                            elif sc2 > sc1: 
-                                victory_player = idp2    
-                                loser_player = idp1     
-                            else:
-                                victory_player = "No winner"
-                                loser_player = "No loser"
-                            
-                            matches_data.append((
-                                tournament_id,
-                                idp1,
-                                sc1,
-                                idp2,
-                                sc2,
-                                victory_player,
-                                loser_player
-                            ))
-                            
-                        except (KeyError, IndexError) as e:
-                            logger.warning(f"Erreur dans les données de match (tournoi {tournament_id}) : {e}")
-                            continue
-                        except Exception as e:
-                            logger.warning(f"Erreur inattendue dans le match (tournoi {tournament_id}) : {e}")
-                            continue
+        with ExitStack() as stack:
+            if buffered:
+                conn = stack.enter_context(session.connection())
+                tournaments_conn = decklists_conn = matches_conn = mapping_conn = conn
+            else:
+                # Un COPY occupe sa connexion jusqu'à la fin du chargement, les joueurs
+                # sont anonymisés sur une quatrième connexion, en autocommit pour ne pas
+                # garder verrouillés les nouveaux mappings
+                tournaments_conn = stack.enter_context(session.connection())
+                decklists_conn = stack.enter_context(session.connection())
+                matches_conn = stack.enter_context(session.connection())
+                mapping_conn = stack.enter_context(session.connection(autocommit=True))
+            
+            mapping_cur = stack.enter_context(mapping_conn.cursor())
+            tournaments_copy = stack.enter_context(open_merge_copy(
+                tournaments_conn.cursor(), "public.wrk_tournaments", wrk_tournaments_columns,
+                ["tournament_id"], buffered=buffered
+            ))
+            decklists_copy = stack.enter_context(open_merge_copy(
+                decklists_conn.cursor(), "public.wrk_decklists", wrk_decklists_columns,
+                ["tournament_id", "player_id", "card_url", "card_saison"], scope="tournament_id", buffered=buffered
+            ))
+            matches_copy = stack.enter_context(open_merge_copy(
+                matches_conn.cursor(), "public.wrk_matches", wrk_matches_columns,
+                ["tournament_id", "match_number"], scope="tournament_id", buffered=buffered
+            ))
+            player_mapping = load_player_mapping(mapping_cur)
+            
+            for tournament in iter_json_documents(output_directory_sample, files, loaded_files):
+                # Anonymisation en un lot des nouveaux joueurs du tournoi
+                anonymize_player_ids(tournament_player_ids(tournament), mapping_cur, player_mapping)
                 
-                logger.info(f"Traitement de {total_matches} matchs, {len(matches_data)} valides pour insertion")
+                row = tournament_row(tournament)
+                if row is not None:
+                    tournaments_copy.write_row(row)
+                    nb_tournaments += 1
                 
-                cur.executemany(
-                    "INSERT INTO public.wrk_matches VALUES (%s, %s, %s, %s, %s, %s, %s)", 
-                    matches_data
-                )
+                total_cards += sum(len(player.get('decklist', [])) for player in tournament.get('players', []))
+                for row in decklist_rows(tournament, player_mapping):
+                    decklists_copy.write_row(row)
+                    nb_decklist_rows += 1
+                
+                total_matches += len(tournament.get('matches', []))
+                for row in match_rows(tournament, player_mapping):
+                    matches_copy.write_row(row)
+                    nb_match_rows += 1
+        
+        # Les fichiers ne sont notés comme chargés qu'une fois les trois tables validées,
+        # un chargement interrompu entre les deux les relira et les fusionnera à nouveau
+        with session.connection() as conn:
+            with conn.cursor() as cur:
+                record_loaded_files(cur, 'tournaments', loaded_files)
         
-        logger.info(f"Insertion réussie de {len(matches_data)} matchs anonymisés")
+        logger.info(f"Chargement réussi de {nb_tournaments} tournois")
+        logger.info(f"Traitement de {total_cards} cartes, chargement réussi de {nb_decklist_rows} entrées de decklist anonymisées")
+        logger.info(f"Traitement de {total_matches} matchs, chargement réussi de {nb_match_rows} matchs anonymisés")
         
     except Exception as e:
-        logger.error(f"Erreur lors de l'insertion des matchs : {e}")
+        logger.error(f"Erreur lors de l'insertion des tournois, decklists et matchs : {e}")
         raise
 
-def get_anonymization_stats() -> None:
+def get_anonymization_stats(session: EtlSession) -> None:
     """Affiche les statistiques d'anonymisation"""
     try:
-        with psycopg.connect(get_connection_string()) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM public.wrk_player_mapping")
-                total_players = cur.fetchone()[0]
-                
-                cur.execute("""
-                    SELECT anonymous_player_id, original_player_id 
-                    FROM public.wrk_player_mapping 
-                    ORDER BY CAST(SUBSTRING(anonymous_player_id FROM 8) AS INTEGER)
-                    LIMIT 10
-                """)
-                sample_mappings = cur.fetchall()
+        with session.connection() as conn:
+            # Les deux requêtes partent ensemble en mode pipeline
+            with conn.cursor() as count_cur, conn.cursor() as sample_cur:
+                with conn.pipeline():
+                    count_cur.execute("SELECT COUNT(*) FROM public.wrk_player_mapping")
+                    sample_cur.execute("""
+                        SELECT anonymous_player_id, original_player_id 
+                        FROM public.wrk_player_mapping 
+                        ORDER BY CAST(SUBSTRING(anonymous_player_id FROM 8) AS INTEGER)
+                        LIMIT 10
+                    """)
+                total_players = count_cur.fetchone()[0]
+                sample_mappings = sample_cur.fetchall()
                 
                 logger.info(f"=== STATISTIQUES D'ANONYMISATION ===")
                 logger.info(f"Nombre total de joueurs anonymisés : {total_players}")
@@ -346,115 +696,114 @@ def get_anonymization_stats() -> None:
         logger.error(f"Erreur lors de la récupération des statistiques : {e}")
 
 
-def insert_wrk_infocard() -> None:
+def to_array_literal(values) -> Optional[str]:
+    """
+    Liste en littéral de tableau PostgreSQL ('{a,b}', '{}' si vide) pour une
+    colonne varchar chargée en binaire : la forme stockée avant le COPY
+    """
+    if values is None or isinstance(values, str):
+        return values
+    
+    elements = []
+    for value in values:
+        value = str(value)
+        if value == '' or value.upper() == 'NULL' or re.search(r'[{},"\\\s]', value):
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        elements.append(value)
+    return '{' + ','.join(elements) + '}'
+
+def infocard_row(card: dict) -> Optional[tuple]:
+    """Ligne de wrk_infocards d'une carte, None si ses données sont invalides"""
+    try:
+        return (
+            card.get('url', ''),
+            clean_text(card.get('nom', '')),
+            clean_text(card.get('type_carte', '')),
+            clean_text(card.get('sous_type', '')),
+            int(card['hp']) if card.get('hp') is not None and str(card.get('hp')).isdigit() else None,
+            clean_text(card.get('evolving_stage', '')),
+            to_array_literal(card.get('evolves_from', [])),
+            clean_text(card.get('competence_1_nom', '')),
+            to_text(card.get('competence_1_puissance')),
+            clean_text(card.get('competence_2_nom', '')),
+            to_text(card.get('competence_2_puissance')),
+            clean_text(card.get('faiblesse', '')),
+            int(card['retreat']) if card.get('retreat') is not None and str(card.get('retreat')).isdigit() else None
+        )
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Erreur dans les données de carte {card.get('url', 'unknown')} : {e}")
+    return None
+
+def insert_wrk_infocard(session: EtlSession) -> None:
     """Insère les données d'information des cartes dans la table wrk_infocards"""
     try:
         logger.info("Début d'insertion des données d'information des cartes")
         
-        cards_data = load_json_files(output_directory_scrapped)
-        infocard_data = []
-        total_cards = 0
-        
-        for card_file in cards_data:
-            if isinstance(card_file, list):
-                cards = card_file
-            else:
-                cards = [card_file]
-            
-            total_cards += len(cards)
-            
-            for card in cards:
-                try:
-                    infocard_data.append((
-                        card.get('url', ''),
-                        clean_text(card.get('nom', '')),
-                        clean_text(card.get('type_carte', '')),
-                        clean_text(card.get('sous_type', '')),
-                        int(card['hp']) if card.get('hp') is not None and str(card.get('hp')).isdigit() else None,
-                        clean_text(card.get('evolving_stage', '')),
-                        clean_text(card.get('evolves_from', '')),
-                        clean_text(card.get('competence_1_nom', '')),
-                        card.get('competence_1_puissance'),
-                        clean_text(card.get('competence_2_nom', '')),
-                        card.get('competence_2_puissance'),
-                        clean_text(card.get('faiblesse', '')),
-                        int(card['retreat']) if card.get('retreat') is not None and str(card.get('retreat')).isdigit() else None
-                    ))
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"Erreur dans les données de carte {card.get('url', 'unknown')} : {e}")
-                    continue
+        with session.connection() as conn:
+            with conn.cursor() as cur:
+                files = get_files_to_load(cur, 'cards', output_directory_scrapped)
+        if not files:
+            logger.info("Aucun fichier de cartes nouveau ou modifié, rien à charger")
+            return
         
-        logger.info(f"Traitement de {total_cards} cartes, {len(infocard_data)} valides pour insertion")
+        total_cards = 0
+        loaded_files = {}
+        
+        def infocard_rows() -> Iterator[tuple]:
+            nonlocal total_cards
+            for card_file in iter_json_documents(output_directory_scrapped, files, loaded_files):
+                if isinstance(card_file, list):
+                    cards = card_file
+                else:
+                    cards = [card_file]
+                
+                total_cards += len(cards)
+                
+                for card in cards:
+                    row = infocard_row(card)
+                    if row is not None:
+                        yield row
         
-        with psycopg.connect(get_connection_string()) as conn:
+        with session.connection() as conn:
             with conn.cursor() as cur:
-                cur.executemany(
-                    "INSERT INTO public.wrk_infocards VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", 
-                    infocard_data
-                )
+                nb_rows = 0
+                with open_merge_copy(cur, "public.wrk_infocards", wrk_infocards_columns, ["url"]) as copy:
+                    for row in infocard_rows():
+                        copy.write_row(row)
+                        nb_rows += 1
+                # Dans la même transaction que les cartes
+                record_loaded_files(cur, 'cards', loaded_files)
         
-        logger.info(f"Insertion réussie de {len(infocard_data)} informations de cartes")
+        logger.info(f"Traitement de {total_cards} cartes, {nb_rows} valides chargées")
+        logger.info(f"Chargement réussi de {nb_rows} informations de cartes")
         
     except Exception as e:
         logger.error(f"Erreur lors de l'insertion des informations de cartes : {e}")
         raise
         
-def tournament_season():
+def tournament_season(session: EtlSession):
     """Ajoute la saison la plus récente pour chaque tournoi dans la table tournaments"""
     try:
         logger.info("Début de l'ajout des saisons dans la table tournaments")
         
-        season_history = ["P-A", "A1", "A1a", "A2", "A2a", "A2b", "A3", "A3a"]
-        
-        with psycopg.connect(get_connection_string()) as conn:
+        with session.connection() as conn:
             with conn.cursor() as cur:
-                # Étape 1 : Ajouter la colonne latest_season à la table tournaments si elle n'existe pas
+                # En une requête, la saison de rang le plus élevé (wrk_seasons) parmi
+                # les cartes de chaque tournoi ; les saisons inconnues sont ignorées
                 cur.execute("""
-                    ALTER TABLE public.wrk_tournaments 
-                    ADD COLUMN IF NOT EXISTS latest_season VARCHAR
+                    UPDATE public.wrk_tournaments AS t
+                    SET latest_season = s.season
+                    FROM (
+                        SELECT d.tournament_id, MAX(s.season_order) AS season_order
+                        FROM public.wrk_decklists AS d
+                        JOIN public.wrk_seasons AS s ON s.season = d.card_saison
+                        GROUP BY d.tournament_id
+                    ) AS latest
+                    JOIN public.wrk_seasons AS s ON s.season_order = latest.season_order
+                    WHERE t.tournament_id = latest.tournament_id
+                      AND t.latest_season IS DISTINCT FROM s.season
                 """)
-                logger.info("Colonne latest_season ajoutée à wrk_tournaments")
-                
-                # Étape 2 : Récupérer tous les tournois depuis la table tournaments
-                cur.execute("SELECT tournament_id FROM public.wrk_tournaments")
-                tournaments = cur.fetchall()
-                
-                updated_count = 0
-                
-                # Étape 3 : Pour chaque tournoi, trouver la saison la plus récente
-                for (tournament_id,) in tournaments:
-                    # Récupérer toutes les saisons des cartes de ce tournoi
-                    cur.execute("""
-                        SELECT DISTINCT card_saison 
-                        FROM public.wrk_decklists 
-                        WHERE tournament_id = %s AND card_saison IS NOT NULL AND card_saison != ''
-                    """, (tournament_id,))
-                    
-                    seasons_in_tournament = cur.fetchall()
-                    
-                    latest_season = None
-                    latest_index = -1
-                    
-                    # Parcourir toutes les saisons de ce tournoi
-                    for (card_season,) in seasons_in_tournament:
-                        # Vérifier si cette saison est plus récente
-                        if card_season in season_history:
-                            season_index = season_history.index(card_season)
-                            if season_index > latest_index:
-                                latest_index = season_index
-                                latest_season = card_season
-                    
-                    # Étape 4 : Mettre à jour la table tournaments avec la saison trouvée
-                    if latest_season:
-                        cur.execute("""
-                            UPDATE public.wrk_tournaments 
-                            SET latest_season = %s 
-                            WHERE tournament_id = %s
-                        """, (latest_season, tournament_id))
-                        updated_count += 1
-                        logger.debug(f"Tournoi {tournament_id}: saison mise à jour = {latest_season}")
-                    else:
-                        logger.debug(f"Tournoi {tournament_id}: aucune saison valide trouvée")
+                updated_count = cur.rowcount
         
         logger.info(f"Mise à jour terminée : {updated_count} tournois mis à jour avec leur saison la plus récente")
         
@@ -462,8 +811,14 @@ def tournament_season():
         logger.error(f"Erreur lors de l'ajout des saisons aux tournois : {e}")
         raise
 
-def main():
-    """Fonction principale d'exécution du pipeline ETL avec anonymisation"""
+def main(full_reload: bool = False, single_transaction: bool = False):
+    """
+    Fonction principale d'exécution du pipeline ETL avec anonymisation
+
+    Par défaut seuls les fichiers nouveaux ou modifiés depuis le dernier
+    chargement sont chargés ; full_reload vide d'abord les tables de travail.
+    Avec single_transaction, tout le chargement est validé ou annulé d'un bloc.
+    """
     try:
         logger.info("=== DÉBUT DU PIPELINE ETL POKEMON TCG POCKET AVEC ANONYMISATION ===")
         
@@ -476,30 +831,30 @@ def main():
         
         logger.info("Variables d'environnement vérifiées")
         
-        # Étape 1 : Création des tables de travail (avec table de mapping)
-        logger.info("=== ÉTAPE 1 : Création des tables de travail ===")
-        execute_sql_script("data-integration/00_create_wrk_tables.sql")
-        
-        # Étape 2 : Insertion des données de tournois
-        logger.info("=== ÉTAPE 2 : Insertion des données de tournois ===")
-        insert_wrk_tournaments()
-        
-        # Étape 3 : Insertion des données de decklists (avec anonymisation)
-        logger.info("=== ÉTAPE 3 : Insertion des données de decklists (avec anonymisation) ===")
-        insert_wrk_decklists()
-        tournament_season()
-        
-        # Étape 4 : Insertion des données d'information des cartes
-        logger.info("=== ÉTAPE 4 : Insertion des données d'information des cartes ===")
-        insert_wrk_infocard()
-        
-        # Étape 5 : Insertion des données de matchs (avec anonymisation)
-        logger.info("=== ÉTAPE 5 : Insertion des données de matchs (avec anonymisation) ===")
-        insert_wrk_matches()
-        
-        # Étape 6 : Construction de la base de données des cartes
-        logger.info("=== ÉTAPE 6 : Construction de la base de données des cartes ===")
-        execute_sql_script("data-integration/01_dwh_cards.sql")
+        with EtlSession(get_connection_string(), single_transaction) as session:
+            # Étape 1 : Création des tables de travail (avec table de mapping)
+            logger.info("=== ÉTAPE 1 : Création des tables de travail ===")
+            execute_sql_script("data-integration/00_create_wrk_tables.sql", session)
+            if full_reload:
+                reset_wrk_tables(session)
+            
+            # Étape 2 : Insertion des tournois, decklists et matchs en un seul passage (avec anonymisation)
+            def load_tournaments():
+                logger.info("=== ÉTAPE 2 : Insertion des données de tournois, decklists et matchs (avec anonymisation) ===")
+                insert_wrk_tournament_data(session)
+                tournament_season(session)
+            
+            # Étape 3 : Insertion des données d'information des cartes
+            def load_cards():
+                logger.info("=== ÉTAPE 3 : Insertion des données d'information des cartes ===")
+                insert_wrk_infocard(session)
+            
+            # Les étapes 2 et 3 ne touchent pas aux mêmes tables, elles tournent en parallèle
+            session.run_parallel(load_tournaments, load_cards)
+            
+            # Étape 4 : Construction de la base de données des cartes
+            logger.info("=== ÉTAPE 4 : Construction de la base de données des cartes ===")
+            execute_sql_script("data-integration/01_dwh_cards.sql", session)
         
         logger.info("=== PIPELINE ETL TERMINÉ AVEC SUCCÈS ===")
         
@@ -508,4 +863,9 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Charge les tournois et les cartes scrapés dans PostgreSQL")
+    parser.add_argument("--full", action="store_true", help="recharge tout l'historique au lieu des seuls fichiers nouveaux ou modifiés ; data/output doit contenir tous les tournois déjà chargés")
+    parser.add_argument("--single-transaction", action="store_true", help="valide tout le chargement en une seule transaction, sans étapes en parallèle")
+    args = parser.parse_args()
+    
+    main(args.full, args.single_transaction)
\ No newline at end of file
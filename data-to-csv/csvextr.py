@@ -31,7 +31,7 @@ def export_all_tables_to_csv():
     """Exporte toutes les tables PostgreSQL en CSV"""
     
     # Tables à exclure
-    excluded_tables = ['wrk_tournament_seasons', 'wrk_infocards', 'wrk_player_mapping', 'card_evolutions', 'wrk_players']
+    excluded_tables = ['wrk_tournament_seasons', 'wrk_infocards', 'wrk_player_mapping', 'card_evolutions', 'wrk_players', 'wrk_seasons', 'wrk_loaded_files']
     
     # Créer un dossier pour les exports
     export_dir = "data/csv"
@@ -39,12 +39,18 @@ def export_all_tables_to_csv():
     
     with psycopg.connect(get_connection_string()) as conn:
         with conn.cursor() as cur:
-            # Récupérer toutes les tables
+            # Récupérer toutes les tables, sans les partitions (exportées avec leur table)
             cur.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = 'public'
                 AND table_type = 'BASE TABLE'
+                AND table_name NOT IN (
+                    SELECT c.relname
+                    FROM pg_class AS c
+                    JOIN pg_namespace AS n ON n.oid = c.relnamespace
+                    WHERE n.nspname = 'public' AND c.relispartition
+                )
             """)
             
             tables = cur.fetchall()
@@ -0,0 +1,282 @@
+from dataclasses import dataclass
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+# Stores for the html pages fetched by the scrapers
+# Every store is keyed by url, knows how long each class of url stays fresh
+# and keeps hit/miss/bytes statistics for the end of run report
+
+regex_listing_url = re.compile(r'^/tournaments/')
+regex_standings_url = re.compile(r'^/tournament/[^/]*/standings')
+regex_decklist_url = re.compile(r'^/tournament/[^/]*/player/[^/]*/decklist')
+regex_pairings_url = re.compile(r'^/tournament/[^/]*/pairings')
+
+def url_class(url: str) -> str:
+  if regex_listing_url.match(url):
+    return "listing"
+  if regex_standings_url.match(url):
+    return "standings"
+  if regex_decklist_url.match(url):
+    return "decklist"
+  if regex_pairings_url.match(url):
+    return "pairings"
+  return "other"
+
+# Seconds a page stays fresh, None means forever
+# Pages of completed tournaments never change, the listing gets new tournaments every hour
+default_ttls = {
+  "listing": 3600,
+  "standings": None,
+  "decklist": None,
+  "pairings": None,
+  "other": 24 * 3600
+}
+
+@dataclass
+class CacheEntry:
+  html: str
+  fetched_at: float
+  etag: str | None = None
+  last_modified: str | None = None
+  fresh: bool = True
+
+@dataclass
+class CacheStats:
+  hits: int = 0
+  misses: int = 0
+  expired: int = 0
+  revalidated: int = 0
+  evictions: int = 0
+  bytes_read: int = 0
+  bytes_written: int = 0
+  stored_bytes: int = 0
+
+  def report(self) -> str:
+    lookups = self.hits + self.misses
+    hit_rate = 100 * self.hits / lookups if lookups > 0 else 0
+    return (
+      f"cache: {self.hits} hits, {self.misses} misses ({self.expired} expired, {self.revalidated} revalidated), {hit_rate:.1f}% hit rate, "
+      f"{self.bytes_read / 2**20:.1f} MiB read, {self.bytes_written / 2**20:.1f} MiB written, "
+      f"{self.evictions} evictions, {self.stored_bytes / 2**20:.1f} MiB stored"
+    )
+
+class CacheStore:
+  def __init__(self, ttls: dict | None = None):
+    self.ttls = {**default_ttls, **(ttls or {})}
+    self.stats = CacheStats()
+
+  def is_fresh(self, url: str, fetched_at: float) -> bool:
+    ttl = self.ttls.get(url_class(url))
+    return ttl is None or time.time() - fetched_at < ttl
+
+  # Return the cached page of a url, or None if it is missing
+  # Expired pages are returned with fresh=False so they can be revalidated
+  def get(self, url: str) -> CacheEntry | None:
+    raise NotImplementedError
+
+  def put(self, url: str, html: str, etag: str | None = None, last_modified: str | None = None):
+    raise NotImplementedError
+
+  # Mark an expired page as fresh again, after the server answered 304 Not Modified
+  def refresh(self, url: str):
+    raise NotImplementedError
+
+  # Remember that the server answered a permanent error (404...) for a url, so
+  # the offline rebuild tells a missing page from a page that was never fetched
+  # Stores that cannot keep it return None from get_missing
+  def put_missing(self, url: str, status: int):
+    pass
+
+  # Status of the permanent error recorded for a url, None if there is none
+  def get_missing(self, url: str) -> int | None:
+    return None
+
+  def close(self):
+    pass
+
+# Page reads whose access times are kept in memory before being written
+access_flush_size = 1000
+
+# Cache in a single sqlite file, bodies are zlib compressed and the least
+# recently used pages are evicted once the compressed size exceeds max_bytes
+class SqliteCacheStore(CacheStore):
+  def __init__(self, path: str = "cache/pages.sqlite3", max_bytes: int | None = None, ttls: dict | None = None, track_access: bool = True):
+    super().__init__(ttls)
+    self.max_bytes = max_bytes
+    # Readers that must not write to the store, like the offline rebuild
+    # processes, do not update the access times used by the eviction
+    self.track_access = track_access
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+      os.makedirs(directory)
+
+    # The store is used from the worker threads of asyncio.to_thread, the
+    # lock also guards the stats counters
+    self.lock = threading.Lock()
+    # Access times of the pages read since the last flush, written in one
+    # batch before an eviction, on close or every access_flush_size reads,
+    # instead of one write per cache hit
+    self.pending_accesses = {}
+    # The processes of a sharded crawl share the store, wait for their writes
+    self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    self.db.execute("PRAGMA journal_mode=WAL")
+    self.db.execute("PRAGMA synchronous=NORMAL")
+    self.db.execute("""
+      CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        fetched_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        etag TEXT,
+        last_modified TEXT
+      )
+    """)
+    # Stores created before the validators were kept
+    columns = [row[1] for row in self.db.execute("PRAGMA table_info(pages)")]
+    for column in ["etag", "last_modified"]:
+      if column not in columns:
+        self.db.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+    self.db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+    self.db.execute("""
+      CREATE TABLE IF NOT EXISTS missing_pages (
+        url TEXT PRIMARY KEY,
+        status INTEGER NOT NULL,
+        fetched_at REAL NOT NULL
+      )
+    """)
+    self.stats.stored_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+  def get(self, url: str) -> CacheEntry | None:
+    with self.lock:
+      row = self.db.execute("SELECT body, fetched_at, etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+      if row is None:
+        self.stats.misses += 1
+        return None
+      if self.track_access:
+        self.pending_accesses[url] = time.time()
+        if len(self.pending_accesses) >= access_flush_size:
+          self.flush_accesses()
+
+    entry = CacheEntry(zlib.decompress(row[0]).decode("utf-8"), row[1], row[2], row[3], self.is_fresh(url, row[1]))
+    with self.lock:
+      if entry.fresh:
+        self.stats.hits += 1
+      else:
+        self.stats.misses += 1
+        self.stats.expired += 1
+      self.stats.bytes_read += len(entry.html)
+    return entry
+
+  # Called with the lock held. An access time never moves back, a page put
+  # since its read already has a newer one
+  def flush_accesses(self):
+    if len(self.pending_accesses) == 0:
+      return
+    self.db.executemany(
+      "UPDATE pages SET accessed_at = ? WHERE url = ? AND accessed_at < ?",
+      [(accessed_at, url, accessed_at) for url, accessed_at in self.pending_accesses.items()]
+    )
+    self.pending_accesses = {}
+
+  def put(self, url: str, html: str, etag: str | None = None, last_modified: str | None = None):
+    body = zlib.compress(html.encode("utf-8"))
+    now = time.time()
+
+    with self.lock:
+      previous = self.db.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+      self.db.execute(
+        "INSERT OR REPLACE INTO pages (url, body, size, fetched_at, accessed_at, etag, last_modified) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (url, body, len(body), now, now, etag, last_modified)
+      )
+      self.db.execute("DELETE FROM missing_pages WHERE url = ?", (url,))
+      self.stats.stored_bytes += len(body) - (previous[0] if previous else 0)
+      self.stats.bytes_written += len(html)
+
+      if self.max_bytes is not None and self.stats.stored_bytes > self.max_bytes:
+        self.evict(int(self.max_bytes * 0.9))
+
+  def refresh(self, url: str):
+    with self.lock:
+      self.db.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+      self.stats.revalidated += 1
+
+  def put_missing(self, url: str, status: int):
+    with self.lock:
+      self.db.execute("INSERT OR REPLACE INTO missing_pages (url, status, fetched_at) VALUES (?, ?, ?)", (url, status, time.time()))
+
+  def get_missing(self, url: str) -> int | None:
+    with self.lock:
+      row = self.db.execute("SELECT status FROM missing_pages WHERE url = ?", (url,)).fetchone()
+    return row[0] if row is not None else None
+
+  # Drop the least recently used pages until the store fits in target_bytes
+  def evict(self, target_bytes: int):
+    self.flush_accesses()
+    rows = self.db.execute("SELECT url, size FROM pages ORDER BY accessed_at")
+    evicted = []
+    for url, size in rows:
+      if self.stats.stored_bytes <= target_bytes:
+        break
+      evicted.append((url,))
+      self.stats.stored_bytes -= size
+
+    self.db.executemany("DELETE FROM pages WHERE url = ?", evicted)
+    self.stats.evictions += len(evicted)
+
+  def close(self):
+    with self.lock:
+      self.flush_accesses()
+      self.db.close()
+
+# Legacy layout: one uncompressed html file per url under cache/
+# Kept to read the caches made before the sqlite store, file names are derived
+# from the url so two urls may share a file, and validators are not kept so
+# expired pages are always downloaded again
+class FileCacheStore(CacheStore):
+  def __init__(self, directory: str = "cache", ttls: dict | None = None):
+    super().__init__(ttls)
+    self.directory = directory
+
+  def filename(self, url: str) -> str:
+    cache_filename = self.directory + url
+    cache_filename = ''.join(x for x in cache_filename if (x == "/" or x.isalnum()))
+    cache_filename = re.sub(r'\bnul\b','__nul__', cache_filename)
+    return f"{cache_filename}.html"
+
+  def get(self, url: str) -> CacheEntry | None:
+    cache_filename = self.filename(url)
+    if not os.path.isfile(cache_filename):
+      self.stats.misses += 1
+      return None
+
+    fetched_at = os.path.getmtime(cache_filename)
+    if not self.is_fresh(url, fetched_at):
+      self.stats.misses += 1
+      self.stats.expired += 1
+      return None
+
+    with open(cache_filename, "r") as file:
+      html = file.read()
+    self.stats.hits += 1
+    self.stats.bytes_read += len(html)
+    return CacheEntry(html, fetched_at)
+
+  def refresh(self, url: str):
+    os.utime(self.filename(url))
+    self.stats.revalidated += 1
+
+  def put(self, url: str, html: str, etag: str | None = None, last_modified: str | None = None):
+    cache_filename = self.filename(url)
+    directory = os.path.dirname(cache_filename)
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+
+    with open(cache_filename, "w") as file:
+      file.write(html)
+    self.stats.bytes_written += len(html)
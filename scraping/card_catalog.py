@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+# Délai avant de retenter une carte en échec, doublé à chaque échec :
+# une erreur passagère est retentée dès le lancement suivant, une erreur
+# définitive (404, page illisible) après 1h, 2h, 4h... jusqu'à 7 jours
+retry_base_delay = 3600
+retry_max_delay = 7 * 24 * 3600
+
+class CardCatalog:
+    """
+    Catalogue persistant des cartes scrapées, indexé par URL de carte.
+
+    Une carte ne change plus une fois son extension sortie : chaque carte est
+    gardée avec la date du scraping et la version du parseur qui l'a extraite,
+    et n'est scrapée à nouveau que si elle manque, si elle a échoué, ou si le
+    parseur a changé depuis.
+
+    Chaque résultat, succès ou échec avec sa raison, est écrit dans la table
+    cards dans sa propre transaction dès qu'il est connu : cette ligne est le
+    point de reprise. Un arrêt en cours de route ne perd que les cartes en
+    cours de téléchargement, et le lancement suivant reprend là où il s'était
+    arrêté. Le JSON et le CSV sont produits à partir de cette table.
+    """
+
+    def __init__(self, path="cache/cards.sqlite3"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS cards (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                card_info TEXT,
+                search_url TEXT,
+                parser_version INTEGER NOT NULL,
+                scraped_at REAL NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL,
+                html BLOB
+            )
+        """)
+        # Catalogues créés avant le suivi des échecs et la conservation des pages
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(cards)")]
+        if "attempts" not in columns:
+            self.db.execute("ALTER TABLE cards ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "next_attempt_at" not in columns:
+            self.db.execute("ALTER TABLE cards ADD COLUMN next_attempt_at REAL")
+        if "html" not in columns:
+            self.db.execute("ALTER TABLE cards ADD COLUMN html BLOB")
+
+    def urls_to_scrape(self, urls, parser_version):
+        """
+        URLs absentes du catalogue, extraites par une autre version du parseur,
+        ou en échec et dont le délai avant nouvel essai est écoulé
+        """
+        now = time.time()
+        to_scrape = []
+        known = {}
+        for url, status, version, next_attempt_at in self.db.execute("SELECT url, status, parser_version, next_attempt_at FROM cards"):
+            known[url] = (status, version, next_attempt_at)
+
+        waiting = 0
+        for url in urls:
+            if url not in known:
+                to_scrape.append(url)
+                continue
+            status, version, next_attempt_at = known[url]
+            if version != parser_version:
+                to_scrape.append(url)
+            elif status == 'failed':
+                if next_attempt_at is None or next_attempt_at <= now:
+                    to_scrape.append(url)
+                else:
+                    waiting += 1
+
+        if waiting > 0:
+            print(f"{waiting} cartes en échec attendent leur prochain essai")
+        return to_scrape
+
+    def put_card(self, url, card_info, search_url, parser_version, html=None):
+        now = time.time()
+        # La page est gardée compressée, pour pouvoir réextraire la carte hors ligne
+        body = zlib.compress(html.encode('utf-8')) if html is not None else None
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "INSERT OR REPLACE INTO cards (url, status, card_info, search_url, parser_version, scraped_at, error, attempts, next_attempt_at, html) VALUES (?, 'ok', ?, ?, ?, ?, NULL, 0, NULL, ?)",
+                (url, json.dumps(card_info, ensure_ascii=False), search_url, parser_version, now, body)
+            )
+
+    def put_failure(self, url, error, parser_version, permanent=False):
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN")
+            row = self.db.execute("SELECT attempts FROM cards WHERE url = ?", (url,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            delay = min(retry_max_delay, retry_base_delay * 2 ** (attempts - 1)) if permanent else 0
+
+            # Une carte déjà extraite avec succès garde ses données, seule l'erreur est notée
+            self.db.execute("""
+                INSERT INTO cards (url, status, card_info, search_url, parser_version, scraped_at, error, attempts, next_attempt_at) VALUES (?, 'failed', NULL, NULL, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    error = excluded.error,
+                    attempts = excluded.attempts,
+                    next_attempt_at = excluded.next_attempt_at,
+                    parser_version = CASE WHEN cards.status = 'failed' THEN excluded.parser_version ELSE cards.parser_version END,
+                    scraped_at = CASE WHEN cards.status = 'failed' THEN excluded.scraped_at ELSE cards.scraped_at END
+            """, (url, parser_version, now, error, attempts, now + delay))
+
+    def get_cards(self, urls):
+        """
+        Renvoie, dans l'ordre des URLs, les couples (card_info, search_url) des
+        cartes extraites et la liste des URLs sans données
+        """
+        rows = {}
+        for url, status, card_info, search_url in self.db.execute("SELECT url, status, card_info, search_url FROM cards"):
+            if card_info is not None:
+                rows[url] = (json.loads(card_info), search_url)
+
+        cards = []
+        failed_urls = []
+        for url in urls:
+            if url in rows:
+                cards.append(rows[url])
+            else:
+                failed_urls.append(url)
+        return cards, failed_urls
+
+    def get_urls(self):
+        """
+        URLs de toutes les cartes du catalogue
+        """
+        return [url for (url,) in self.db.execute("SELECT url FROM cards ORDER BY url")]
+
+    def get_stored_pages(self):
+        """
+        Couples (url, page compressée) des cartes dont la page est gardée
+        """
+        return self.db.execute("SELECT url, html FROM cards WHERE html IS NOT NULL ORDER BY url").fetchall()
+
+    def put_reparsed(self, results, parser_version):
+        """
+        Enregistre en une transaction les cartes réextraites hors ligne, une
+        carte dont la réextraction échoue garde ses données précédentes.
+        Renvoie le nombre d'échecs.
+        """
+        errors = 0
+        with self.db:
+            self.db.execute("BEGIN")
+            for url, card_info, search_url, error in results:
+                if error:
+                    errors += 1
+                    continue
+                self.db.execute(
+                    "UPDATE cards SET status = 'ok', card_info = ?, search_url = ?, parser_version = ?, error = NULL, attempts = 0, next_attempt_at = NULL WHERE url = ?",
+                    (json.dumps(card_info, ensure_ascii=False), search_url, parser_version, url)
+                )
+        return errors
+
+    def get_errors(self, urls):
+        """
+        Dernière erreur connue de chaque URL
+        """
+        errors = dict(self.db.execute("SELECT url, error FROM cards WHERE error IS NOT NULL"))
+        return {url: errors[url] for url in urls if url in errors}
+
+    def stats(self):
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM cards GROUP BY status").fetchall())
+
+    def close(self):
+        self.db.close()
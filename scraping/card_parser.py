@@ -0,0 +1,194 @@
+from bs4 import BeautifulSoup, SoupStrainer
+import re
+import zlib
+
+# Extraction des informations des pages de cartes, séparée du téléchargement
+# pour pouvoir être relancée hors ligne sur les pages gardées dans le catalogue.
+# Ce module n'importe que bs4 : il est chargé par chaque processus du pool.
+
+# Motifs compilés une fois pour toutes
+regex_hp = re.compile(r'([A-Za-z]+)\s*-\s*(\d+)\s*HP')
+# Pattern corrigé - le "-" doit être à la fin ou échappé
+regex_attack = re.compile(r'^([A-Za-z\s\-\',]+?)(?:\s+(\d+[+x\-]?))?$')
+regex_weakness = re.compile(r'Weakness:\s*([A-Za-z]+)')
+regex_retreat = re.compile(r'Retreat:\s*(\d+)')
+regex_card_link = re.compile(r'/cards/[^?]+$')
+
+# Seul le bloc de texte de la carte est construit, pas toute la page
+card_text_strainer = SoupStrainer('div', class_='card-text')
+
+def get_evolves_from_search_url(soup):
+    """
+    Renvoie l'URL de la recherche "Evolves from" d'une carte Pokémon, ou None
+    """
+    type_elem = soup.find('p', class_='card-text-type')
+    if not type_elem:
+        return None
+    
+    if 'Evolves from' not in type_elem.get_text():
+        return None
+    
+    evolves_link = type_elem.find('a')
+    if not evolves_link:
+        return None
+    
+    return 'https://pocket.limitlesstcg.com' + evolves_link.get('href')
+
+def parse_evolves_from_search(html):
+    """
+    Extrait de la page de recherche les liens vers toutes les cartes trouvées
+    """
+    search_soup = BeautifulSoup(html, 'html.parser')
+    
+    # Trouver tous les liens vers les cartes dans la grille de recherche
+    card_links = []
+    
+    # Chercher dans la grille de cartes
+    card_grid = search_soup.find('div', class_='card-search-grid')
+    if card_grid:
+        # Trouver tous les liens vers les cartes (qui se terminent par un numéro, pas par des paramètres)
+        links = card_grid.find_all('a', href=regex_card_link)
+        for link in links:
+            full_url = 'https://pocket.limitlesstcg.com' + link.get('href')
+            card_links.append(full_url)
+    
+    # Si aucune carte trouvée dans la grille, essayer l'ancienne méthode
+    if not card_links:
+        card_link = search_soup.find('a', href=regex_card_link)
+        if card_link:
+            full_url = 'https://pocket.limitlesstcg.com' + card_link.get('href')
+            card_links.append(full_url)
+    
+    return card_links
+
+def parse_card_info(url, soup):
+    """
+    Extrait les informations d'une page de carte, sauf les évolutions qui
+    demandent une requête de plus vers la page de recherche
+    """
+    card_info = {
+        'url': url,
+        'nom': None,
+        'type_carte': None,
+        'sous_type': None,
+        'hp': None,
+        'evolving_stage': None,
+        'evolves_from': [],  # Maintenant c'est une liste
+        'competence_1_nom': None,
+        'competence_1_puissance': None,
+        'competence_2_nom': None,
+        'competence_2_puissance': None,
+        'faiblesse': None,
+        'retreat': None
+    }
+    
+    name_elem = soup.find('span', class_='card-text-name')
+    if name_elem:
+        link = name_elem.find('a')
+        if link:
+            card_info['nom'] = link.get_text().strip()
+    
+    type_elem = soup.find('p', class_='card-text-type')
+    if type_elem:
+        type_text = ' '.join(type_elem.get_text().split())
+        
+        if 'Trainer - ' in type_text:
+            card_info['type_carte'] = 'Trainer'
+            parts = type_text.split('Trainer - ')
+            if len(parts) > 1:
+                card_info['sous_type'] = parts[1].strip()
+            
+        elif 'Pokémon - ' in type_text:
+            card_info['type_carte'] = 'Pokémon'
+            
+            if 'Basic' in type_text:
+                card_info['evolving_stage'] = 'Basic'
+            elif 'Stage 1' in type_text:
+                card_info['evolving_stage'] = 'Stage 1'
+            elif 'Stage 2' in type_text:
+                card_info['evolving_stage'] = 'Stage 2'
+    
+    if card_info['type_carte'] == 'Pokémon':
+        # Les motifs sont cherchés dans le texte du bloc de la carte seulement
+        card_text = soup.find('div', class_='card-text') or soup
+        page_text = card_text.get_text()
+        
+        hp_match = regex_hp.search(page_text)
+        if hp_match:
+            card_info['sous_type'] = hp_match.group(1).strip()
+            card_info['hp'] = int(hp_match.group(2))
+        
+        attack_elements = soup.find_all('p', class_='card-text-attack-info')
+        
+        attacks = []
+        for attack_elem in attack_elements:
+            full_text = attack_elem.get_text().strip()
+            
+            symbol_elem = attack_elem.find('span', class_='ptcg-symbol')
+            attack_text = full_text
+            
+            if symbol_elem:
+                symbol_text = symbol_elem.get_text().strip()
+                if attack_text.startswith(symbol_text):
+                    attack_text = attack_text[len(symbol_text):].strip()
+            
+            # Pattern corrigé - le "-" doit être à la fin ou échappé
+            match = regex_attack.match(attack_text)
+            
+            if match:
+                attack_name = match.group(1).strip()
+                power_text = match.group(2)
+                
+                if power_text:
+                    power = power_text  # Conserver comme string avec le "+", "x", "-" s'il existe
+                else:
+                    power = "0"
+                
+                attacks.append((attack_name, power))
+        
+        if len(attacks) >= 1:
+            card_info['competence_1_nom'] = attacks[0][0]
+            card_info['competence_1_puissance'] = attacks[0][1]
+        
+        if len(attacks) >= 2:
+            card_info['competence_2_nom'] = attacks[1][0]
+            card_info['competence_2_puissance'] = attacks[1][1]
+        
+        weakness_match = regex_weakness.search(page_text)
+        if weakness_match:
+            card_info['faiblesse'] = weakness_match.group(1).strip()
+        
+        retreat_match = regex_retreat.search(page_text)
+        if retreat_match:
+            card_info['retreat'] = int(retreat_match.group(1))
+    
+    return card_info
+
+def parse_card_html(url, html):
+    """
+    Extrait une page de carte : renvoie la carte et l'URL de sa recherche
+    "Evolves from" (ou None)
+    """
+    soup = BeautifulSoup(html, 'html.parser', parse_only=card_text_strainer)
+    if soup.find('p', class_='card-text-type') is None:
+        # Page d'une structure inattendue : elle est lue en entier, comme avant
+        soup = BeautifulSoup(html, 'html.parser')
+    
+    card_info = parse_card_info(url, soup)
+    
+    search_url = None
+    if card_info['type_carte'] == 'Pokémon':
+        search_url = get_evolves_from_search_url(soup)
+    
+    return card_info, search_url
+
+def parse_stored_card(row):
+    """
+    Extrait une page compressée du catalogue, pour le pool de processus
+    """
+    url, body = row
+    try:
+        card_info, search_url = parse_card_html(url, zlib.decompress(body).decode('utf-8'))
+        return url, card_info, search_url, None
+    except Exception as e:
+        return url, None, None, repr(e)
@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import mmap
+import os
+import re
+
+# Seules les valeurs des clés "url" sont lues dans les fichiers de tournois, sans
+# construire le document : dans les sorties de scrap1.py, ces clés n'apparaissent
+# que dans players[].decklist[]. La valeur est décodée par json pour les échappements.
+regex_url = re.compile(rb'"url"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+# Octets du début et de la fin de la partie lue d'un shard comparés avant de
+# reprendre sa lecture
+identity_head_size = 65536
+identity_tail_size = 4096
+
+def file_identity(path, offset):
+    """
+    Empreinte des premiers et des derniers octets de la partie d'un fichier
+    lue jusqu'à offset : elle change si le fichier a été recréé sous le même nom
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(offset, identity_head_size)))
+        tail_start = max(0, offset - identity_tail_size)
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return f"{offset}:{digest.hexdigest()}"
+
+def scan_urls(path, offset=0):
+    """
+    Renvoie les URLs de cartes d'un fichier de tournois à partir de offset, et
+    la position jusqu'où il a été lu. Les shards .ndjson ne sont lus que
+    jusqu'à leur dernière ligne complète, pour reprendre ensuite à cette position.
+    """
+    urls = set()
+    with open(path, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size
+        if end <= offset:
+            return [], offset
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if path.endswith('.ndjson'):
+                end = m.rfind(b'\n', offset, end) + 1
+                if end == 0:
+                    return [], offset
+            for match in regex_url.finditer(m, offset, end):
+                urls.add(json.loads(match.group(1)))
+
+    return sorted(urls), end
+
+class CardUrlIndex:
+    """
+    Index incrémental des URLs de cartes par fichier de tournois.
+
+    Un fichier n'est relu que si sa taille ou sa date de modification ont
+    changé ; les shards .ndjson, où scrap1.py ne fait qu'ajouter des lignes,
+    sont relus à partir de la position atteinte la fois précédente tant que
+    la partie déjà lue n'a pas changé. Un shard recréé sous le même nom est
+    relu en entier.
+    """
+
+    def __init__(self, path="cache/card_urls_index.json"):
+        self.path = path
+        self.directories = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.directories = json.load(f)
+            except ValueError as e:
+                print(f"Index des URLs illisible, il est reconstruit: {e}")
+
+    def update(self, directory_path, workers=None):
+        """
+        Met à jour l'index pour un répertoire de sorties et renvoie toutes ses URLs
+        """
+        entries = self.directories.setdefault(os.path.abspath(directory_path), {})
+
+        filenames = sorted(
+            filename for filename in os.listdir(directory_path)
+            if filename.endswith('.json') or filename.endswith('.ndjson')
+        )
+
+        # Les fichiers supprimés sortent de l'index
+        for filename in set(entries) - set(filenames):
+            del entries[filename]
+
+        pending = []
+        for filename in filenames:
+            path = os.path.join(directory_path, filename)
+            stat = os.stat(path)
+            entry = entries.get(filename)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                continue
+
+            if (entry and filename.endswith('.ndjson') and stat.st_size >= entry['offset']
+                    and entry.get('identity') == file_identity(path, entry['offset'])):
+                pending.append((filename, entry['offset'], stat))
+            else:
+                entries.pop(filename, None)
+                pending.append((filename, 0, stat))
+
+        paths = [os.path.join(directory_path, filename) for filename, offset, stat in pending]
+        offsets = [offset for filename, offset, stat in pending]
+        if len(pending) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(scan_urls, paths, offsets, chunksize=max(1, len(paths) // 64)))
+        else:
+            results = [scan_urls(path, offset) for path, offset in zip(paths, offsets)]
+
+        for (filename, offset, stat), (urls, end) in zip(pending, results):
+            previous = entries.get(filename, {}).get('urls', [])
+            path = os.path.join(directory_path, filename)
+            entries[filename] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'offset': end,
+                'identity': file_identity(path, end) if filename.endswith('.ndjson') else None,
+                'urls': sorted(set(previous) | set(urls))
+            }
+
+        print(f"{len(filenames)} fichiers de tournois, {len(pending)} lus, {len(filenames) - len(pending)} déjà indexés")
+
+        all_urls = set()
+        for entry in entries.values():
+            all_urls.update(entry['urls'])
+        return all_urls
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.directories, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,102 @@
+import json
+import os
+
+# Persistent state of the tournament crawl, kept between runs in a json file
+#
+# - known_ids: tournaments already handled (written or skipped), their
+#   standings page is never fetched again
+# - watermark_date/watermark_id: newest tournament of the last crawl that
+#   finished without errors, everything older than it is known
+# - listing_head/completed_pages: listing pages whose tournaments were all
+#   handled, only valid while the first tournament of the listing is the same
+#   (new tournaments shift every page)
+class CrawlState:
+  def __init__(self, path: str = "data/crawl_state.json"):
+    self.path = path
+    self.known_ids = set()
+    self.watermark_date = None
+    self.watermark_id = None
+    self.listing_head = None
+    self.completed_pages = set()
+
+    # Newest tournament seen during this run, whether a job failed and the
+    # number of tournaments left to handle on each listing page
+    self.newest_date = None
+    self.newest_id = None
+    self.failed = False
+    self.pending_tournaments = {}
+
+    if os.path.isfile(path):
+      with open(path, "r") as f:
+        state = json.load(f)
+      self.known_ids = set(state.get("known_ids", []))
+      self.watermark_date = state.get("watermark_date")
+      self.watermark_id = state.get("watermark_id")
+      self.listing_head = state.get("listing_head")
+      self.completed_pages = set(state.get("completed_pages", []))
+
+  def is_known(self, tournament_id: str) -> bool:
+    return tournament_id in self.known_ids
+
+  # Dates are ISO 8601 strings in UTC, so they compare as strings
+  def is_past_watermark(self, tournament_date: str) -> bool:
+    return self.watermark_date is not None and tournament_date < self.watermark_date
+
+  # Forget the completed pages if the listing moved since they were recorded
+  def start_listing(self, head_id: str):
+    if head_id != self.listing_head:
+      self.listing_head = head_id
+      self.completed_pages = set()
+
+  def is_page_completed(self, page: int) -> bool:
+    return page in self.completed_pages
+
+  def mark_page_completed(self, page: int):
+    self.completed_pages.add(page)
+    self.save()
+
+  def track_page(self, page: int, nb_tournaments: int):
+    self.pending_tournaments[page] = nb_tournaments
+    if nb_tournaments == 0:
+      self.mark_page_completed(page)
+
+  # page is None when the listing page is not tracked by this process (sharded crawl)
+  def mark_tournament_done(self, page: int | None, tournament_id: str, tournament_date: str):
+    self.known_ids.add(tournament_id)
+    if self.newest_date is None or tournament_date > self.newest_date:
+      self.newest_date = tournament_date
+      self.newest_id = tournament_id
+
+    if page in self.pending_tournaments:
+      self.pending_tournaments[page] -= 1
+      if self.pending_tournaments[page] == 0:
+        self.mark_page_completed(page)
+
+  def mark_failed(self):
+    self.failed = True
+
+  # Move the watermark once the whole crawl went through without errors and
+  # every queued tournament was handled, so no tournament is left behind it
+  def finish(self):
+    if not self.failed and all(nb_tournaments == 0 for nb_tournaments in self.pending_tournaments.values()):
+      if self.newest_date is not None and not self.is_past_watermark(self.newest_date):
+        self.watermark_date = self.newest_date
+        self.watermark_id = self.newest_id
+      self.completed_pages = set()
+    self.save()
+
+  def save(self):
+    directory = os.path.dirname(self.path)
+    if directory and not os.path.exists(directory):
+      os.makedirs(directory)
+
+    state = {
+      "watermark_date": self.watermark_date,
+      "watermark_id": self.watermark_id,
+      "listing_head": self.listing_head,
+      "completed_pages": sorted(self.completed_pages),
+      "known_ids": sorted(self.known_ids)
+    }
+    with open(self.path + ".tmp", "w") as f:
+      json.dump(state, f)
+    os.replace(self.path + ".tmp", self.path)
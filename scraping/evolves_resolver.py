@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import time
+from fetch import FetchError
+
+class EvolvesFromResolver:
+    """
+    Résout les recherches "Evolves from" des cartes Pokémon.
+
+    Toutes les impressions d'une même carte pointent vers la même URL de
+    recherche : chaque URL n'est donc téléchargée qu'une fois, et les résultats
+    sont gardés d'un lancement à l'autre dans un fichier json. Une recherche
+    plus ancienne que max_age secondes est refaite, pour prendre en compte les
+    cartes des nouvelles extensions.
+    """
+
+    def __init__(self, path="cache/evolves_from.json", max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.results = {}
+        self.cached = 0
+        self.downloaded = 0
+        self.failed = 0
+
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.results = json.load(f)
+            except ValueError as e:
+                print(f"Cache des évolutions illisible, il est ignoré: {e}")
+
+    def is_fresh(self, search_url):
+        entry = self.results.get(search_url)
+        if entry is None:
+            return False
+        return self.max_age is None or time.time() - entry['fetched_at'] < self.max_age
+
+    def get(self, search_url):
+        """
+        Cartes trouvées par la recherche, une liste vide si elle n'a jamais abouti
+        """
+        entry = self.results.get(search_url)
+        return list(entry['cards']) if entry else []
+
+    async def resolve_all(self, search_urls, session, fetcher, parse_search, concurrency=8):
+        """
+        Télécharge en une passe les recherches absentes ou trop anciennes du cache.
+        En cas d'échec, l'ancien résultat est gardé s'il existe.
+        """
+        search_urls = set(search_urls)
+        pending = sorted(url for url in search_urls if not self.is_fresh(url))
+        self.cached += len(search_urls) - len(pending)
+        sem = asyncio.Semaphore(concurrency)
+
+        async def resolve(search_url):
+            async with sem:
+                try:
+                    response = await fetcher.get(session, search_url)
+                except FetchError as e:
+                    print(f"    Erreur lors de la récupération des cartes d'évolution: {e}")
+                    self.failed += 1
+                    return
+
+            self.results[search_url] = {
+                'cards': parse_search(response.text),
+                'fetched_at': time.time()
+            }
+            self.downloaded += 1
+
+        try:
+            await asyncio.gather(*[resolve(search_url) for search_url in pending])
+        finally:
+            self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Écriture dans un fichier temporaire puis remplacement, pour ne jamais laisser un cache tronqué
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        return f"{self.cached} en cache, {self.downloaded} téléchargées, {self.failed} en échec"
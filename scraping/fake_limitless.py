@@ -0,0 +1,67 @@
+from aiohttp import web
+from cache_store import SqliteCacheStore
+from email.utils import formatdate, parsedate_to_datetime
+import argparse
+import hashlib
+import json
+
+# Local stand-in for play.limitlesstcg.com, to run the scraper offline
+# Pages are served from a copy of the sqlite html cache, with ETag and
+# Last-Modified validators, and conditional requests are answered with 304
+#
+#   cp cache/pages.sqlite3 cache/snapshot.sqlite3
+#   python scraping/fake_limitless.py --pages cache/snapshot.sqlite3
+#   python scraping/scrap1.py --base-url http://localhost:8080 --revalidate
+#
+# GET /__stats returns the number of full and not modified answers
+
+def make_app(pages_path: str) -> web.Application:
+  pages = SqliteCacheStore(pages_path)
+  stats = {"ok": 0, "not_modified": 0, "not_found": 0}
+
+  async def handle_stats(request: web.Request):
+    return web.json_response(stats)
+
+  async def handle_page(request: web.Request):
+    entry = pages.get(request.path_qs)
+    if entry is None:
+      stats["not_found"] += 1
+      raise web.HTTPNotFound()
+
+    etag = '"' + hashlib.md5(entry.html.encode("utf-8")).hexdigest() + '"'
+    last_modified = formatdate(int(entry.fetched_at), usegmt=True)
+    validators = {"ETag": etag, "Last-Modified": last_modified}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_none_match is not None:
+      not_modified = etag in [tag.strip() for tag in if_none_match.split(",")]
+    elif if_modified_since is not None:
+      not_modified = parsedate_to_datetime(if_modified_since).timestamp() >= int(entry.fetched_at)
+    else:
+      not_modified = False
+
+    if not_modified:
+      stats["not_modified"] += 1
+      return web.Response(status=304, headers=validators)
+
+    stats["ok"] += 1
+    return web.Response(text=entry.html, content_type="text/html", headers=validators)
+
+  async def close_pages(app: web.Application):
+    print(json.dumps(stats))
+    pages.close()
+
+  app = web.Application()
+  app.router.add_get("/__stats", handle_stats)
+  app.router.add_get("/{path:.*}", handle_page)
+  app.on_cleanup.append(close_pages)
+  return app
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Serve cached limitlesstcg pages with http validators")
+  parser.add_argument("--pages", default="cache/snapshot.sqlite3", help="sqlite html cache to serve")
+  parser.add_argument("--port", type=int, default=8080)
+  args = parser.parse_args()
+
+  web.run_app(make_app(args.pages), port=args.port)
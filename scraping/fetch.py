@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from multidict import CIMultiDict
+from urllib.parse import urlsplit
+import aiohttp
+import asyncio
+import random
+import time
+
+# Resilient http layer shared by the scrapers
+# Every host gets a token bucket whose rate adapts to the answers of the server
+# (additive increase while it is fast, multiplicative decrease on 429/503 or
+# slow answers, pause on Retry-After) and a circuit breaker that stops all the
+# requests to a host after too many failures in a row. Failed requests are
+# retried with exponential backoff and jitter.
+
+class FetchError(Exception):
+  def __init__(self, url: str, status: int | None, reason: str):
+    super().__init__(f"{url}: {reason}")
+    self.url = url
+    self.status = status
+
+  # The page will not appear by retrying later (404, 410...)
+  def is_permanent(self) -> bool:
+    return self.status is not None and 400 <= self.status < 500 and self.status not in (408, 429)
+
+@dataclass
+class FetchResponse:
+  status: int
+  text: str
+  # Header names are case insensitive, servers send ETag as well as etag
+  headers: CIMultiDict
+  latency: float
+
+# Seconds to wait from a Retry-After header, in seconds or as an http date
+def parse_retry_after(value: str | None) -> float | None:
+  if value is None:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+  except (TypeError, ValueError):
+    return None
+
+class AdaptiveRateLimiter:
+  def __init__(self, rate: float = 5, min_rate: float = 0.5, max_rate: float = 50, target_latency: float = 1.0):
+    self.rate = rate
+    self.min_rate = min_rate
+    self.max_rate = max_rate
+    self.target_latency = target_latency
+    self.tokens = 1.0
+    self.updated_at = time.monotonic()
+    self.paused_until = 0.0
+    self.lock = asyncio.Lock()
+
+  async def acquire(self):
+    async with self.lock:
+      while True:
+        now = time.monotonic()
+        if now < self.paused_until:
+          await asyncio.sleep(self.paused_until - now)
+          continue
+
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+          self.tokens -= 1
+          return
+        await asyncio.sleep((1 - self.tokens) / self.rate)
+
+  def on_success(self, latency: float):
+    if latency > 2 * self.target_latency:
+      self.rate = max(self.min_rate, self.rate * 0.9)
+    elif latency < self.target_latency:
+      self.rate = min(self.max_rate, self.rate + 0.5)
+
+  def on_throttled(self, retry_after: float | None):
+    self.rate = max(self.min_rate, self.rate / 2)
+    if retry_after is not None:
+      self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+class CircuitBreaker:
+  def __init__(self, failure_threshold: int = 10, cooldown: float = 30):
+    self.failure_threshold = failure_threshold
+    self.cooldown = cooldown
+    self.failures = 0
+    self.opened_at = None
+    self.probing = False
+
+  # Wait while the circuit is open, once the cooldown is over a single probe
+  # request goes through and the others wait for its result
+  # Returns True when the caller is the probe
+  async def wait_until_closed(self) -> bool:
+    while self.opened_at is not None:
+      remaining = self.opened_at + self.cooldown - time.monotonic()
+      if remaining > 0:
+        await asyncio.sleep(remaining)
+      elif not self.probing:
+        self.probing = True
+        return True
+      else:
+        await asyncio.sleep(1)
+    return False
+
+  # The probe ended without a result, cancelled or failed with an error that
+  # is not a fetch failure, the next request probes instead
+  def abort_probe(self):
+    self.probing = False
+
+  def on_success(self):
+    self.failures = 0
+    self.opened_at = None
+    self.probing = False
+
+  def on_failure(self):
+    self.failures += 1
+    if self.probing or self.failures >= self.failure_threshold:
+      if self.opened_at is None or self.probing:
+        print(f"too many failures, pausing requests for {self.cooldown}s")
+      self.opened_at = time.monotonic()
+      self.probing = False
+
+class ResilientFetcher:
+  def __init__(self, retries: int = 5, backoff: float = 1, max_backoff: float = 60, rate: float = 5, max_rate: float = 50):
+    self.retries = retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.rate = rate
+    self.max_rate = max_rate
+    self.limiters = {}
+    self.breakers = {}
+
+  # Relative urls go to the base url of the session
+  def host(self, url: str) -> str:
+    return urlsplit(url).netloc or "base url"
+
+  # GET a url, 200 and 304 answers are returned, anything else is retried and
+  # raises a FetchError once the retries are exhausted or if it is permanent
+  # The in_flight gauges count the requests being sent to the server, not the
+  # ones waiting for the rate limiter, the circuit breaker or a retry
+  async def get(self, session: aiohttp.ClientSession, url: str, headers: dict | None = None, in_flight: list | None = None) -> FetchResponse:
+    host = self.host(url)
+    if host not in self.limiters:
+      self.limiters[host] = AdaptiveRateLimiter(self.rate, max_rate=self.max_rate)
+      self.breakers[host] = CircuitBreaker()
+    limiter = self.limiters[host]
+    breaker = self.breakers[host]
+
+    for attempt in range(self.retries + 1):
+      probe = await breaker.wait_until_closed()
+      try:
+        await limiter.acquire()
+
+        retry_after = None
+        started_at = time.monotonic()
+        for gauge in in_flight or []:
+          gauge.add(1)
+        try:
+          async with session.get(url, headers=headers) as resp:
+            if resp.status in (200, 304):
+              text = await resp.text() if resp.status == 200 else ""
+              latency = time.monotonic() - started_at
+              limiter.on_success(latency)
+              breaker.on_success()
+              return FetchResponse(resp.status, text, resp.headers.copy(), latency)
+
+            error = FetchError(url, resp.status, f"http status {resp.status}")
+            if resp.status in (429, 503):
+              retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+              limiter.on_throttled(retry_after)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+          error = FetchError(url, None, repr(e))
+        finally:
+          for gauge in in_flight or []:
+            gauge.add(-1)
+
+        # The server answered, only the page is missing
+        if error.is_permanent():
+          breaker.on_success()
+          raise error
+
+        breaker.on_failure()
+      finally:
+        # on_success and on_failure end the probe, anything else would leave
+        # the circuit open with every request waiting for it
+        if probe and breaker.probing:
+          breaker.abort_probe()
+
+      if attempt < self.retries:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        await asyncio.sleep(max(delay, retry_after or 0))
+
+    raise error
+
+  def report(self) -> str:
+    return ", ".join(f"{host}: {limiter.rate:.1f} req/s" for host, limiter in self.limiters.items())
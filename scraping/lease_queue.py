@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Work queue shared by the processes of a sharded crawl, in a sqlite file
+# Jobs are unique by key so adding a job twice is harmless. A process leases
+# a job for lease_seconds and renews its leases while it works; the jobs of a
+# process that died are leased again once their lease expires, or at once when
+# the coordinator sees the process exit. A job whose lease expired or that
+# failed max_attempts times is marked failed.
+class LeaseQueue:
+  def __init__(self, path: str = "cache/crawl_queue.sqlite3", max_attempts: int = 3):
+    self.max_attempts = max_attempts
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+      os.makedirs(directory)
+
+    # The queue is used from the worker threads of asyncio.to_thread
+    self.lock = threading.Lock()
+    self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    self.db.execute("PRAGMA journal_mode=WAL")
+    self.db.execute("""
+      CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        owner TEXT,
+        lease_expires_at REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+      )
+    """)
+    self.db.execute("CREATE INDEX IF NOT EXISTS jobs_status_priority ON jobs (status, priority, id)")
+
+  # jobs are (key, kind, payload, priority) tuples, lower priorities are leased first
+  def add_many(self, jobs: list[tuple[str, str, dict, int]]):
+    with self.lock:
+      self.db.execute("BEGIN IMMEDIATE")
+      self.db.executemany(
+        "INSERT OR IGNORE INTO jobs (key, kind, payload, priority) VALUES (?, ?, ?, ?)",
+        [(key, kind, json.dumps(payload), priority) for key, kind, payload, priority in jobs]
+      )
+      self.db.execute("COMMIT")
+
+  # Lease the next job, returns (id, kind, payload) or None when nothing can be leased now
+  def lease(self, owner: str, lease_seconds: float) -> tuple[int, str, dict] | None:
+    now = time.time()
+    with self.lock:
+      self.db.execute("BEGIN IMMEDIATE")
+      try:
+        self.db.execute(
+          "UPDATE jobs SET status = 'failed', error = 'lease expired too many times' WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+          (now, self.max_attempts)
+        )
+        row = self.db.execute(
+          "SELECT id, kind, payload FROM jobs WHERE status = 'pending' OR (status = 'leased' AND lease_expires_at < ?) ORDER BY priority, id LIMIT 1",
+          (now,)
+        ).fetchone()
+        if row is not None:
+          self.db.execute(
+            "UPDATE jobs SET status = 'leased', owner = ?, lease_expires_at = ?, attempts = attempts + 1 WHERE id = ?",
+            (owner, now + lease_seconds, row[0])
+          )
+        self.db.execute("COMMIT")
+      except BaseException:
+        self.db.execute("ROLLBACK")
+        raise
+
+    if row is None:
+      return None
+    return row[0], row[1], json.loads(row[2])
+
+  def renew(self, owner: str, lease_seconds: float):
+    with self.lock:
+      self.db.execute("UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = 'leased'", (time.time() + lease_seconds, owner))
+
+  def complete(self, job_id: int, owner: str):
+    with self.lock:
+      self.db.execute("UPDATE jobs SET status = 'done', error = NULL WHERE id = ? AND owner = ?", (job_id, owner))
+
+  def fail(self, job_id: int, owner: str, error: str):
+    with self.lock:
+      self.db.execute(
+        "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, owner = NULL, error = ? WHERE id = ? AND owner = ?",
+        (self.max_attempts, error, job_id, owner)
+      )
+
+  # Give back the leases of a process that died, owner None gives back every lease
+  def requeue(self, owner: str | None = None) -> int:
+    with self.lock:
+      if owner is None:
+        cursor = self.db.execute("UPDATE jobs SET status = 'pending', owner = NULL WHERE status = 'leased'")
+      else:
+        cursor = self.db.execute("UPDATE jobs SET status = 'pending', owner = NULL WHERE status = 'leased' AND owner = ?", (owner,))
+      return cursor.rowcount
+
+  # Nothing left to lease and no process working on a job that could add some
+  def is_drained(self) -> bool:
+    with self.lock:
+      return self.db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0] == 0
+
+  def counts(self) -> dict:
+    with self.lock:
+      return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+  def done_jobs(self, kind: str) -> list[dict]:
+    with self.lock:
+      return [json.loads(payload) for (payload,) in self.db.execute("SELECT payload FROM jobs WHERE kind = ? AND status = 'done'", (kind,))]
+
+  def reset(self):
+    with self.lock:
+      self.db.execute("DELETE FROM jobs")
+
+  def close(self):
+    with self.lock:
+      self.db.close()
@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+
+# Writers and readers of the tournament outputs in data/output
+#
+# - json: one indented {tournament_id}.json file per tournament (historical format)
+# - ndjson: one compact line per tournament, appended to tournaments-NNNNN.ndjson
+#   shards as soon as the tournament is extracted, with an index of the ids
+#
+# The dataclasses are encoded directly, without the deep copy of asdict
+
+# orjson is much faster and encodes dataclasses natively, use it when it is installed
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+def encode_tournament(tournament) -> bytes:
+  if orjson is not None:
+    return orjson.dumps(tournament)
+  return json.dumps(tournament, default=vars, separators=(",", ":")).encode("utf-8")
+
+class JsonOutputWriter:
+  def __init__(self, directory: str = "data/output"):
+    self.directory = directory
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+
+  def filename(self, tournament_id: str) -> str:
+    return os.path.join(self.directory, f"{tournament_id}.json")
+
+  def has(self, tournament_id: str) -> bool:
+    return os.path.isfile(self.filename(tournament_id))
+
+  # Written next to the file then renamed, so concurrent crawl processes
+  # writing the same tournament never leave a truncated file
+  def write(self, tournament):
+    filename = self.filename(tournament.id)
+    with open(filename + ".tmp", "w") as f:
+      json.dump(tournament, f, indent=2, default=vars)
+    os.replace(filename + ".tmp", filename)
+
+  def close(self):
+    pass
+
+class NdjsonOutputWriter:
+  def __init__(self, directory: str = "data/output", shard_max_bytes: int = 64 * 2**20):
+    self.directory = directory
+    self.shard_max_bytes = shard_max_bytes
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+
+    # index.tsv maps each written tournament id to its shard
+    self.index_path = os.path.join(directory, "index.tsv")
+    self.ids = set()
+    if os.path.isfile(self.index_path):
+      with open(self.index_path, "r") as f:
+        for line in f:
+          self.ids.add(line.split("\t")[0])
+
+    shards = sorted(glob.glob(os.path.join(directory, "tournaments-*.ndjson")))
+    self.shard_number = len(shards) if shards else 1
+    self.shard = None
+    self.index = open(self.index_path, "a")
+
+  def shard_filename(self) -> str:
+    return os.path.join(self.directory, f"tournaments-{self.shard_number:05d}.ndjson")
+
+  def has(self, tournament_id: str) -> bool:
+    return tournament_id in self.ids
+
+  def write(self, tournament):
+    self.write_line(tournament.id, encode_tournament(tournament))
+
+  # Append an already encoded tournament, used to merge the shards of other writers
+  def write_line(self, tournament_id: str, line: bytes):
+    if self.shard is None:
+      self.shard = open(self.shard_filename(), "ab")
+    if self.shard.tell() >= self.shard_max_bytes:
+      self.shard.close()
+      self.shard_number += 1
+      self.shard = open(self.shard_filename(), "ab")
+
+    self.shard.write(line.rstrip(b"\n") + b"\n")
+    self.shard.flush()
+    self.index.write(f"{tournament_id}\t{os.path.basename(self.shard_filename())}\n")
+    self.index.flush()
+    self.ids.add(tournament_id)
+
+  def close(self):
+    if self.shard is not None:
+      self.shard.close()
+    self.index.close()
+
+def make_output_writer(output_format: str, directory: str = "data/output"):
+  if output_format == "ndjson":
+    return NdjsonOutputWriter(directory)
+  return JsonOutputWriter(directory)
+
+# Yield the tournaments of an output directory as dicts, one at a time,
+# whatever the format they were written in, unreadable entries are reported and skipped
+def iter_tournaments(directory: str = "data/output"):
+  for filename in sorted(os.listdir(directory)):
+    path = os.path.join(directory, filename)
+    if filename.endswith(".json"):
+      try:
+        with open(path, "r", encoding="utf-8") as f:
+          tournament = json.load(f)
+      except ValueError as e:
+        print(f"error while reading {path}: {e}")
+        continue
+      yield tournament
+    elif filename.endswith(".ndjson"):
+      with open(path, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+          if not line.strip():
+            continue
+          try:
+            tournament = orjson.loads(line) if orjson is not None else json.loads(line)
+          except ValueError as e:
+            print(f"error while reading {path} line {line_number}: {e}")
+            continue
+          yield tournament
@@ -0,0 +1,249 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from dataclasses import dataclass
+import re
+
+# Extraction of the limitlesstcg pages into plain dataclasses
+# The parse_*_html functions take raw html and only build the part of the tree
+# they need, so they can run in a process pool and send back picklable results
+
+# lxml is much faster than the builtin parser, use it when it is installed
+try:
+  import lxml
+  html_parser = "lxml"
+except ImportError:
+  html_parser = "html.parser"
+
+# Dataclasses used for json generation
+@dataclass
+class DeckListItem:
+  type:str
+  url: str
+  name: str
+  count: int
+
+@dataclass
+class Player:
+  id: str
+  name: str
+  placing: str
+  country: str
+  decklist: list[DeckListItem]
+
+@dataclass
+class MatchResult:
+  player_id: str
+  score: int
+
+@dataclass
+class Match:
+  match_results: list[MatchResult]
+
+@dataclass
+class Tournament:
+  id: str
+  name: str
+  date: str
+  organizer: str
+  format: str
+  nb_players: str
+  players: list[Player]
+  matches:list[Match]
+
+# Extract the tr tags from a table, omiting the first header
+def extract_trs(soup: BeautifulSoup, table_class: str):
+  trs = soup.find(class_=table_class).find_all("tr")
+  trs.pop(0) # Remove header
+  return trs
+
+# Extract the previous pairing pages urls
+# This function assumes that the provided pairings page is the last of the tournament
+def extract_previous_pairings_urls(pairings: BeautifulSoup):
+  pairing_urls = pairings.find(class_="mini-nav")
+  
+  # If there is only one round, return empty array
+  if pairing_urls is None:
+    return []
+  
+  pairing_urls = pairing_urls.find_all("a")
+  
+  # Pop the last item in array because it's the current page
+  pairing_urls.pop(-1)
+
+  pairing_urls = [a.attrs["href"] for a in pairing_urls]
+  
+  return pairing_urls
+
+# Check if the pairing page is a bracket (single elimination)
+def is_bracket_pairing(pairings: BeautifulSoup):
+  return pairings.find("div", class_="live-bracket") is not None
+
+# Check if the pairing page is a table (swiss rounds)
+regex_tournament_id = re.compile(r'[a-zA-Z0-9_\-]*')
+def is_table_pairing(pairings: BeautifulSoup):
+  pairings = pairings.find("div", class_="pairings")
+  if pairings is not None:
+    table = pairings.find("table", {'data-tournament': regex_tournament_id})
+    if table is not None:
+      return True
+
+  return False
+
+# Return a list of matches from a bracket style pairing page
+def extract_matches_from_bracket_pairings(pairings: BeautifulSoup):
+  
+  matches = []
+  
+  matches_div = pairings.find("div", class_="live-bracket").find_all("div", class_="bracket-match")
+  for match in matches_div:
+    
+    # We don't extract the match if one of the players is a bye
+    if match.find("a", class_="bye") is not None:
+      continue
+
+    players_div = match.find_all("div", class_="live-bracket-player")
+    match_results = []
+    for index in range(len(players_div)):
+      player = players_div[index]
+      match_results.append(MatchResult(
+        player.attrs["data-id"],
+        int(player.find("div", class_="score").attrs["data-score"])
+      ))
+
+    matches.append(Match(match_results))
+  
+  return matches
+
+# Return a list of matches from a table style pairing page
+def extract_matches_from_table_pairings(pairings: BeautifulSoup):
+  
+  matches = []
+  
+  matches_tr = pairings.find_all("tr", {'data-completed': '1'})
+
+  for match in matches_tr:
+    p1 = match.find("td", class_="p1")
+    p2 = match.find("td", class_="p2")
+
+    if (p1 is not None and p2 is not None):
+      matches.append(Match([
+        MatchResult(p1.attrs["data-id"], int(p1.attrs["data-count"])),
+        MatchResult(p2.attrs["data-id"], int(p2.attrs["data-count"]))
+      ]))
+
+  return matches
+
+# Return a list of DeckListItems from a player decklist page
+regex_card_url = re.compile(r'pocket\.limitlesstcg\.com/cards/.*')
+def extract_decklist(decklist: BeautifulSoup) -> list[DeckListItem]:
+  decklist_div = decklist.find("div", class_="decklist")
+  cards = []
+  if decklist_div is not None:
+    cards_a = decklist_div.find_all("a", {'href': regex_card_url})
+    for card in cards_a:
+      cards.append(DeckListItem(
+        card.parent.parent.find("div", class_="heading").text.split(" ")[0],
+        card.attrs["href"],
+        card.text[2:],
+        int(card.text[0])
+      ))
+
+  return cards
+
+
+regex_player_id = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/player/[a-zA-Z0-9_]*')
+regex_decklist_url = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/player/[a-zA-Z0-9_]*/decklist')
+regex_standings_url = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/standings')
+
+@dataclass
+class StandingsRow:
+  player_id: str
+  name: str
+  placing: str
+  country: str
+  has_decklist: bool
+
+# Return the players listed on a standings page
+def extract_standings(standings_page: BeautifulSoup) -> list[StandingsRow]:
+  rows = []
+  for player_tr in extract_trs(standings_page, "striped"):
+    rows.append(StandingsRow(
+      player_tr.find("a", {'href': regex_player_id}).attrs["href"].split('/')[4],
+      player_tr.attrs['data-name'],
+      player_tr.attrs.get("data-placing", -1),
+      player_tr.attrs.get("data-country", None),
+      player_tr.find("a", {'href': regex_decklist_url}) is not None
+    ))
+  return rows
+
+@dataclass
+class PairingsPage:
+  previous_pairings_urls: list[str]
+  matches: list[Match]
+
+# Return the matches of a pairings page, whatever its style
+def extract_pairings(pairings: BeautifulSoup) -> PairingsPage:
+  if is_bracket_pairing(pairings):
+    matches = extract_matches_from_bracket_pairings(pairings)
+  elif is_table_pairing(pairings):
+    matches = extract_matches_from_table_pairings(pairings)
+  else:
+    raise Exception("Unrecognized pairing type")
+
+  return PairingsPage(extract_previous_pairings_urls(pairings), matches)
+
+@dataclass
+class TournamentListItem:
+  id: str
+  name: str
+  date: str
+  organizer: str
+  format: str
+  nb_players: str
+
+
+# Return the (current, max) page numbers of a completed tournaments page
+def extract_pagination(soup: BeautifulSoup):
+  pagination = soup.find("ul", class_="pagination")
+  return int(pagination.attrs["data-current"]), int(pagination.attrs["data-max"])
+
+# Return the tournaments listed on a completed tournaments page
+def extract_tournament_list(soup: BeautifulSoup) -> list[TournamentListItem]:
+  tournaments = []
+  for tournament_tr in extract_trs(soup, "completed-tournaments"):
+    tournaments.append(TournamentListItem(
+      tournament_tr.find("a", {'href': regex_standings_url}).attrs["href"].split('/')[2],
+      tournament_tr.attrs['data-name'],
+      tournament_tr.attrs['data-date'],
+      tournament_tr.attrs['data-organizer'],
+      tournament_tr.attrs['data-format'],
+      tournament_tr.attrs['data-players']
+    ))
+  return tournaments
+
+@dataclass
+class TournamentListPage:
+  current_page: int
+  max_page: int
+  tournaments: list[TournamentListItem]
+
+def extract_tournament_list_page(soup: BeautifulSoup) -> TournamentListPage:
+  current_page, max_page = extract_pagination(soup)
+  return TournamentListPage(current_page, max_page, extract_tournament_list(soup))
+
+# Only keep the subtrees the extractors look at
+decklist_strainer = SoupStrainer("div", class_="decklist")
+pairings_strainer = SoupStrainer(class_=["mini-nav", "live-bracket", "pairings"])
+standings_strainer = SoupStrainer(class_="striped")
+tournament_list_strainer = SoupStrainer(class_=["pagination", "completed-tournaments"])
+
+def parse_decklist_html(html: str) -> list[DeckListItem]:
+  return extract_decklist(BeautifulSoup(html, html_parser, parse_only=decklist_strainer))
+
+def parse_pairings_html(html: str) -> PairingsPage:
+  return extract_pairings(BeautifulSoup(html, html_parser, parse_only=pairings_strainer))
+
+def parse_standings_html(html: str) -> list[StandingsRow]:
+  return extract_standings(BeautifulSoup(html, html_parser, parse_only=standings_strainer))
+
+def parse_tournament_list_html(html: str) -> TournamentListPage:
+  return extract_tournament_list_page(BeautifulSoup(html, html_parser, parse_only=tournament_list_strainer))
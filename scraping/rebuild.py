@@ -0,0 +1,164 @@
+from concurrent.futures import ProcessPoolExecutor
+from cache_store import CacheStore, FileCacheStore, SqliteCacheStore, default_ttls
+from output_writer import make_output_writer
+from parsing import (
+  Player, Tournament, TournamentListItem,
+  parse_decklist_html, parse_pairings_html, parse_standings_html, parse_tournament_list_html
+)
+from scrap1 import construct_decklist_url, construct_pairings_url, construct_standings_url, construct_tournament_list_url, first_tournament_page
+import argparse
+import glob
+import os
+import time
+
+# Offline rebuild of the tournament outputs from the html cache
+# The cached listing pages give the tournaments and their metadata, then every
+# tournament is extracted again from its cached standings, decklists and
+# pairings pages on a pool of processes, without any network access
+#
+#   python scraping/rebuild.py --workers 8
+
+# Store opened by each process of the pool, configured in open_cache_store()
+cache_store: CacheStore | None = None
+
+# Pages never expire here, an old page is always better than no page offline
+def open_cache_store(cache: str, path: str | None):
+  global cache_store
+  ttls = {url_class: None for url_class in default_ttls}
+  if cache == "sqlite":
+    cache_store = SqliteCacheStore(path or "cache/pages.sqlite3", ttls=ttls, track_access=False)
+  else:
+    cache_store = FileCacheStore(path or "cache", ttls=ttls)
+
+def cached_html(url: str) -> str | None:
+  entry = cache_store.get(url)
+  return entry.html if entry is not None else None
+
+# Tournaments of the cached listing pages, in listing order without duplicates
+def list_cached_tournaments() -> list[TournamentListItem]:
+  html = cached_html(first_tournament_page)
+  if html is None:
+    raise RuntimeError("the first completed tournaments page is not cached, nothing to rebuild")
+  first_page = parse_tournament_list_html(html)
+
+  tournaments = {}
+  missing_pages = []
+  for page_number in range(1, first_page.max_page + 1):
+    if page_number == 1:
+      page = first_page
+    else:
+      html = cached_html(construct_tournament_list_url(page_number))
+      if html is None:
+        missing_pages.append(page_number)
+        continue
+      page = parse_tournament_list_html(html)
+
+    for tournament in page.tournaments:
+      tournaments.setdefault(tournament.id, tournament)
+
+  if len(missing_pages) > 0:
+    print(f"completed tournaments pages {missing_pages} are not cached, their tournaments are skipped")
+  return list(tournaments.values())
+
+# Same extraction as handle_tournament_standings_page in scrap1.py, from the cache
+# Returns the tournament, or None with the reason it cannot be rebuilt
+def rebuild_tournament(tournament: TournamentListItem) -> tuple[Tournament | None, str]:
+  html = cached_html(construct_standings_url(tournament.id))
+  if html is None:
+    return None, "standings page is not cached"
+  standings = parse_standings_html(html)
+
+  if not any(row.has_decklist for row in standings):
+    return None, "no decklist was detected"
+
+  # A decklist page the server answered with a permanent error is an empty
+  # decklist, like scrap1.py writes it. Any other uncached decklist page may
+  # just have failed to download, rebuilding it as empty would hide the cards
+  players = []
+  for row in standings:
+    if not row.has_decklist:
+      continue
+    url = construct_decklist_url(tournament.id, row.player_id)
+    html = cached_html(url)
+    if html is not None:
+      decklist = parse_decklist_html(html)
+    elif cache_store.get_missing(url) is not None:
+      decklist = []
+    else:
+      return None, f"decklist page {url} is not cached"
+    players.append(Player(row.player_id, row.name, row.placing, row.country, decklist))
+
+  html = cached_html(construct_pairings_url(tournament.id))
+  if html is None:
+    return None, "pairings page is not cached"
+  last_pairings = parse_pairings_html(html)
+
+  pairings = []
+  for url in last_pairings.previous_pairings_urls:
+    html = cached_html(url)
+    if html is None:
+      return None, f"pairings page {url} is not cached"
+    pairings.append(parse_pairings_html(html))
+  pairings.append(last_pairings)
+
+  matches = []
+  for pairing in pairings:
+    matches = matches + pairing.matches
+
+  return Tournament(
+    tournament.id,
+    tournament.name,
+    tournament.date,
+    tournament.organizer,
+    tournament.format,
+    tournament.nb_players,
+    players,
+    matches
+  ), ""
+
+def main(cache: str = "sqlite", cache_path: str | None = None, nb_workers: int = os.cpu_count(), output_format: str = "json", output_dir: str = "data/output"):
+  # ndjson shards are appended to, rebuilding into existing ones would duplicate the tournaments
+  if output_format == "ndjson" and len(glob.glob(os.path.join(output_dir, "tournaments-*.ndjson"))) > 0:
+    raise SystemExit(f"{output_dir} already holds ndjson shards, rebuild into an empty --output-dir")
+
+  started_at = time.monotonic()
+  open_cache_store(cache, cache_path)
+  tournaments = list_cached_tournaments()
+  print(f"rebuilding {len(tournaments)} cached tournaments with {nb_workers} processes")
+
+  output_writer = make_output_writer(output_format, output_dir)
+  nb_written = 0
+  nb_skipped = 0
+  try:
+    if nb_workers > 0:
+      executor = ProcessPoolExecutor(nb_workers, initializer=open_cache_store, initargs=(cache, cache_path))
+      results = executor.map(rebuild_tournament, tournaments, chunksize=4)
+    else:
+      executor = None
+      results = map(rebuild_tournament, tournaments)
+
+    for tournament, (rebuilt, reason) in zip(tournaments, results):
+      if rebuilt is None:
+        nb_skipped += 1
+        print(f"rebuilding tournament {tournament.id}... skipping because {reason}")
+        continue
+      output_writer.write(rebuilt)
+      nb_written += 1
+  finally:
+    if executor is not None:
+      executor.shutdown()
+    output_writer.close()
+    cache_store.close()
+
+  print(f"{nb_written} tournaments rebuilt in {output_dir}, {nb_skipped} skipped, in {time.monotonic() - started_at:.1f}s")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Rebuild the tournament outputs from the html cache, without network access")
+  parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of rebuild processes, 0 to rebuild in this process")
+  parser.add_argument("--cache", choices=["sqlite", "files"], default="sqlite", help="html cache backend to read")
+  parser.add_argument("--cache-path", default=None, help="sqlite file or cache directory, the scrap1.py default when omitted")
+  parser.add_argument("--output-format", choices=["json", "ndjson"], default="json", help="one indented json file per tournament, or compact ndjson shards")
+  parser.add_argument("--output-dir", default="data/output", help="where the rebuilt tournaments are written, json files are overwritten")
+  args = parser.parse_args()
+
+  main(args.cache, args.cache_path, args.workers, args.output_format, args.output_dir)
@@ -1,56 +1,41 @@
-from bs4 import BeautifulSoup, Tag
-from dataclasses import dataclass, asdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from cache_store import CacheStore, FileCacheStore, SqliteCacheStore, default_ttls, url_class
+from crawl_state import CrawlState
+from fetch import FetchError, ResilientFetcher
+from output_writer import JsonOutputWriter, NdjsonOutputWriter, make_output_writer
+from telemetry import CrawlTelemetry, timed_call
+from parsing import (
+  Match, Player, Tournament, TournamentListItem, TournamentListPage, StandingsRow,
+  parse_decklist_html, parse_pairings_html, parse_standings_html, parse_tournament_list_html
+)
 import aiohttp
-import aiofile
+import argparse
 import asyncio
+import itertools
 import os
-import json
-import re
+import time
 
 base_url = "https://play.limitlesstcg.com"
 headers = {'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.106 Safari/537.36'}
 
-# Dataclasses used for json generation
-@dataclass
-class DeckListItem:
-  type:str
-  url: str
-  name: str
-  count: int
-
-@dataclass
-class Player:
-  id: str
-  name: str
-  placing: str
-  country: str
-  decklist: list[DeckListItem]
-
-@dataclass
-class MatchResult:
-  player_id: str
-  score: int
-
-@dataclass
-class Match:
-  match_results: list[MatchResult]
-
-@dataclass
-class Tournament:
-  id: str
-  name: str
-  date: str
-  organizer: str
-  format: str
-  nb_players: str
-  players: list[Player]
-  matches:list[Match]
-
-# Extract the tr tags from a table, omiting the first header
-def extract_trs(soup: BeautifulSoup, table_class: str):
-  trs = soup.find(class_=table_class).find_all("tr")
-  trs.pop(0) # Remove header
-  return trs
+# Pool running the parse_*_html functions, configured in main()
+# When None, pages are parsed inside the event loop
+parse_executor: Executor | None = None
+
+# Store of the fetched pages, configured in main()
+cache_store: CacheStore | None = None
+
+# Tournaments and listing pages already handled, configured in main()
+crawl_state: CrawlState | None = None
+
+# Rate limited http client with retries, configured in main()
+fetcher: ResilientFetcher | None = None
+
+# Writer of the extracted tournaments, configured in main()
+output_writer: JsonOutputWriter | NdjsonOutputWriter | None = None
+
+# Latencies, sizes, cache and parse measures of the crawl, configured in main()
+telemetry: CrawlTelemetry | None = None
 
 # Urls helpers
 def construct_standings_url(tournament_id: str):
@@ -62,165 +47,104 @@ def construct_pairings_url(tournament_id: str):
 def construct_decklist_url(tournament_id: str, player_id: str):
   return f"/tournament/{tournament_id}/player/{player_id}/decklist"
 
-# Extract the previous pairing pages urls
-# This function assumes that the provided pairings page is the last of the tournament
-def extract_previous_pairings_urls(pairings: BeautifulSoup):
-  pairing_urls = pairings.find(class_="mini-nav")
-  
-  # If there is only one round, return empty array
-  if pairing_urls is None:
-    return []
+# Return the html of a url, from the cache when possible
+# Expired pages are revalidated with the validators the server sent us, a 304
+# answer keeps the cached page without downloading it again
+# Only successful answers are cached, errors raise a FetchError and permanent
+# ones (404...) are recorded as missing pages
+async def async_html_from_url(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str, use_cache: bool = True):
   
-  pairing_urls = pairing_urls.find_all("a")
-  
-  # Pop the last item in array because it's the current page
-  pairing_urls.pop(-1)
-
-  pairing_urls = [a.attrs["href"] for a in pairing_urls]
-  
-  return pairing_urls
-
-# Check if the pairing page is a bracket (single elimination)
-def is_bracket_pairing(pairings: BeautifulSoup):
-  return pairings.find("div", class_="live-bracket") is not None
-
-# Check if the pairing page is a table (swiss rounds)
-regex_tournament_id = re.compile(r'[a-zA-Z0-9_\-]*')
-def is_table_pairing(pairings: BeautifulSoup):
-  pairings = pairings.find("div", class_="pairings")
-  if pairings is not None:
-    table = pairings.find("table", {'data-tournament': regex_tournament_id})
-    if table is not None:
-      return True
-
-  return False
-
-# Return a list of matches from a bracket style pairing page
-def extract_matches_from_bracket_pairings(pairings: BeautifulSoup):
-  
-  matches = []
-  
-  matches_div = pairings.find("div", class_="live-bracket").find_all("div", class_="bracket-match")
-  for match in matches_div:
-    
-    # We don't extract the match if one of the players is a bye
-    if match.find("a", class_="bye") is not None:
-      continue
-
-    players_div = match.find_all("div", class_="live-bracket-player")
-    match_results = []
-    for index in range(len(players_div)):
-      player = players_div[index]
-      match_results.append(MatchResult(
-        player.attrs["data-id"],
-        int(player.find("div", class_="score").attrs["data-score"])
-      ))
-
-    matches.append(Match(match_results))
-  
-  return matches
-
-# Return a list of matches from a table style pairing page
-def extract_matches_from_table_pairings(pairings: BeautifulSoup):
-  
-  matches = []
+  if url is None:
+    return None
   
-  matches_tr = pairings.find_all("tr", {'data-completed': '1'})
-
-  for match in matches_tr:
-    p1 = match.find("td", class_="p1")
-    p2 = match.find("td", class_="p2")
+  async with sem:
+    entry = await asyncio.to_thread(cache_store.get, url)
+  if use_cache and entry is not None and entry.fresh:
+    telemetry.record_cache(url_class(url), True)
+    return entry.html
+  telemetry.record_cache(url_class(url), False)
+
+  conditional_headers = {}
+  if entry is not None:
+    if entry.etag is not None:
+      conditional_headers["If-None-Match"] = entry.etag
+    if entry.last_modified is not None:
+      conditional_headers["If-Modified-Since"] = entry.last_modified
+
+  try:
+    resp = await fetcher.get(session, url, conditional_headers, telemetry.in_flight_gauges(url_class(url)))
+  except FetchError as e:
+    telemetry.record_fetch(url_class(url), 0, None, 0)
+    # Kept so the offline rebuild handles the missing page like the crawl does
+    if e.is_permanent():
+      async with sem:
+        await asyncio.to_thread(cache_store.put_missing, url, e.status)
+    raise
+  telemetry.record_fetch(url_class(url), resp.latency, resp.status, len(resp.text))
+
+  if resp.status == 304:
+    if entry is None:
+      raise FetchError(url, resp.status, "not modified answer without a cached page")
+    async with sem:
+      await asyncio.to_thread(cache_store.refresh, url)
+    return entry.html
 
-    if (p1 is not None and p2 is not None):
-      matches.append(Match([
-        MatchResult(p1.attrs["data-id"], int(p1.attrs["data-count"])),
-        MatchResult(p2.attrs["data-id"], int(p2.attrs["data-count"]))
-      ]))
+  async with sem:
+    await asyncio.to_thread(cache_store.put, url, resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
 
-  return matches
+  return resp.text
 
-# Return a list of DeckListItems from a player decklist page
-regex_card_url = re.compile(r'pocket\.limitlesstcg\.com/cards/.*')
-def extract_decklist(decklist: BeautifulSoup) -> list[DeckListItem]:
-  decklist_div = decklist.find("div", class_="decklist")
-  cards = []
-  if decklist_div is not None:
-    cards_a = decklist_div.find_all("a", {'href': regex_card_url})
-    for card in cards_a:
-      cards.append(DeckListItem(
-        card.parent.parent.find("div", class_="heading").text.split(" ")[0],
-        card.attrs["href"],
-        card.text[2:],
-        int(card.text[0])
-      ))
-
-  return cards
-
-# Extract a beautiful soup object from a url
-async def async_soup_from_url(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str, use_cache: bool = True):
-  
-  if url is None:
+# Fetch a url and run one of the parse_*_html functions on it, in the parse pool if any
+async def async_parse_from_url(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str, parse_html, use_cache: bool = True):
+  html = await async_html_from_url(session, sem, url, use_cache)
+  if html is None:
     return None
-  
-  # Construct cache filename
-  cache_filename = "cache" + url
-  cache_filename = ''.join(x for x in cache_filename if (x == "/" or x.isalnum()))
-  cache_filename = re.sub(r'\bnul\b','__nul__', cache_filename)
-  cache_filename = f"{cache_filename}.html"
-  
-  html = ""
 
-  if use_cache and os.path.isfile(cache_filename):
-    # print(f"url {url} is in cache")
-    async with sem:
-      async with aiofile.async_open(cache_filename, "r") as file:
-        html = await file.read()
+  if parse_executor is None:
+    result, parse_time = timed_call(parse_html, html)
   else:
-    # print(f"url {url} is not in cache, requesting from source")
-    async with session.get(url) as resp:
-      html = await resp.text()
+    result, parse_time = await asyncio.get_running_loop().run_in_executor(parse_executor, timed_call, parse_html, html)
+  telemetry.record_parse(url_class(url), parse_time)
 
-    directory = os.path.dirname(cache_filename)
-    if not os.path.exists(directory):
-      os.makedirs(directory)
-    
-    async with sem:
-      async with aiofile.async_open(cache_filename, "w") as file:
-        await file.write(html)
+  return result
 
-  return BeautifulSoup(html, 'html.parser')
+# Await a coroutine and record how long it took
+async def timed_stage(stage: str, coroutine):
+  started_at = time.monotonic()
+  try:
+    return await coroutine
+  finally:
+    telemetry.record_stage(stage, time.monotonic() - started_at)
 
 async def extract_players(
   session: aiohttp.ClientSession,
   sem: asyncio.Semaphore,
-  standings_page: BeautifulSoup,
+  standings: list[StandingsRow],
   tournament_id: str) -> list[Player]:
 
-  players = []
-  player_trs = extract_trs(standings_page, "striped")
-  player_ids = [player_tr.find("a", {'href': regex_player_id}).attrs["href"].split('/')[4] for player_tr in player_trs]
-  has_decklist = [player_tr.find("a", {'href': regex_decklist_url}) is not None for player_tr in player_trs]
-  player_names=[player_tr.attrs['data-name'] for player_tr in player_trs]
-  player_placings=[player_tr.attrs.get("data-placing", -1) for player_tr in player_trs]
-  player_countries=[player_tr.attrs.get("data-country", None) for player_tr in player_trs]
-
-  decklist_urls = []
-  for i in range(len(player_ids)):
-    decklist_urls.append(construct_decklist_url(tournament_id, player_ids[i]) if has_decklist[i] else None)
+  decklist_urls = [construct_decklist_url(tournament_id, row.player_id) if row.has_decklist else None for row in standings]
 
-  player_decklists = await asyncio.gather(*[async_soup_from_url(session, sem, url, True) for url in decklist_urls])
+  player_decklists = await asyncio.gather(*[async_parse_from_url(session, sem, url, parse_decklist_html, True) for url in decklist_urls], return_exceptions=True)
 
   players = []
-  for i in range(len(player_ids)):
+  for i in range(len(standings)):
+    # A missing decklist page is kept as an empty decklist, other errors fail
+    # the tournament so it is crawled again next time
+    if isinstance(player_decklists[i], FetchError) and player_decklists[i].is_permanent():
+      print(f"decklist of player {standings[i].player_id} in tournament {tournament_id} is missing: {player_decklists[i]}")
+      player_decklists[i] = []
+    elif isinstance(player_decklists[i], BaseException):
+      raise player_decklists[i]
+
     if player_decklists[i] is None:
       continue
 
     players.append(Player(
-      player_ids[i],
-      player_names[i],
-      player_placings[i],
-      player_countries[i],
-      extract_decklist(player_decklists[i])
+      standings[i].player_id,
+      standings[i].name,
+      standings[i].placing,
+      standings[i].country,
+      player_decklists[i]
     ))
 
   return players
@@ -231,27 +155,19 @@ async def extract_matches(
   tournament_id: str) -> list[Match]:
 
   matches = []
-  last_pairings = await async_soup_from_url(session, sem, construct_pairings_url(tournament_id))
-  previous_pairings_urls = extract_previous_pairings_urls(last_pairings)
-  pairings = await asyncio.gather(*[async_soup_from_url(session, sem, url) for url in previous_pairings_urls])
+  last_pairings = await async_parse_from_url(session, sem, construct_pairings_url(tournament_id), parse_pairings_html)
+  pairings = await asyncio.gather(*[async_parse_from_url(session, sem, url, parse_pairings_html) for url in last_pairings.previous_pairings_urls])
   pairings.append(last_pairings)
 
   for pairing in pairings:
-    if is_bracket_pairing(pairing):
-      matches = matches + extract_matches_from_bracket_pairings(pairing)
-    elif is_table_pairing(pairing):
-      matches = matches + extract_matches_from_table_pairings(pairing)
-    else:
-      raise Exception("Unrecognized pairing type")
+    matches = matches + pairing.matches
     
   return matches
 
-regex_player_id = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/player/[a-zA-Z0-9_]*')
-regex_decklist_url = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/player/[a-zA-Z0-9_]*/decklist')
 async def handle_tournament_standings_page(
     session: aiohttp.ClientSession,
     sem: asyncio.Semaphore,
-    standings_page: BeautifulSoup,
+    standings: list[StandingsRow],
     tournament_id: str, 
     tournament_name: str,
     tournament_date: str,
@@ -259,30 +175,21 @@ async def handle_tournament_standings_page(
     tournament_format: str,
     tournament_nb_players: int):
   
-  output_file = f"data/output/{tournament_id}.json"
-  
-  print(f"extracting tournament {tournament_id}", end="... ")
-
-  # If the json file for this tournament already exists, we don't recreate it
-  if os.path.isfile(output_file):
-    print("skipping because tournament is already in output")
+  # Only players with a decklist are kept, the standings tell if there is any
+  if not any(row.has_decklist for row in standings):
+    print(f"extracting tournament {tournament_id}... skipping because no decklist was detected")
     return
-  else:
-    directory = os.path.dirname(output_file)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
 
-  players = await extract_players(session, sem, standings_page, tournament_id)
-  if len(players) == 0:
-    print("skipping because no decklist was detected")
-    return
+  # Decklists and pairings are independent, fetch them at the same time
+  players, matches = await asyncio.gather(
+    timed_stage("extract_players", extract_players(session, sem, standings, tournament_id)),
+    timed_stage("extract_matches", extract_matches(session, sem, tournament_id))
+  )
   
   nb_decklists = 0
   for player in players:
     if len(player.decklist) > 0:
       nb_decklists += 1
-  
-  matches = await extract_matches(session, sem, tournament_id)
 
   tournament = Tournament(
     tournament_id,
@@ -295,48 +202,176 @@ async def handle_tournament_standings_page(
     matches
   )
 
-  print(f"{len(players)} players, {nb_decklists} decklists, {len(matches)} matches")
-  
-  with open(output_file, "w") as f:
-    json.dump(asdict(tournament), f, indent=2)
+  print(f"extracting tournament {tournament_id}... {len(players)} players, {nb_decklists} decklists, {len(matches)} matches")
+
+  output_writer.write(tournament)
 
 first_tournament_page = "/tournaments/completed?game=POCKET&format=STANDARD&platform=all&type=online&time=all" #&page=53"
-regex_standings_url = re.compile(r'/tournament/[a-zA-Z0-9_\-]*/standings')
-async def handle_tournament_list_page(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str):
-  soup = await async_soup_from_url(session, sem, url, False)
-  
-  current_page = int(soup.find("ul", class_="pagination").attrs["data-current"])
-  max_page = int(soup.find("ul", class_="pagination").attrs["data-max"])
-  
-  print(f"extracting completed tournaments page {current_page}")
-
-  tournament_trs = extract_trs(soup, "completed-tournaments")
-  tournament_ids = [tournament_tr.find("a", {'href': regex_standings_url}).attrs["href"].split('/')[2] for tournament_tr in tournament_trs]
-  tournament_names=[tournament_tr.attrs['data-name']for tournament_tr in tournament_trs]
-  tournament_dates=[tournament_tr.attrs['data-date']for tournament_tr in tournament_trs]
-  tournament_organizers=[tournament_tr.attrs['data-organizer']for tournament_tr in tournament_trs]
-  tournament_formats=[tournament_tr.attrs['data-format']for tournament_tr in tournament_trs]
-  tournament_nb_players=[tournament_tr.attrs['data-players']for tournament_tr in tournament_trs]
-  
-  standings_urls = [construct_standings_url(tournament_id) for tournament_id in tournament_ids]
-  
-  # Get all standings page asynchroneously
-  standings = await asyncio.gather(*[async_soup_from_url(session, sem, url) for url in standings_urls])
 
-  for i in range(len(tournament_ids)):
-    await handle_tournament_standings_page(session, sem, standings[i], tournament_ids[i], tournament_names[i], tournament_dates[i], tournament_organizers[i], tournament_formats[i], tournament_nb_players[i])
+# Number of worker tasks pulling jobs from the crawl queue, which is also the
+# number of tournaments handled at the same time
+default_nb_workers = 8
 
-  if current_page < max_page:
-    await handle_tournament_list_page(session, sem, f"{first_tournament_page}&page={current_page+1}")
+# Listing pages come first so tournaments are discovered early, then the
+# smallest tournaments first so outputs keep flowing while big ones are fetched
+job_counter = itertools.count()
+def queue_job(queue: asyncio.PriorityQueue, kind: str, job):
+  if kind == "list":
+    priority = (0, 0)
+  else:
+    nb_players = job[1].nb_players
+    priority = (1, int(nb_players) if nb_players.isdigit() else 0)
+  queue.put_nowait((priority, next(job_counter), kind, job))
+
+def construct_tournament_list_url(page: int):
+  return f"{first_tournament_page}&page={page}"
+
+# Queue the tournaments of a completed tournaments page
+# When walking from a watermark, the listing is newest first: the tournaments
+# older than the watermark are skipped and the next page is only queued while
+# this one has not reached the watermark. Known tournaments do not stop the
+# walk, an interrupted crawl may have left unknown ones between them and the
+# watermark
+async def handle_tournament_list_page(queue: asyncio.PriorityQueue, page: TournamentListPage, incremental: bool):
+  print(f"extracting completed tournaments page {page.current_page}")
+
+  tournaments = page.tournaments
+  if incremental:
+    tournaments = [tournament for tournament in tournaments if not crawl_state.is_past_watermark(tournament.date)]
+
+  crawl_state.track_page(page.current_page, len(tournaments))
+  for tournament in tournaments:
+    queue_job(queue, "tournament", (page.current_page, tournament))
+
+  if incremental:
+    if len(tournaments) < len(page.tournaments):
+      print(f"stopping at completed tournaments page {page.current_page}, the next pages are older than the watermark")
+    elif page.current_page < page.max_page:
+      queue_job(queue, "list", page.current_page + 1)
+
+# Tournaments already in the output are skipped before their standings page is
+# fetched, and in incremental mode the tournaments known from the previous crawls
+async def handle_tournament(session: aiohttp.ClientSession, sem: asyncio.Semaphore, page: int, tournament: TournamentListItem, incremental: bool = False):
+  if output_writer.has(tournament.id):
+    print(f"extracting tournament {tournament.id}... skipping because tournament is already in output")
+  elif incremental and crawl_state.is_known(tournament.id):
+    print(f"extracting tournament {tournament.id}... skipping because tournament is already known")
+  else:
+    standings = await async_parse_from_url(session, sem, construct_standings_url(tournament.id), parse_standings_html)
+    await timed_stage("tournament", handle_tournament_standings_page(session, sem, standings, tournament.id, tournament.name, tournament.date, tournament.organizer, tournament.format, tournament.nb_players))
+
+  crawl_state.mark_tournament_done(page, tournament.id, tournament.date)
+
+# Pull jobs from the queue until the crawler cancels the task
+# A job is either ("list", page number) or ("tournament", (page number, TournamentListItem))
+# walk_pages: listing walked page by page, skip_known: known tournaments skipped
+async def crawl_worker(session: aiohttp.ClientSession, sem: asyncio.Semaphore, queue: asyncio.PriorityQueue, walk_pages: bool, skip_known: bool):
+  while True:
+    _, _, kind, job = await queue.get()
+    try:
+      if kind == "list":
+        page = await async_parse_from_url(session, sem, construct_tournament_list_url(job), parse_tournament_list_html)
+        await handle_tournament_list_page(queue, page, walk_pages)
+      else:
+        await handle_tournament(session, sem, *job, skip_known)
+    except Exception as e:
+      crawl_state.mark_failed()
+      print(f"error while handling {kind} {job}: {e!r}")
+    finally:
+      queue.task_done()
+
+# Crawl the completed tournaments pages with a pool of workers
+# The first page gives the number of pages, then all listing pages and tournaments
+# go through the same queue so the connection pool is always busy
+# In incremental mode the listing is walked page by page down to the watermark
+async def crawl_tournament_list(session: aiohttp.ClientSession, sem: asyncio.Semaphore, nb_workers: int = default_nb_workers, incremental: bool = False):
+  queue = asyncio.PriorityQueue()
+
+  first_page = await async_parse_from_url(session, sem, first_tournament_page, parse_tournament_list_html)
+  if len(first_page.tournaments) > 0:
+    crawl_state.start_listing(first_page.tournaments[0].id)
+
+  # Without a watermark (first crawl, or no crawl finished yet) nothing tells
+  # where the walk could stop: every page is queued, and the pages an
+  # interrupted crawl completed are skipped
+  walk_pages = incremental and crawl_state.watermark_date is not None
+
+  # Without --incremental the output folder is all there is to go on (run.py
+  # deletes it after each run), so every tournament missing from it is crawled
+  await handle_tournament_list_page(queue, first_page, walk_pages)
+  if not walk_pages:
+    for page in range(2, first_page.max_page + 1):
+      if incremental and crawl_state.is_page_completed(page):
+        print(f"skipping completed tournaments page {page}, already handled by the previous crawl")
+      else:
+        queue_job(queue, "list", page)
+
+  workers = [asyncio.create_task(crawl_worker(session, sem, queue, walk_pages, incremental)) for _ in range(nb_workers)]
+  await queue.join()
+
+  for worker in workers:
+    worker.cancel()
+  await asyncio.gather(*workers, return_exceptions=True)
+
+async def main(nb_workers: int = default_nb_workers, nb_parse_workers: int = os.cpu_count(), cache: CacheStore | None = None, incremental: bool = False, http_fetcher: ResilientFetcher | None = None, output_format: str = "json", metrics_dir: str = "data/metrics"):
+  global parse_executor, cache_store, crawl_state, fetcher, output_writer, telemetry
+
+  cache_store = cache if cache is not None else SqliteCacheStore()
+  crawl_state = CrawlState()
+  fetcher = http_fetcher if http_fetcher is not None else ResilientFetcher()
+  output_writer = make_output_writer(output_format)
+  telemetry = CrawlTelemetry()
 
-async def main():
   # Limit number of concurent http calls
   connector = aiohttp.TCPConnector(limit=20)
+  timeout = aiohttp.ClientTimeout(total=60, sock_connect=10)
 
-  # Limit number of concurent open files
+  # Limit number of concurent cache reads and writes
   sem = asyncio.Semaphore(50)
 
-  async with aiohttp.ClientSession(base_url=base_url, connector=connector) as session:
-    await handle_tournament_list_page(session, sem, first_tournament_page)
-    
-asyncio.run(main())
\ No newline at end of file
+  # Parse pages on every core, the event loop only deals with the network
+  if nb_parse_workers > 0:
+    parse_executor = ProcessPoolExecutor(nb_parse_workers)
+
+  try:
+    async with aiohttp.ClientSession(base_url=base_url, connector=connector, timeout=timeout) as session:
+      await crawl_tournament_list(session, sem, nb_workers, incremental)
+    crawl_state.finish()
+  finally:
+    crawl_state.save()
+    if parse_executor is not None:
+      parse_executor.shutdown()
+      parse_executor = None
+    print(cache_store.stats.report())
+    print(f"request rates: {fetcher.report()}")
+    cache_store.close()
+    output_writer.close()
+    telemetry.write(metrics_dir)
+    print(f"crawl metrics written to {metrics_dir}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Scrap the completed tournaments of limitlesstcg")
+  parser.add_argument("--workers", type=int, default=default_nb_workers, help="number of listing pages and tournaments handled at the same time")
+  parser.add_argument("--parse-workers", type=int, default=os.cpu_count(), help="number of html parsing processes, 0 to parse in the event loop")
+  parser.add_argument("--cache", choices=["sqlite", "files"], default="sqlite", help="html cache backend, files reads the legacy one file per url cache")
+  parser.add_argument("--cache-max-mb", type=int, default=None, help="evict the least recently used pages above this compressed size")
+  parser.add_argument("--revalidate", action="store_true", help="consider every cached page expired and revalidate it with the server")
+  parser.add_argument("--base-url", default=base_url, help="site to crawl, e.g. a local fake_limitless.py server")
+  parser.add_argument("--incremental", action="store_true", help="stop the listing walk at the tournaments ingested by the previous crawls")
+  parser.add_argument("--rate", type=float, default=5, help="initial requests per second, adapted to the answers of the server")
+  parser.add_argument("--max-rate", type=float, default=50, help="upper bound of the adaptive request rate")
+  parser.add_argument("--retries", type=int, default=5, help="retries of a failed request before giving up")
+  parser.add_argument("--output-format", choices=["json", "ndjson"], default="json", help="one indented json file per tournament, or compact ndjson shards")
+  parser.add_argument("--metrics-dir", default="data/metrics", help="where the json summary and prometheus metrics of the crawl are written")
+  args = parser.parse_args()
+
+  base_url = args.base_url
+  ttls = {url_class: 0 for url_class in default_ttls} if args.revalidate else None
+  if args.cache == "sqlite":
+    cache = SqliteCacheStore(max_bytes=args.cache_max_mb * 2**20 if args.cache_max_mb else None, ttls=ttls)
+  else:
+    cache = FileCacheStore(ttls=ttls)
+
+  http_fetcher = ResilientFetcher(retries=args.retries, rate=args.rate, max_rate=args.max_rate)
+
+  asyncio.run(main(args.workers, args.parse_workers, cache, args.incremental, http_fetcher, args.output_format, args.metrics_dir))
@@ -1,229 +1,158 @@
 import json
 import os
-import requests
-from bs4 import BeautifulSoup
 import time
-from urllib.parse import urljoin
 import pandas as pd
-import re
+import argparse
+import asyncio
+import aiohttp
+from concurrent.futures import ProcessPoolExecutor
+from card_catalog import CardCatalog
+from card_parser import parse_card_html, parse_evolves_from_search, parse_stored_card
+from card_urls import CardUrlIndex
+from evolves_resolver import EvolvesFromResolver
+from fetch import FetchError, ResilientFetcher
 
-def extract_urls_from_json_files(directory_path):
-    all_urls = set()
-    
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory_path, filename)
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    
-                    if 'players' in data:
-                        for player in data['players']:
-                            if 'decklist' in player:
-                                for card in player['decklist']:
-                                    if 'url' in card:
-                                        all_urls.add(card['url'])
-                                        
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"Erreur lors de la lecture du fichier {filename}: {e}")
+# À incrémenter à chaque changement de card_parser : les cartes du catalogue
+# extraites par une version précédente sont alors réextraites de leur page
+# gardée avec --reparse, ou scrapées à nouveau si la page n'a pas été gardée
+parser_version = 1
+
+user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def extract_urls_from_json_files(directory_path, workers=None, index=None):
+    # Les URLs sont lues en parallèle et en flux, seulement dans les fichiers
+    # nouveaux ou modifiés depuis le dernier passage
+    if index is None:
+        index = CardUrlIndex()
+    all_urls = index.update(directory_path, workers)
+    index.save()
     
     return sorted(list(all_urls))
 
-def get_all_evolves_from_urls(soup, session):
+async def scrape_card_info_async(url, session, fetcher):
     """
-    Récupère TOUS les liens vers les cartes qui évoluent en ce Pokémon
+    Scrape une carte, les requêtes passent par le limiteur de débit et les
+    relances de fetcher, et les erreurs sont levées.
+    Les évolutions ne sont pas résolues ici : renvoie la carte, l'URL de sa
+    recherche "Evolves from" (ou None), traitée ensuite par EvolvesFromResolver,
+    et la page, gardée dans le catalogue pour pouvoir la réextraire hors ligne
     """
-    type_elem = soup.find('p', class_='card-text-type')
-    if not type_elem:
-        return []
+    response = await fetcher.get(session, url)
     
-    if 'Evolves from' not in type_elem.get_text():
-        return []
+    card_info, search_url = parse_card_html(url, response.text)
     
-    evolves_link = type_elem.find('a')
-    if not evolves_link:
-        return []
+    return card_info, search_url, response.text
+
+def assemble_cards(urls, catalog, resolver):
+    """
+    Compacte le catalogue en la liste des cartes demandées, dans l'ordre des
+    URLs, avec leurs évolutions connues du resolver
+    """
+    cards, failed_urls = catalog.get_cards(urls)
     
-    search_url = 'https://pocket.limitlesstcg.com' + evolves_link.get('href')
+    for card_info, search_url in cards:
+        if search_url:
+            card_info['evolves_from'] = resolver.get(search_url)
     
-    try:
-        response = session.get(search_url, timeout=10)
-        response.raise_for_status()
-        search_soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Trouver tous les liens vers les cartes dans la grille de recherche
-        card_links = []
-        
-        # Chercher dans la grille de cartes
-        card_grid = search_soup.find('div', class_='card-search-grid')
-        if card_grid:
-            # Trouver tous les liens vers les cartes (qui se terminent par un numéro, pas par des paramètres)
-            links = card_grid.find_all('a', href=re.compile(r'/cards/[^?]+$'))
-            for link in links:
-                full_url = 'https://pocket.limitlesstcg.com' + link.get('href')
-                card_links.append(full_url)
-        
-        # Si aucune carte trouvée dans la grille, essayer l'ancienne méthode
-        if not card_links:
-            card_link = search_soup.find('a', href=re.compile(r'/cards/[^?]+$'))
-            if card_link:
-                full_url = 'https://pocket.limitlesstcg.com' + card_link.get('href')
-                card_links.append(full_url)
-        
-        print(f"    Trouvé {len(card_links)} cartes qui évoluent vers cette carte")
-        return card_links
-        
-    except Exception as e:
-        print(f"    Erreur lors de la récupération des cartes d'évolution: {e}")
-        return []
+    cards_data = [card_info for card_info, search_url in cards]
+    
+    return cards_data, failed_urls
 
-def scrape_card_info(url, session):
-    try:
-        response = session.get(url, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        card_info = {
-            'url': url,
-            'nom': None,
-            'type_carte': None,
-            'sous_type': None,
-            'hp': None,
-            'evolving_stage': None,
-            'evolves_from': [],  # Maintenant c'est une liste
-            'competence_1_nom': None,
-            'competence_1_puissance': None,
-            'competence_2_nom': None,
-            'competence_2_puissance': None,
-            'faiblesse': None,
-            'retreat': None
-        }
-        
-        name_elem = soup.find('span', class_='card-text-name')
-        if name_elem:
-            link = name_elem.find('a')
-            if link:
-                card_info['nom'] = link.get_text().strip()
+async def scrape_all_cards_async(urls, requests_per_second=2, concurrency=8, resolver=None, catalog=None, retry_rounds=2, retry_delay=30):
+    if resolver is None:
+        resolver = EvolvesFromResolver()
+    if catalog is None:
+        catalog = CardCatalog()
+    
+    # Seules les cartes absentes du catalogue, en échec ou extraites par un
+    # ancien parseur sont téléchargées
+    urls_to_scrape = catalog.urls_to_scrape(urls, parser_version)
+    print(f"{len(urls) - len(urls_to_scrape)} cartes déjà dans le catalogue ou en attente, {len(urls_to_scrape)} à scraper")
+    
+    # Le débit est plafonné à requests_per_second par le limiteur de fetcher,
+    # concurrency borne le nombre de cartes en cours de traitement
+    fetcher = ResilientFetcher(retries=3, rate=requests_per_second, max_rate=requests_per_second)
+    sem = asyncio.Semaphore(concurrency)
+    
+    total_urls = len(urls_to_scrape)
+    done = 0
+    transient_failures = []
+    
+    timeout = aiohttp.ClientTimeout(total=30, sock_connect=10)
+    async with aiohttp.ClientSession(headers={'User-Agent': user_agent}, timeout=timeout) as session:
         
-        type_elem = soup.find('p', class_='card-text-type')
-        if type_elem:
-            type_text = ' '.join(type_elem.get_text().split())
+        async def scrape_one(url):
+            nonlocal done
+            try:
+                async with sem:
+                    card_info, search_url, html = await scrape_card_info_async(url, session, fetcher)
+            except FetchError as e:
+                print(f"Erreur lors du scraping de {url}: {e}")
+                card_info, error, permanent = None, str(e), e.is_permanent()
+            except Exception as e:
+                print(f"Erreur inattendue pour {url}: {e}")
+                card_info, error, permanent = None, repr(e), True
             
-            if 'Trainer - ' in type_text:
-                card_info['type_carte'] = 'Trainer'
-                parts = type_text.split('Trainer - ')
-                if len(parts) > 1:
-                    card_info['sous_type'] = parts[1].strip()
-                
-            elif 'Pokémon - ' in type_text:
-                card_info['type_carte'] = 'Pokémon'
-                
-                if 'Basic' in type_text:
-                    card_info['evolving_stage'] = 'Basic'
-                elif 'Stage 1' in type_text:
-                    card_info['evolving_stage'] = 'Stage 1'
-                elif 'Stage 2' in type_text:
-                    card_info['evolving_stage'] = 'Stage 2'
-                
-                # Récupérer TOUS les liens d'évolution
-                card_info['evolves_from'] = get_all_evolves_from_urls(soup, session)
+            done += 1
+            print(f"Scraping {done}/{total_urls}: {url}")
+            if card_info:
+                catalog.put_card(url, card_info, search_url, parser_version, html)
+                print(f"  Succès: {card_info['nom']} ({card_info['type_carte']})")
+            else:
+                catalog.put_failure(url, error, parser_version, permanent)
+                if not permanent:
+                    transient_failures.append(url)
+                print(f"  Échec")
         
-        if card_info['type_carte'] == 'Pokémon':
-            page_text = soup.get_text()
-            
-            hp_pattern = r'([A-Za-z]+)\s*-\s*(\d+)\s*HP'
-            hp_match = re.search(hp_pattern, page_text)
-            if hp_match:
-                card_info['sous_type'] = hp_match.group(1).strip()
-                card_info['hp'] = int(hp_match.group(2))
-            
-            attack_elements = soup.find_all('p', class_='card-text-attack-info')
-            
-            attacks = []
-            for attack_elem in attack_elements:
-                full_text = attack_elem.get_text().strip()
-                
-                symbol_elem = attack_elem.find('span', class_='ptcg-symbol')
-                attack_text = full_text
-                
-                if symbol_elem:
-                    symbol_text = symbol_elem.get_text().strip()
-                    if attack_text.startswith(symbol_text):
-                        attack_text = attack_text[len(symbol_text):].strip()
-                
-                # Pattern corrigé - le "-" doit être à la fin ou échappé
-                match = re.match(r'^([A-Za-z\s\-\',]+?)(?:\s+(\d+[+x\-]?))?$', attack_text)
-                
-                if match:
-                    attack_name = match.group(1).strip()
-                    power_text = match.group(2)
-                    
-                    if power_text:
-                        power = power_text  # Conserver comme string avec le "+", "x", "-" s'il existe
-                    else:
-                        power = "0"
-                    
-                    attacks.append((attack_name, power))
-            
-            if len(attacks) >= 1:
-                card_info['competence_1_nom'] = attacks[0][0]
-                card_info['competence_1_puissance'] = attacks[0][1]
-            
-            if len(attacks) >= 2:
-                card_info['competence_2_nom'] = attacks[1][0]
-                card_info['competence_2_puissance'] = attacks[1][1]
-            
-            weakness_pattern = r'Weakness:\s*([A-Za-z]+)'
-            weakness_match = re.search(weakness_pattern, page_text)
-            if weakness_match:
-                card_info['faiblesse'] = weakness_match.group(1).strip()
-            
-            retreat_pattern = r'Retreat:\s*(\d+)'
-            retreat_match = re.search(retreat_pattern, page_text)
-            if retreat_match:
-                card_info['retreat'] = int(retreat_match.group(1))
+        await asyncio.gather(*[scrape_one(url) for url in urls_to_scrape])
         
-        return card_info
+        # Les échecs passagers (site indisponible, trop de requêtes) sont
+        # retentés après une pause qui double à chaque tour
+        for retry_round in range(retry_rounds):
+            if not transient_failures:
+                break
+            urls_to_retry = transient_failures
+            transient_failures = []
+            delay = retry_delay * 2 ** retry_round
+            print(f"\n{len(urls_to_retry)} cartes en échec, nouvel essai dans {delay}s...")
+            await asyncio.sleep(delay)
+            total_urls += len(urls_to_retry)
+            await asyncio.gather(*[scrape_one(url) for url in urls_to_retry])
         
-    except requests.RequestException as e:
-        print(f"Erreur lors du scraping de {url}: {e}")
-        return None
-    except Exception as e:
-        print(f"Erreur inattendue pour {url}: {e}")
-        return None
-
-def scrape_all_cards(urls, delay=1):
-    cards_data = []
-    failed_urls = []
+        # Deuxième phase : chaque recherche "Evolves from" n'est faite qu'une
+        # fois, quel que soit le nombre d'impressions de la carte qui y mènent
+        cards, failed_urls = catalog.get_cards(urls)
+        unique_search_urls = set(search_url for card_info, search_url in cards if search_url)
+        print(f"\nRésolution de {len(unique_search_urls)} recherches d'évolutions uniques...")
+        await resolver.resolve_all(unique_search_urls, session, fetcher, parse_evolves_from_search, concurrency)
+        print(f"Recherches d'évolutions: {resolver.report()}")
     
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    })
+    if fetcher.limiters:
+        print(f"Débit final: {fetcher.report()}")
     
-    total_urls = len(urls)
+    return assemble_cards(urls, catalog, resolver)
+
+def scrape_all_cards(urls, requests_per_second=2, concurrency=8, resolver=None, catalog=None):
+    return asyncio.run(scrape_all_cards_async(urls, requests_per_second, concurrency, resolver, catalog))
+
+def reparse_catalog(catalog, workers=None):
+    """
+    Réextrait hors ligne toutes les cartes dont la page est gardée dans le
+    catalogue, avec le parseur actuel, sur tous les coeurs
+    """
+    rows = catalog.get_stored_pages()
+    print(f"Réextraction de {len(rows)} pages de cartes...")
     
-    for i, url in enumerate(urls, 1):
-        print(f"Scraping {i}/{total_urls}: {url}")
-        
-        card_info = scrape_card_info(url, session)
-        
-        if card_info:
-            cards_data.append(card_info)
-            evolves_count = len(card_info['evolves_from']) if card_info['evolves_from'] else 0
-            print(f"  Succès: {card_info['nom']} ({card_info['type_carte']}) - {evolves_count} évolutions trouvées")
-        else:
-            failed_urls.append(url)
-            print(f"  Échec")
-        
-        if i < total_urls:
-            time.sleep(delay)
+    started_at = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(parse_stored_card, rows, chunksize=max(1, len(rows) // 256)))
     
-    session.close()
+    errors = catalog.put_reparsed(results, parser_version)
+    for url, card_info, search_url, error in results:
+        if error:
+            print(f"Erreur inattendue pour {url}: {error}")
     
-    return cards_data, failed_urls
+    print(f"{len(results) - errors} cartes réextraites, {errors} erreurs en {time.perf_counter() - started_at:.1f}s")
 
 def save_results(cards_data, failed_urls, output_dir="data/output_added"):
     os.makedirs(output_dir, exist_ok=True)
@@ -232,9 +161,12 @@ def save_results(cards_data, failed_urls, output_dir="data/output_added"):
     json_dir = os.path.join(output_dir, "json")
     os.makedirs(json_dir, exist_ok=True)
     
+    # Les fichiers sont écrits à côté puis renommés, un arrêt pendant
+    # l'écriture ne laisse jamais de fichier tronqué
     json_path = os.path.join(json_dir, "cards_data.json")
-    with open(json_path, 'w', encoding='utf-8') as f:
+    with open(json_path + ".tmp", 'w', encoding='utf-8') as f:
         json.dump(cards_data, f, indent=2, ensure_ascii=False)
+    os.replace(json_path + ".tmp", json_path)
     
     if cards_data:
         csv_data = []
@@ -259,7 +191,8 @@ def save_results(cards_data, failed_urls, output_dir="data/output_added"):
         
         df = pd.DataFrame(csv_data)
         csv_path = os.path.join(output_dir, "cards_data.csv")
-        df.to_csv(csv_path, index=False, encoding='utf-8')
+        df.to_csv(csv_path + ".tmp", index=False, encoding='utf-8')
+        os.replace(csv_path + ".tmp", csv_path)
     
     if failed_urls:
         failed_path = os.path.join(output_dir, "failed_urls.txt")
@@ -281,8 +214,34 @@ def save_results(cards_data, failed_urls, output_dir="data/output_added"):
         print(f"   Cartes avec évolutions: {evolution_cards}")
         print(f"   Autres: {len(cards_data) - trainers - pokemon}")
 
-def main():
-    directory_path = r"data\output"
+def reparse_main(evolves_max_age=7, workers=None):
+    """
+    Mode hors ligne : les cartes sont réextraites des pages du catalogue, sans
+    aucune requête, puis les résultats sont sauvegardés. run.py supprime
+    data/output après chaque lancement : sans sorties de tournois, toutes les
+    cartes du catalogue sont sauvegardées
+    """
+    directory_path = os.path.join("data", "output")
+    resolver = EvolvesFromResolver(max_age=evolves_max_age * 24 * 3600)
+    catalog = CardCatalog()
+    try:
+        reparse_catalog(catalog, workers)
+        urls = extract_urls_from_json_files(directory_path) if os.path.exists(directory_path) else []
+        if not urls:
+            print(f"Aucune URL dans {directory_path}, toutes les cartes du catalogue sont sauvegardées.")
+            urls = catalog.get_urls()
+        cards_data, failed_urls = assemble_cards(urls, catalog, resolver)
+        print("\nSauvegarde des résultats...")
+        save_results(cards_data, failed_urls)
+    finally:
+        catalog.close()
+
+def main(requests_per_second=2, concurrency=8, evolves_max_age=7, reparse=False, workers=None):
+    if reparse:
+        reparse_main(evolves_max_age, workers)
+        return
+    
+    directory_path = os.path.join("data", "output")
     
     print("Extraction des URLs depuis les fichiers JSON...")
     
@@ -304,18 +263,37 @@ def main():
     if len(urls) > 5:
         print(f"   ... et {len(urls) - 5} autres")
     
+    resolver = EvolvesFromResolver(max_age=evolves_max_age * 24 * 3600)
+    
     response = input(f"\nCommencer le scraping de {len(urls)} cartes ? (y/N): ")
     if response.lower() != 'y':
         print("Scraping annulé.")
         return
     
     print("\nDébut du scraping...")
-    cards_data, failed_urls = scrape_all_cards(urls, delay=1)
-    
-    print("\nSauvegarde des résultats...")
-    save_results(cards_data, failed_urls)
+    catalog = CardCatalog()
+    try:
+        try:
+            cards_data, failed_urls = scrape_all_cards(urls, requests_per_second, concurrency, resolver, catalog)
+        except KeyboardInterrupt:
+            # Les cartes déjà scrapées sont dans le catalogue : elles sont
+            # sauvegardées, et le prochain lancement reprendra avec les autres
+            print("\nScraping interrompu, sauvegarde des cartes déjà scrapées...")
+            cards_data, failed_urls = assemble_cards(urls, catalog, resolver)
+        
+        print("\nSauvegarde des résultats...")
+        save_results(cards_data, failed_urls)
+    finally:
+        catalog.close()
     
     print("\nScraping terminé.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scraping des cartes jouées dans les tournois")
+    parser.add_argument("--rate", type=float, default=2, help="nombre maximal de requêtes par seconde vers le site")
+    parser.add_argument("--concurrency", type=int, default=8, help="nombre de cartes traitées en parallèle")
+    parser.add_argument("--evolves-max-age", type=float, default=7, help="âge maximal en jours des recherches d'évolutions gardées en cache")
+    parser.add_argument("--reparse", action="store_true", help="réextraire hors ligne les cartes depuis les pages gardées dans le catalogue")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus pour --reparse (tous les coeurs par défaut)")
+    args = parser.parse_args()
+    main(args.rate, args.concurrency, args.evolves_max_age, args.reparse, args.workers)
\ No newline at end of file
@@ -0,0 +1,220 @@
+from dataclasses import asdict
+from multiprocessing.connection import wait
+from cache_store import SqliteCacheStore
+from crawl_state import CrawlState
+from fetch import ResilientFetcher
+from lease_queue import LeaseQueue
+from output_writer import JsonOutputWriter, NdjsonOutputWriter, iter_tournaments, orjson
+from parsing import TournamentListItem, parse_tournament_list_html
+from telemetry import CrawlTelemetry
+import aiohttp
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import scrap1
+
+# Sharded crawl: the listing pages and the tournaments are spread over several
+# processes through a lease table in sqlite, so parsing and encoding use every core
+#
+# - the coordinator seeds the queue with the first listing page and starts the
+#   processes, a process that dies has its leases given back and is restarted
+# - the first listing page queues the other pages (known from its pagination),
+#   every listing page queues its tournaments, smallest first
+# - every process runs the scrap1.py extraction with its own event loop, its
+#   share of the request rate, and the shared sqlite html cache
+# - json outputs are written in place, one file per tournament, so writing a
+#   tournament twice is harmless; ndjson outputs are written to one staging
+#   directory per process and merged by id into the output at the end
+#
+# An interrupted sharded crawl resumes from the queue when started again
+#
+#   python scraping/shard_crawl.py --processes 8
+
+default_queue_path = "cache/crawl_queue.sqlite3"
+shards_dir = "data/shards"
+
+# Leases are renewed by the process every third of this, a process that stops
+# renewing them (killed, frozen) loses its jobs once they expire
+lease_seconds = 300
+
+def listing_url(page_number: int) -> str:
+  return scrap1.first_tournament_page if page_number == 1 else scrap1.construct_tournament_list_url(page_number)
+
+# Queue the tournaments of a listing page, and the other listing pages from the first one
+async def handle_listing_job(session: aiohttp.ClientSession, sem: asyncio.Semaphore, queue: LeaseQueue, page_number: int):
+  page = await scrap1.async_parse_from_url(session, sem, listing_url(page_number), parse_tournament_list_html)
+  print(f"extracting completed tournaments page {page.current_page}")
+
+  jobs = []
+  if page_number == 1:
+    jobs += [(f"list:{number}", "list", {"page": number}, -1) for number in range(2, page.max_page + 1)]
+  for tournament in page.tournaments:
+    nb_players = int(tournament.nb_players) if tournament.nb_players.isdigit() else 0
+    jobs.append((f"tournament:{tournament.id}", "tournament", asdict(tournament), nb_players))
+  await asyncio.to_thread(queue.add_many, jobs)
+
+# Lease and handle jobs until the queue is drained
+async def shard_task(session: aiohttp.ClientSession, sem: asyncio.Semaphore, queue: LeaseQueue, owner: str):
+  while True:
+    job = await asyncio.to_thread(queue.lease, owner, lease_seconds)
+    if job is None:
+      # Jobs leased by other processes may still queue new ones
+      if await asyncio.to_thread(queue.is_drained):
+        return
+      await asyncio.sleep(1)
+      continue
+
+    job_id, kind, payload = job
+    try:
+      if kind == "list":
+        await handle_listing_job(session, sem, queue, payload["page"])
+      else:
+        await scrap1.handle_tournament(session, sem, None, TournamentListItem(**payload))
+      await asyncio.to_thread(queue.complete, job_id, owner)
+    except Exception as e:
+      print(f"error while handling {kind} {payload}: {e!r}")
+      await asyncio.to_thread(queue.fail, job_id, owner, repr(e))
+
+async def renew_leases(queue: LeaseQueue, owner: str):
+  while True:
+    await asyncio.sleep(lease_seconds / 3)
+    await asyncio.to_thread(queue.renew, owner, lease_seconds)
+
+async def worker_main(number: int, queue_path: str, nb_tasks: int, base_url: str, rate: float, max_rate: float, retries: int, output_format: str, output_dir: str, metrics_dir: str):
+  owner = worker_owner(os.getpid())
+  queue = LeaseQueue(queue_path)
+
+  # The scrap1.py extraction runs in this process, its pages are parsed inline
+  scrap1.cache_store = SqliteCacheStore()
+  # Only kept in memory for handle_tournament, the coordinator records the
+  # crawl state from the jobs done in the queue
+  scrap1.crawl_state = CrawlState()
+  scrap1.fetcher = ResilientFetcher(retries=retries, rate=rate, max_rate=max_rate)
+  if output_format == "ndjson":
+    scrap1.output_writer = NdjsonOutputWriter(os.path.join(shards_dir, f"worker-{number}"))
+  else:
+    scrap1.output_writer = JsonOutputWriter(output_dir)
+  scrap1.telemetry = CrawlTelemetry()
+
+  connector = aiohttp.TCPConnector(limit=20)
+  timeout = aiohttp.ClientTimeout(total=60, sock_connect=10)
+  sem = asyncio.Semaphore(50)
+
+  heartbeat = asyncio.create_task(renew_leases(queue, owner))
+  try:
+    async with aiohttp.ClientSession(base_url=base_url, connector=connector, timeout=timeout) as session:
+      await asyncio.gather(*[shard_task(session, sem, queue, owner) for _ in range(nb_tasks)])
+  finally:
+    heartbeat.cancel()
+    print(f"process {number}: {scrap1.cache_store.stats.report()}, request rates: {scrap1.fetcher.report()}")
+    scrap1.cache_store.close()
+    scrap1.output_writer.close()
+    scrap1.telemetry.write(os.path.join(metrics_dir, f"worker-{number}"))
+    queue.close()
+
+def worker_owner(pid: int) -> str:
+  return f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}:{pid}"
+
+def run_worker(number: int, options: dict):
+  asyncio.run(worker_main(number, **options))
+
+# Append the tournaments of the staging shards that the output does not hold yet
+def merge_ndjson_shards(output_dir: str) -> int:
+  writer = NdjsonOutputWriter(output_dir)
+  nb_merged = 0
+  try:
+    for directory in sorted(os.listdir(shards_dir)):
+      path = os.path.join(shards_dir, directory)
+      if not directory.startswith("worker-") or not os.path.isdir(path):
+        continue
+      for tournament in iter_tournaments(path):
+        if writer.has(tournament["id"]):
+          continue
+        line = orjson.dumps(tournament) if orjson is not None else json.dumps(tournament, separators=(",", ":")).encode("utf-8")
+        writer.write_line(tournament["id"], line)
+        nb_merged += 1
+  finally:
+    writer.close()
+  return nb_merged
+
+def main(nb_processes: int = os.cpu_count(), nb_tasks: int = scrap1.default_nb_workers, base_url: str = scrap1.base_url, rate: float = 5, max_rate: float = 50, retries: int = 5, output_format: str = "json", output_dir: str = "data/output", metrics_dir: str = "data/metrics", queue_path: str = default_queue_path, max_restarts: int = 10):
+  queue = LeaseQueue(queue_path)
+  counts = queue.counts()
+  if counts.get("pending", 0) + counts.get("leased", 0) > 0:
+    # No process runs yet, the leases left are those of the interrupted crawl
+    print(f"resuming the sharded crawl: {queue.requeue()} leases given back, {counts}")
+  else:
+    queue.reset()
+    queue.add_many([("list:1", "list", {"page": 1}, -1)])
+
+  if not os.path.exists(shards_dir):
+    os.makedirs(shards_dir)
+
+  # The processes share the politeness budget of a single crawl
+  options = {
+    "queue_path": queue_path,
+    "nb_tasks": nb_tasks,
+    "base_url": base_url,
+    "rate": rate / nb_processes,
+    "max_rate": max_rate / nb_processes,
+    "retries": retries,
+    "output_format": output_format,
+    "output_dir": output_dir,
+    "metrics_dir": metrics_dir
+  }
+
+  def start(number: int) -> multiprocessing.Process:
+    process = multiprocessing.Process(target=run_worker, args=(number, options), name=f"crawl-{number}")
+    process.start()
+    return process
+
+  processes = {number: start(number) for number in range(nb_processes)}
+  restarts = 0
+  while len(processes) > 0:
+    wait([process.sentinel for process in processes.values()])
+    for number, process in list(processes.items()):
+      if process.is_alive():
+        continue
+      process.join()
+      del processes[number]
+      if process.exitcode != 0:
+        requeued = queue.requeue(worker_owner(process.pid))
+        print(f"process {number} exited with code {process.exitcode}, {requeued} leases given back")
+        if not queue.is_drained() and restarts < max_restarts:
+          restarts += 1
+          processes[number] = start(number)
+
+  if output_format == "ndjson":
+    print(f"{merge_ndjson_shards(output_dir)} tournaments merged into {output_dir}")
+
+  # Tournaments handled by any process are known to the next crawls, the
+  # watermark only moves when every job succeeded
+  counts = queue.counts()
+  crawl_state = CrawlState()
+  for tournament in queue.done_jobs("tournament"):
+    crawl_state.mark_tournament_done(None, tournament["id"], tournament["date"])
+  crawl_state.failed = counts.get("failed", 0) > 0 or not queue.is_drained()
+  crawl_state.finish()
+  queue.close()
+
+  if not crawl_state.failed:
+    shutil.rmtree(shards_dir)
+  print(f"sharded crawl finished: {counts}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Scrap the completed tournaments of limitlesstcg with several processes")
+  parser.add_argument("--processes", type=int, default=os.cpu_count(), help="number of crawl processes")
+  parser.add_argument("--workers", type=int, default=scrap1.default_nb_workers, help="number of jobs handled at the same time by each process")
+  parser.add_argument("--base-url", default=scrap1.base_url, help="site to crawl, e.g. a local fake_limitless.py server")
+  parser.add_argument("--rate", type=float, default=5, help="initial requests per second of the whole crawl, split between the processes")
+  parser.add_argument("--max-rate", type=float, default=50, help="upper bound of the adaptive request rate of the whole crawl")
+  parser.add_argument("--retries", type=int, default=5, help="retries of a failed request before giving up")
+  parser.add_argument("--output-format", choices=["json", "ndjson"], default="json", help="one indented json file per tournament, or compact ndjson shards")
+  parser.add_argument("--metrics-dir", default="data/metrics", help="where the metrics of each process are written")
+  parser.add_argument("--queue", default=default_queue_path, help="sqlite lease table shared by the processes")
+  args = parser.parse_args()
+
+  main(args.processes, args.workers, args.base_url, args.rate, args.max_rate, args.retries, args.output_format, "data/output", args.metrics_dir, args.queue)
@@ -0,0 +1,183 @@
+from collections import defaultdict
+import json
+import os
+import time
+
+# Measures of a crawl, by url class (listing, standings, decklist, pairings)
+# Written at the end of the run as a json summary and as a Prometheus text
+# file, to size the connector limits and semaphores from data
+
+latency_buckets = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+parse_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]
+bytes_buckets = [1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+
+class Histogram:
+  def __init__(self, buckets: list):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value: float):
+    for i, bound in enumerate(self.buckets):
+      if value <= bound:
+        break
+    else:
+      i = len(self.buckets)
+    self.counts[i] += 1
+    self.sum += value
+    self.count += 1
+
+  # Approximate quantile, the upper bound of the bucket holding it
+  def quantile(self, q: float):
+    if self.count == 0:
+      return None
+    rank = q * self.count
+    seen = 0
+    for i, count in enumerate(self.counts):
+      seen += count
+      if seen >= rank:
+        return self.buckets[i] if i < len(self.buckets) else float("inf")
+
+  def summary(self) -> dict:
+    return {
+      "count": self.count,
+      "sum": self.sum,
+      "mean": self.sum / self.count if self.count > 0 else None,
+      "p50": self.quantile(0.5),
+      "p90": self.quantile(0.9),
+      "p99": self.quantile(0.99)
+    }
+
+# Number of running operations, with its peak and time weighted average
+class InFlightGauge:
+  def __init__(self):
+    self.started_at = time.monotonic()
+    self.updated_at = self.started_at
+    self.current = 0
+    self.peak = 0
+    self.area = 0.0
+
+  def add(self, delta: int):
+    now = time.monotonic()
+    self.area += self.current * (now - self.updated_at)
+    self.updated_at = now
+    self.current += delta
+    self.peak = max(self.peak, self.current)
+
+  def average(self) -> float:
+    elapsed = self.updated_at - self.started_at
+    return self.area / elapsed if elapsed > 0 else 0.0
+
+# Run a parse function and return its result with the time it took,
+# used inside the parse pool so the measure excludes the time spent queued
+def timed_call(function, *args):
+  started_at = time.perf_counter()
+  result = function(*args)
+  return result, time.perf_counter() - started_at
+
+class CrawlTelemetry:
+  def __init__(self):
+    self.started_at = time.time()
+    self.fetch_latency = defaultdict(lambda: Histogram(latency_buckets))
+    self.response_bytes = defaultdict(lambda: Histogram(bytes_buckets))
+    self.parse_time = defaultdict(lambda: Histogram(parse_buckets))
+    self.stage_time = defaultdict(lambda: Histogram(latency_buckets))
+    self.statuses = defaultdict(int)
+    self.errors = defaultdict(int)
+    self.cache_hits = defaultdict(int)
+    self.cache_misses = defaultdict(int)
+    self.in_flight = defaultdict(InFlightGauge)
+
+  def record_cache(self, url_class: str, hit: bool):
+    if hit:
+      self.cache_hits[url_class] += 1
+    else:
+      self.cache_misses[url_class] += 1
+
+  # Gauges given to ResilientFetcher.get, that moves them while the request is sent
+  def in_flight_gauges(self, url_class: str) -> list:
+    return [self.in_flight[url_class], self.in_flight["all"]]
+
+  def record_fetch(self, url_class: str, latency: float, status: int | None, nb_bytes: int):
+    if status is None:
+      self.errors[url_class] += 1
+      return
+    self.fetch_latency[url_class].observe(latency)
+    self.response_bytes[url_class].observe(nb_bytes)
+    self.statuses[(url_class, status)] += 1
+
+  def record_parse(self, url_class: str, seconds: float):
+    self.parse_time[url_class].observe(seconds)
+
+  def record_stage(self, stage: str, seconds: float):
+    self.stage_time[stage].observe(seconds)
+
+  def summary(self) -> dict:
+    url_classes = sorted(set(self.fetch_latency) | set(self.cache_hits) | set(self.cache_misses) | set(self.parse_time) | set(self.errors))
+    return {
+      "started_at": self.started_at,
+      "duration": time.time() - self.started_at,
+      "url_classes": {
+        url_class: {
+          "fetch_latency": self.fetch_latency[url_class].summary(),
+          "response_bytes": self.response_bytes[url_class].summary(),
+          "parse_time": self.parse_time[url_class].summary(),
+          "statuses": {str(status): count for (c, status), count in self.statuses.items() if c == url_class},
+          "errors": self.errors[url_class],
+          "cache_hits": self.cache_hits[url_class],
+          "cache_misses": self.cache_misses[url_class],
+          "in_flight_peak": self.in_flight[url_class].peak,
+          "in_flight_average": self.in_flight[url_class].average()
+        }
+        for url_class in url_classes
+      },
+      "stages": {stage: histogram.summary() for stage, histogram in self.stage_time.items()},
+      "in_flight_peak": self.in_flight["all"].peak,
+      "in_flight_average": self.in_flight["all"].average()
+    }
+
+  def prometheus(self) -> str:
+    lines = []
+
+    def histogram(name: str, help: str, histograms: dict, label: str):
+      lines.append(f"# HELP {name} {help}")
+      lines.append(f"# TYPE {name} histogram")
+      for key, h in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(h.buckets + ["+Inf"], h.counts):
+          cumulative += count
+          lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {h.sum}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {h.count}')
+
+    def metric(name: str, help: str, kind: str, values: dict, label: str):
+      lines.append(f"# HELP {name} {help}")
+      lines.append(f"# TYPE {name} {kind}")
+      for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{key}"}} {value}')
+
+    histogram("scrap_fetch_latency_seconds", "Latency of the http requests", self.fetch_latency, "url_class")
+    histogram("scrap_response_bytes", "Size of the http responses", self.response_bytes, "url_class")
+    histogram("scrap_parse_seconds", "Time spent parsing a page", self.parse_time, "url_class")
+    histogram("scrap_stage_seconds", "Duration of the crawl stages", self.stage_time, "stage")
+
+    lines.append("# HELP scrap_responses_total Http responses by status")
+    lines.append("# TYPE scrap_responses_total counter")
+    for (url_class, status), count in sorted(self.statuses.items()):
+      lines.append(f'scrap_responses_total{{url_class="{url_class}",status="{status}"}} {count}')
+
+    metric("scrap_request_errors_total", "Requests that failed after their retries", "counter", self.errors, "url_class")
+    metric("scrap_cache_hits_total", "Pages served by the html cache", "counter", self.cache_hits, "url_class")
+    metric("scrap_cache_misses_total", "Pages missing or expired in the html cache", "counter", self.cache_misses, "url_class")
+    metric("scrap_in_flight_peak", "Peak number of concurrent requests", "gauge", {key: gauge.peak for key, gauge in self.in_flight.items()}, "url_class")
+    metric("scrap_in_flight_average", "Time weighted average number of concurrent requests", "gauge", {key: gauge.average() for key, gauge in self.in_flight.items()}, "url_class")
+    return "\n".join(lines) + "\n"
+
+  def write(self, directory: str = "data/metrics"):
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+    with open(os.path.join(directory, "crawl_summary.json"), "w") as f:
+      json.dump(self.summary(), f, indent=2)
+    with open(os.path.join(directory, "crawl_metrics.prom"), "w") as f:
+      f.write(self.prometheus())
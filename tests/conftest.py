@@ -0,0 +1,23 @@
+import builtins
+import importlib
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The scripts are run as python scraping/X.py, their siblings are imported directly
+sys.path.insert(0, os.path.join(root, "scraping"))
+sys.path.insert(0, os.path.join(root, "data-integration"))
+
+@pytest.fixture(scope="session")
+def etl_main(tmp_path_factory):
+  # main.py asks for the database password and opens its log file on import
+  previous_input, previous_cwd = builtins.input, os.getcwd()
+  builtins.input = lambda prompt="": "test"
+  os.chdir(tmp_path_factory.mktemp("etl"))
+  try:
+    return importlib.import_module("main")
+  finally:
+    builtins.input = previous_input
+    os.chdir(previous_cwd)
@@ -0,0 +1,15 @@
+from cache_store import SqliteCacheStore
+
+def test_missing_page_is_kept_until_the_page_is_fetched(tmp_path):
+  store = SqliteCacheStore(str(tmp_path / "pages.sqlite3"))
+  url = "/tournament/t1/player/p1/decklist"
+  assert store.get_missing(url) is None
+
+  store.put_missing(url, 404)
+  assert store.get(url) is None
+  assert store.get_missing(url) == 404
+
+  store.put(url, "<div class=\"decklist\"></div>")
+  assert store.get_missing(url) is None
+  assert store.get(url).html == "<div class=\"decklist\"></div>"
+  store.close()
@@ -0,0 +1,31 @@
+import json
+import os
+
+from card_urls import CardUrlIndex
+
+def write_shard(path, urls, mode="w"):
+  with open(path, mode) as f:
+    for url in urls:
+      f.write(json.dumps({"id": url, "players": [{"decklist": [{"url": url}]}]}) + "\n")
+
+def test_grown_shard_is_scanned_from_its_offset(tmp_path):
+  shard = tmp_path / "tournaments-0.ndjson"
+  write_shard(shard, ["/cards/A1/1"])
+  index = CardUrlIndex(str(tmp_path / "index.json"))
+  assert index.update(str(tmp_path), workers=1) == {"/cards/A1/1"}
+
+  write_shard(shard, ["/cards/A1/2"], mode="a")
+  assert index.update(str(tmp_path), workers=1) == {"/cards/A1/1", "/cards/A1/2"}
+
+def test_recreated_shard_is_rescanned(tmp_path):
+  shard = tmp_path / "tournaments-0.ndjson"
+  write_shard(shard, ["/cards/A1/1"])
+  index = CardUrlIndex(str(tmp_path / "index.json"))
+  index.update(str(tmp_path), workers=1)
+  index.save()
+
+  # Same name, new crawl: longer than the indexed offset but another content
+  os.remove(shard)
+  write_shard(shard, ["/cards/B1/1", "/cards/B1/2", "/cards/B1/3"])
+  index = CardUrlIndex(str(tmp_path / "index.json"))
+  assert index.update(str(tmp_path), workers=1) == {"/cards/B1/1", "/cards/B1/2", "/cards/B1/3"}
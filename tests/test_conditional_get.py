@@ -0,0 +1,83 @@
+from aiohttp.test_utils import TestServer
+import aiohttp
+import asyncio
+
+import scrap1
+from cache_store import SqliteCacheStore
+from fake_limitless import make_app
+from fetch import ResilientFetcher
+from telemetry import CrawlTelemetry
+
+standings_url = "/tournament/t1/standings"
+
+# Fetch urls with scrap1 against a fake_limitless server, the crawler cache
+# has a ttl of 0 so every cached page is revalidated
+def crawl(monkeypatch, cache: SqliteCacheStore, snapshot_path: str, urls: list) -> tuple:
+  monkeypatch.setattr(scrap1, "cache_store", cache)
+  monkeypatch.setattr(scrap1, "fetcher", ResilientFetcher(retries=0))
+  monkeypatch.setattr(scrap1, "telemetry", CrawlTelemetry())
+
+  async def run():
+    async with TestServer(make_app(snapshot_path)) as server:
+      async with aiohttp.ClientSession(base_url=str(server.make_url(""))) as session:
+        pages = [await scrap1.async_html_from_url(session, asyncio.Semaphore(4), url) for url in urls]
+        async with session.get("/__stats") as resp:
+          return pages, await resp.json()
+
+  return asyncio.run(run())
+
+def make_cache(tmp_path) -> SqliteCacheStore:
+  return SqliteCacheStore(str(tmp_path / "pages.sqlite3"), ttls={"standings": 0})
+
+def make_snapshot(tmp_path, html: str) -> str:
+  snapshot_path = str(tmp_path / "snapshot.sqlite3")
+  snapshot = SqliteCacheStore(snapshot_path)
+  snapshot.put(standings_url, html)
+  snapshot.close()
+  return snapshot_path
+
+def test_unchanged_page_is_revalidated(monkeypatch, tmp_path):
+  snapshot_path = make_snapshot(tmp_path, "<table class='striped'>v1</table>")
+  cache = make_cache(tmp_path)
+
+  pages, stats = crawl(monkeypatch, cache, snapshot_path, [standings_url])
+  assert pages == ["<table class='striped'>v1</table>"]
+  assert stats == {"ok": 1, "not_modified": 0, "not_found": 0}
+  entry = cache.get(standings_url)
+  assert entry.etag is not None and entry.last_modified is not None
+
+  # The expired page is sent with its validators and the 304 keeps its body
+  pages, stats = crawl(monkeypatch, cache, snapshot_path, [standings_url])
+  assert pages == ["<table class='striped'>v1</table>"]
+  assert stats == {"ok": 0, "not_modified": 1, "not_found": 0}
+  assert cache.stats.revalidated == 1
+  assert cache.get(standings_url).fetched_at > entry.fetched_at
+  cache.close()
+
+def test_changed_page_replaces_the_cached_body(monkeypatch, tmp_path):
+  snapshot_path = make_snapshot(tmp_path, "<table class='striped'>v1</table>")
+  cache = make_cache(tmp_path)
+  crawl(monkeypatch, cache, snapshot_path, [standings_url])
+  etag = cache.get(standings_url).etag
+
+  make_snapshot(tmp_path, "<table class='striped'>v2</table>")
+  pages, stats = crawl(monkeypatch, cache, snapshot_path, [standings_url])
+  assert pages == ["<table class='striped'>v2</table>"]
+  assert stats == {"ok": 1, "not_modified": 0, "not_found": 0}
+  entry = cache.get(standings_url)
+  assert entry.html == "<table class='striped'>v2</table>"
+  assert entry.etag != etag
+  assert cache.stats.revalidated == 0
+  cache.close()
+
+def test_last_modified_alone_is_sent(monkeypatch, tmp_path):
+  snapshot_path = make_snapshot(tmp_path, "<table class='striped'>v1</table>")
+  cache = make_cache(tmp_path)
+  # Pages cached by a store that only kept Last-Modified
+  cache.put(standings_url, "<table class='striped'>v1</table>", None, "Sun, 01 Jan 2090 00:00:00 GMT")
+
+  pages, stats = crawl(monkeypatch, cache, snapshot_path, [standings_url])
+  assert pages == ["<table class='striped'>v1</table>"]
+  assert stats == {"ok": 0, "not_modified": 1, "not_found": 0}
+  assert cache.stats.revalidated == 1
+  cache.close()
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from fetch import AdaptiveRateLimiter, CircuitBreaker, ResilientFetcher
+from telemetry import InFlightGauge
+
+# Session whose requests run a coroutine instead of going to the network
+class FakeSession:
+  def __init__(self, request):
+    self.request = request
+
+  def get(self, url, headers=None):
+    session = self
+
+    class Context:
+      async def __aenter__(self):
+        return await session.request()
+
+      async def __aexit__(self, *exc_info):
+        return False
+
+    return Context()
+
+class FakeResponse:
+  status = 200
+  headers = {}
+
+  async def text(self):
+    return "ok"
+
+# A fetcher whose breaker opened long enough ago to let a probe through
+def make_open_fetcher() -> tuple:
+  fetcher = ResilientFetcher(retries=0)
+  breaker = CircuitBreaker(cooldown=0.01)
+  breaker.opened_at = time.monotonic() - 1
+  fetcher.limiters["base url"] = AdaptiveRateLimiter(1000)
+  fetcher.breakers["base url"] = breaker
+  return fetcher, breaker
+
+async def ok():
+  return FakeResponse()
+
+def test_cancelled_probe_lets_the_next_request_probe():
+  async def run():
+    fetcher, breaker = make_open_fetcher()
+    hanging = asyncio.Event()
+
+    async def hang():
+      await hanging.wait()
+
+    probe = asyncio.create_task(fetcher.get(FakeSession(hang), "/page"))
+    await asyncio.sleep(0.05)
+    assert breaker.probing
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await probe
+    assert not breaker.probing
+
+    response = await asyncio.wait_for(fetcher.get(FakeSession(ok), "/page"), 1)
+    assert response.text == "ok"
+    assert breaker.opened_at is None
+
+  asyncio.run(run())
+
+def test_probe_failing_with_an_unexpected_error_is_released():
+  async def run():
+    fetcher, breaker = make_open_fetcher()
+
+    async def fail():
+      raise ValueError("unexpected")
+
+    with pytest.raises(ValueError):
+      await fetcher.get(FakeSession(fail), "/page")
+    assert not breaker.probing
+
+    response = await asyncio.wait_for(fetcher.get(FakeSession(ok), "/page"), 1)
+    assert response.status == 200
+
+  asyncio.run(run())
+
+def test_in_flight_gauge_excludes_the_rate_limiter_wait():
+  async def run():
+    fetcher = ResilientFetcher(retries=0)
+    limiter = AdaptiveRateLimiter(1000)
+    limiter.paused_until = time.monotonic() + 0.2
+    fetcher.limiters["base url"] = limiter
+    fetcher.breakers["base url"] = CircuitBreaker()
+    gauge = InFlightGauge()
+    sent = asyncio.Event()
+    answer = asyncio.Event()
+
+    async def request():
+      sent.set()
+      await answer.wait()
+      return FakeResponse()
+
+    task = asyncio.create_task(fetcher.get(FakeSession(request), "/page", in_flight=[gauge]))
+    await asyncio.sleep(0.1)
+    assert gauge.current == 0
+
+    await sent.wait()
+    assert gauge.current == 1
+    answer.set()
+    await task
+    assert gauge.current == 0
+    assert gauge.peak == 1
+
+  asyncio.run(run())
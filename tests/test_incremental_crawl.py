@@ -0,0 +1,64 @@
+import asyncio
+
+import scrap1
+from crawl_state import CrawlState
+from output_writer import JsonOutputWriter
+from parsing import TournamentListItem, TournamentListPage, parse_tournament_list_html
+from telemetry import CrawlTelemetry
+
+# Listing of tournaments newest first, 3 per page
+def make_listing(ids: list) -> dict:
+  tournaments = [TournamentListItem(tournament_id, tournament_id, f"2025-01-{99 - rank:02d}T00:00:00.000Z", "orga", "STANDARD", "8") for rank, tournament_id in enumerate(ids)]
+  pages = [tournaments[i:i + 3] for i in range(0, len(tournaments), 3)]
+  return {number: TournamentListPage(number, len(pages), page) for number, page in enumerate(pages, 1)}
+
+def run_crawl(monkeypatch, tmp_path, listing: dict, failing: set) -> list:
+  crawled = []
+
+  async def parse_from_url(session, sem, url, parse_html, use_cache=True):
+    if parse_html is parse_tournament_list_html:
+      return listing[int(url.split("&page=")[1]) if "&page=" in url else 1]
+    return []
+
+  async def handle_standings(session, sem, standings, tournament_id, *metadata):
+    if tournament_id in failing:
+      raise RuntimeError(f"{tournament_id} failed")
+    crawled.append(tournament_id)
+
+  monkeypatch.setattr(scrap1, "async_parse_from_url", parse_from_url)
+  monkeypatch.setattr(scrap1, "handle_tournament_standings_page", handle_standings)
+  monkeypatch.setattr(scrap1, "telemetry", CrawlTelemetry())
+  monkeypatch.setattr(scrap1, "output_writer", JsonOutputWriter(str(tmp_path / "output")))
+  monkeypatch.setattr(scrap1, "crawl_state", CrawlState(str(tmp_path / "crawl_state.json")))
+
+  asyncio.run(scrap1.crawl_tournament_list(None, asyncio.Semaphore(50), 4, incremental=True))
+  scrap1.crawl_state.finish()
+  return crawled
+
+def test_interrupted_first_run_is_resumed(monkeypatch, tmp_path):
+  ids = [f"t{page}_{i}" for page in range(1, 5) for i in range(3)]
+  listing = make_listing(ids)
+
+  crawled = run_crawl(monkeypatch, tmp_path, listing, failing={"t3_1"})
+  assert sorted(crawled) == sorted(set(ids) - {"t3_1"})
+  assert scrap1.crawl_state.watermark_date is None
+
+  # The resumed crawl handles the failed tournament before moving the watermark
+  crawled = run_crawl(monkeypatch, tmp_path, listing, failing=set())
+  assert crawled == ["t3_1"]
+  assert scrap1.crawl_state.watermark_id == "t1_0"
+  assert scrap1.crawl_state.known_ids == set(ids)
+
+  # Then only the tournaments newer than the watermark are crawled
+  crawled = run_crawl(monkeypatch, tmp_path, make_listing(["t0_0"] + ids), failing=set())
+  assert crawled == ["t0_0"]
+  assert scrap1.crawl_state.watermark_id == "t0_0"
+
+def test_failed_resume_keeps_the_watermark(monkeypatch, tmp_path):
+  ids = [f"t{page}_{i}" for page in range(1, 5) for i in range(3)]
+  listing = make_listing(ids)
+
+  run_crawl(monkeypatch, tmp_path, listing, failing={"t3_1"})
+  run_crawl(monkeypatch, tmp_path, listing, failing={"t3_1"})
+  assert scrap1.crawl_state.watermark_date is None
+  assert not scrap1.crawl_state.is_known("t3_1")
@@ -0,0 +1,33 @@
+import psycopg
+from psycopg._copy_base import _format_row_binary
+from psycopg.adapt import Transformer
+
+def copy_binary(columns, row) -> bytearray:
+  # What copy.set_types then copy.write_row send for the row, without a server
+  tx = Transformer()
+  tx.set_dumper_types([psycopg.adapters.types[column_type].oid for _, column_type in columns], psycopg.pq.Format.BINARY)
+  out = bytearray()
+  _format_row_binary(row, tx, out)
+  return out
+
+def card(evolves_from):
+  return {
+    "url": "https://pocket.limitlesstcg.com/cards/A1/2", "nom": "Ivysaur", "type_carte": "Pokémon",
+    "sous_type": "Stage 1", "hp": "90", "evolving_stage": "Stage 1", "evolves_from": evolves_from,
+    "competence_1_nom": "Razor Leaf", "competence_1_puissance": 60, "competence_2_nom": None,
+    "competence_2_puissance": None, "faiblesse": "Fire", "retreat": "2"
+  }
+
+def test_infocard_rows_copy_with_evolves_from(etl_main):
+  for evolves_from, expected in [
+    ([], "{}"),
+    (["X"], "{X}"),
+    (["https://pocket.limitlesstcg.com/cards/A1/1", "a b"], '{https://pocket.limitlesstcg.com/cards/A1/1,"a b"}')
+  ]:
+    row = etl_main.infocard_row(card(evolves_from))
+    assert row[6] == expected
+    assert len(copy_binary(etl_main.wrk_infocards_columns, row)) > 0
+
+def test_array_literal_quotes_special_elements(etl_main):
+  assert etl_main.to_array_literal(['a"b', "c\\d", "", "NULL", "{x}"]) == '{"a\\"b","c\\\\d","","NULL","{x}"}'
+  assert etl_main.to_array_literal(None) is None
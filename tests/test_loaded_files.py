@@ -0,0 +1,55 @@
+import json
+import os
+
+class LoadedFilesCursor:
+  # Stands for the wrk_loaded_files rows written by record_loaded_files
+  def __init__(self, loaded_files: dict):
+    self.rows = [(name, size, mtime, offset, identity) for name, (size, mtime, offset, identity) in loaded_files.items()]
+
+  def execute(self, query, params=None):
+    pass
+
+  def fetchall(self):
+    return self.rows
+
+def write_shard(path, ids, mode="w"):
+  with open(path, mode) as f:
+    for tournament_id in ids:
+      f.write(json.dumps({"id": tournament_id, "players": []}) + "\n")
+
+def load(etl_main, directory, files=None):
+  loaded_files = {}
+  ids = [document["id"] for document in etl_main.iter_json_documents(str(directory), files, loaded_files)]
+  return ids, loaded_files
+
+def test_grown_shard_is_resumed(etl_main, tmp_path):
+  shard = tmp_path / "tournaments-0.ndjson"
+  write_shard(shard, ["t1", "t2"])
+  _, loaded_files = load(etl_main, tmp_path)
+
+  write_shard(shard, ["t3"], mode="a")
+  files = etl_main.get_files_to_load(LoadedFilesCursor(loaded_files), "tournaments", str(tmp_path))
+  assert files == {"tournaments-0.ndjson": loaded_files["tournaments-0.ndjson"][2]}
+  assert load(etl_main, tmp_path, files)[0] == ["t3"]
+
+def test_recreated_shard_is_reloaded_from_start(etl_main, tmp_path):
+  shard = tmp_path / "tournaments-0.ndjson"
+  write_shard(shard, ["t1", "t2"])
+  _, loaded_files = load(etl_main, tmp_path)
+
+  # Same name, new crawl: longer than the loaded offset but another content
+  os.remove(shard)
+  write_shard(shard, ["t10", "t11", "t12"])
+  files = etl_main.get_files_to_load(LoadedFilesCursor(loaded_files), "tournaments", str(tmp_path))
+  assert files == {"tournaments-0.ndjson": 0}
+  assert load(etl_main, tmp_path, files)[0] == ["t10", "t11", "t12"]
+
+def test_shard_without_identity_is_reloaded(etl_main, tmp_path):
+  shard = tmp_path / "tournaments-0.ndjson"
+  write_shard(shard, ["t1"])
+  _, loaded_files = load(etl_main, tmp_path)
+  size, mtime, offset, _ = loaded_files["tournaments-0.ndjson"]
+
+  write_shard(shard, ["t2"], mode="a")
+  files = etl_main.get_files_to_load(LoadedFilesCursor({"tournaments-0.ndjson": (size, mtime, offset, None)}), "tournaments", str(tmp_path))
+  assert files == {"tournaments-0.ndjson": 0}